@@ -1,34 +1,75 @@
-from flask import Flask, request, jsonify
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from flask import Flask, request, jsonify, Response, stream_with_context, g
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt, get_jwt_identity, verify_jwt_in_request
 from pymongo import MongoClient
-from model import train_model, predict_fuel_demand
+from model import predict_fuel_demand, predict_fuel_demand_batch
+from registry import ModelRegistry, ModelSlot
+from retrain import JobStore, RegistryWatcher, RetrainScheduler, load_training_data
+from cache import PredictionCache, LocalCacheBackend, RedisCacheBackend
+from persistence import WriteBehindWriter
+from notifications import NotificationQueue
+from history import ensure_prediction_indexes, fetch_page, iter_documents
+from metrics import metrics
+from weather import WeatherClient, WeatherUnavailable, UnknownCity
+from users import UserDirectory
+from monitoring import DriftMonitor, DriftWatcher
+from ratelimit import RateLimiter, LocalQuotaStore, RedisQuotaStore, DEFAULT_QUOTAS
 import logging
-from schemas import PredictionInputSchema, UpdateDataSchema
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
+from schemas import PredictionInputSchema, SinglePredictionSchema, UpdateDataSchema
 from marshmallow import Schema, fields, ValidationError
 from flask_swagger_ui import get_swaggerui_blueprint
-from datetime import datetime
+from datetime import datetime, timezone
 from functools import wraps
-from flask_mail import Mail, Message
-from collections import defaultdict
-import requests
+from flask_mail import Mail
+import redis
+import json
+import atexit
+import os
+import queue
+import random
+import time
+from logging.handlers import QueueHandler, QueueListener
 
 app = Flask(__name__)
 
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Access log: a sampled, structured line per request, written by a listener thread
+app.config['REQUEST_LOG_SAMPLE_RATE'] = 0.01
+access_logger = logging.getLogger('app.access')
+access_logger.propagate = False
+access_log_queue = queue.SimpleQueue()
+access_logger.addHandler(QueueHandler(access_log_queue))
+access_log_listener = QueueListener(access_log_queue, *logging.getLogger().handlers)
+
+# Configure metrics; set METRICS_DIR to aggregate across forked workers
+app.config['METRICS_DIR'] = os.environ.get('METRICS_DIR')
+
 @app.before_request
-def log_request_info():
-    logger.info(f"Request: {request.method} {request.path}")
+def start_request_timer():
+    g.request_started = time.perf_counter()
 
 @app.after_request
-def log_response_info(response):
-    logger.info(f"Response: {response.status}")
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    duration = time.perf_counter() - started
+    endpoint = request.endpoint or 'unmatched'
+    metrics.observe('http_request_duration_seconds', duration, endpoint=endpoint, method=request.method)
+    metrics.inc('http_requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+    # Server errors are always logged; everything else is sampled
+    if response.status_code >= 500 or random.random() < app.config['REQUEST_LOG_SAMPLE_RATE']:
+        access_logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'endpoint': endpoint,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 3)
+        }))
     return response
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
 # Configure JWT
 app.config['JWT_SECRET_KEY'] = 'your-secret-key'  # Change this to a secure key
 jwt = JWTManager(app)
@@ -39,33 +80,299 @@ app.config['MAIL_PORT'] = 587
 app.config['MAIL_USE_TLS'] = True
 app.config['MAIL_USERNAME'] = 'your-email@gmail.com'
 app.config['MAIL_PASSWORD'] = 'your-email-password'
-mail = Mail(app)
-
-# Connect to MongoDB
-client = MongoClient('mongodb://localhost:27017/')
-db = client['fuel_demand_db']
-predictions_collection = db['predictions']
-users_collection = db['users']
-
-users_collection.update_many({}, {'$set': {'role': 'user'}})
-predictions_collection = db['predictions']
-
-# Insert admin user
-users_collection.insert_one({
-    'username': 'admin',
-    'password': 'adminpassword',
-    'role': 'admin'
-})
-
-# Train the model when the app starts
-model = train_model()
-
-# Configure rate limiting
-limiter = Limiter(
-    app=app,
-    key_func=get_remote_address,
-    default_limits=["200 per day", "50 per hour"]
-)
+mail = None
+
+# Send prediction emails from a background queue, one digest per user per window
+app.config['NOTIFICATION_SENDER'] = 'your-email@gmail.com'
+app.config['NOTIFICATION_DIGEST_SECONDS'] = 60.0
+app.config['NOTIFICATION_MAX_QUEUE'] = 10000
+notification_queue = None
+
+# MongoDB; connected by create_app() in each serving process
+app.config['MONGO_URI'] = os.environ.get('MONGO_URI', 'mongodb://localhost:27017/')
+app.config['MONGO_DB'] = 'fuel_demand_db'  # unless MONGO_URI names a database
+client = None
+db = None
+predictions_collection = None
+users_collection = None
+
+# Users, with the admin account created on first start
+app.config['ADMIN_USERNAME'] = 'admin'
+app.config['ADMIN_PASSWORD'] = 'adminpassword'
+app.config['USER_CACHE_SIZE'] = 10000
+app.config['USER_CACHE_TTL'] = 60.0
+user_directory = None
+
+# Write prediction records behind the request, in bulk
+app.config['PREDICTION_WRITE_BATCH_SIZE'] = 500
+app.config['PREDICTION_WRITE_INTERVAL_SECONDS'] = 1.0
+app.config['PREDICTION_WRITE_MAX_QUEUE'] = 10000
+app.config['PREDICTION_WRITE_OVERFLOW'] = 'spill'  # 'spill', 'block' or 'drop'
+app.config['PREDICTION_SPILL_PATH'] = 'spill/predictions.ndjson'
+prediction_writer = None
+
+# Load the model for the current training data, training it only if no artifact matches
+app.config['MODEL_REGISTRY_DIR'] = 'models'
+# Candidates are cross-validated in a process pool and the most accurate one within the
+# budget is served; set max_predict_seconds to rule out models too slow per request
+app.config['TRAINING_SELECTION'] = {
+    'candidates': ['linear', 'hist_gradient_boosting', 'random_forest'],
+    'n_splits': 5,
+    'budget_seconds': 300.0,
+    'max_predict_seconds': None
+}
+# Approximate mode: /predict interpolates in a precomputed grid instead of running the
+# model. PREDICTION_MODE is the default; requests can override it with ?mode=
+app.config['LOOKUP_GRID_STEPS'] = {'temperature': 128, 'fuel_price': 128}
+app.config['PREDICTION_MODE'] = 'exact'  # 'exact' or 'approximate'
+registry = None
+
+def train_and_load():
+    df, arrays = load_training_data(db['data'])
+    return registry.load_or_train(
+        df,
+        selection=app.config['TRAINING_SELECTION'],
+        lookup=app.config['LOOKUP_GRID_STEPS'],
+        arrays=arrays
+    )
+
+model_slot = ModelSlot()
+
+# Cache predictions per model version; set PREDICTION_CACHE_REDIS_URL to share it across workers
+app.config['PREDICTION_CACHE_SIZE'] = 10000
+app.config['PREDICTION_CACHE_TTL'] = 300
+app.config['PREDICTION_CACHE_RESOLUTION'] = {'temperature': 0.1, 'fuel_price': 0.01}
+app.config['PREDICTION_CACHE_REDIS_URL'] = os.environ.get('PREDICTION_CACHE_REDIS_URL')
+prediction_cache = None
+
+# Retrain in the background, coalescing bursts of /update-data calls; job status is kept
+# on disk so any worker can answer /update-data/status
+app.config['RETRAIN_DEBOUNCE_SECONDS'] = 5.0
+app.config['RETRAIN_MIN_INTERVAL_SECONDS'] = 60.0
+app.config['RETRAIN_JOB_DIR'] = None  # defaults to <MODEL_REGISTRY_DIR>/jobs
+retrain_scheduler = None
+
+# Pick up models retrained by other worker processes
+app.config['MODEL_RELOAD_INTERVAL_SECONDS'] = 5.0
+registry_watcher = None
+
+# Drift of live inputs and predictions against the training set, per worker process;
+# set DRIFT_RETRAIN to submit a retrain when it is detected
+app.config['DRIFT_PSI_THRESHOLD'] = 0.25
+app.config['DRIFT_MIN_SAMPLES'] = 1000
+app.config['DRIFT_RETRAIN'] = False
+app.config['DRIFT_CHECK_INTERVAL_SECONDS'] = 60.0
+drift_monitor = None
+drift_watcher = None
+
+# Weather lookups for /predict requests that give a city instead of a temperature
+app.config['WEATHER_API_KEY'] = os.environ.get('WEATHER_API_KEY')
+app.config['WEATHER_API_URL'] = os.environ.get('WEATHER_API_URL', 'http://api.openweathermap.org/data/2.5/weather')
+app.config['WEATHER_CACHE_TTL'] = 600
+app.config['WEATHER_STALE_TTL'] = 3600
+app.config['WEATHER_CONNECT_TIMEOUT'] = 2.0
+app.config['WEATHER_READ_TIMEOUT'] = 3.0
+weather_client = None
+
+# Rate limits per user and role, anonymous requests per client address; set
+# RATE_LIMIT_REDIS_URL to count them across workers
+app.config['RATE_LIMIT_QUOTAS'] = dict(DEFAULT_QUOTAS)
+app.config['RATE_LIMIT_LEASE_SIZE'] = 100
+app.config['RATE_LIMIT_REDIS_URL'] = os.environ.get('RATE_LIMIT_REDIS_URL')
+
+def rate_limit_key():
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        # Bad tokens are rejected by the endpoint itself; count them as anonymous
+        identity = None
+    if identity is None:
+        return request.remote_addr, 'anonymous'
+    return identity, get_jwt().get('role') or user_directory.role(identity) or 'user'
+
+# Registered now so it runs before every request; its store and quotas are set by
+# build_services()
+limiter = RateLimiter(key_func=rate_limit_key).init_app(app)
+
+_services_built = False
+
+def build_services():
+    # Built from app.config once per process, after create_app() or preload() applied
+    # their configuration; a pre-fork master builds them for every worker
+    global mail, notification_queue, registry, prediction_cache, retrain_scheduler
+    global registry_watcher, drift_monitor, drift_watcher, weather_client, _services_built
+    if _services_built:
+        return
+    _services_built = True
+    metrics.configure(app.config['METRICS_DIR'])
+    mail = Mail(app)
+    notification_queue = NotificationQueue(
+        app, mail,
+        sender=app.config['NOTIFICATION_SENDER'],
+        digest_window=app.config['NOTIFICATION_DIGEST_SECONDS'],
+        max_queue=app.config['NOTIFICATION_MAX_QUEUE']
+    )
+    registry = ModelRegistry(app.config['MODEL_REGISTRY_DIR'])
+    if app.config['PREDICTION_CACHE_REDIS_URL']:
+        cache_backend = RedisCacheBackend(
+            redis.Redis.from_url(app.config['PREDICTION_CACHE_REDIS_URL']),
+            ttl=app.config['PREDICTION_CACHE_TTL']
+        )
+    else:
+        cache_backend = LocalCacheBackend(
+            maxsize=app.config['PREDICTION_CACHE_SIZE'],
+            ttl=app.config['PREDICTION_CACHE_TTL']
+        )
+    prediction_cache = PredictionCache(cache_backend, app.config['PREDICTION_CACHE_RESOLUTION'])
+    model_slot.subscribe(prediction_cache.on_publish)
+    retrain_scheduler = RetrainScheduler(
+        train_and_load,
+        model_slot,
+        debounce=app.config['RETRAIN_DEBOUNCE_SECONDS'],
+        min_interval=app.config['RETRAIN_MIN_INTERVAL_SECONDS'],
+        store=JobStore(app.config['RETRAIN_JOB_DIR'] or os.path.join(app.config['MODEL_REGISTRY_DIR'], 'jobs'))
+    )
+    registry_watcher = RegistryWatcher(
+        registry, model_slot,
+        lambda key: registry.load_published(key, lookup=app.config['LOOKUP_GRID_STEPS']),
+        interval=app.config['MODEL_RELOAD_INTERVAL_SECONDS']
+    )
+    drift_monitor = DriftMonitor(
+        threshold=app.config['DRIFT_PSI_THRESHOLD'],
+        min_samples=app.config['DRIFT_MIN_SAMPLES']
+    )
+    model_slot.subscribe(drift_monitor.on_publish)
+    drift_watcher = DriftWatcher(
+        drift_monitor,
+        retrain_scheduler.submit,
+        interval=app.config['DRIFT_CHECK_INTERVAL_SECONDS']
+    )
+    weather_client = WeatherClient(
+        app.config['WEATHER_API_KEY'],
+        url=app.config['WEATHER_API_URL'],
+        ttl=app.config['WEATHER_CACHE_TTL'],
+        stale_ttl=app.config['WEATHER_STALE_TTL'],
+        connect_timeout=app.config['WEATHER_CONNECT_TIMEOUT'],
+        read_timeout=app.config['WEATHER_READ_TIMEOUT']
+    )
+    if app.config['RATE_LIMIT_REDIS_URL']:
+        quota_store = RedisQuotaStore(redis.Redis.from_url(app.config['RATE_LIMIT_REDIS_URL']))
+    else:
+        quota_store = LocalQuotaStore()
+    limiter.configure(
+        quota_store,
+        quotas=app.config['RATE_LIMIT_QUOTAS'],
+        lease_size=app.config['RATE_LIMIT_LEASE_SIZE']
+    )
+
+def connect_database():
+    global client, db, predictions_collection, users_collection, user_directory
+    client = MongoClient(app.config['MONGO_URI'])
+    db = client.get_default_database(app.config['MONGO_DB'])
+    predictions_collection = db['predictions']
+    users_collection = db['users']
+    user_directory = UserDirectory(
+        users_collection,
+        LocalCacheBackend(maxsize=app.config['USER_CACHE_SIZE'], ttl=app.config['USER_CACHE_TTL'])
+    )
+
+def prepare_database():
+    # Run once per deployment start rather than once per worker; idempotent
+    ensure_prediction_indexes(predictions_collection)
+    user_directory.bootstrap(app.config['ADMIN_USERNAME'], app.config['ADMIN_PASSWORD'])
+
+def load_model():
+    published = train_and_load()
+    if published is not None:
+        model_slot.publish(published)
+
+def train_in_child():
+    # Training runs in a short-lived child, so the master never starts the training
+    # pool's forkserver or holds the training frame that every worker would inherit.
+    # The child leaves the artifact in the registry for the master to load.
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            connect_database()
+            code = 0 if train_and_load() is not None else 1
+        except BaseException:
+            logger.exception("Training before fork failed")
+        finally:
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    if status != 0:
+        logger.error(f"Training before fork exited with status {status}")
+
+def preload(config=None):
+    # For a pre-fork master: database setup and the model, loaded once and inherited by
+    # every worker. The Mongo connection is closed again because its sockets and
+    # monitor threads do not survive fork.
+    global client
+    app.config.update(config or {})
+    build_services()
+    connect_database()
+    prepare_database()
+    client.close()
+    client = None
+    train_in_child()
+    key = registry.current_key()
+    if key is None:
+        return
+    try:
+        model_slot.publish(registry.load_published(key, lookup=app.config['LOOKUP_GRID_STEPS']))
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+
+_services_started = False
+
+def start_services():
+    # Background threads belong to the process that starts them, so each worker starts
+    # its own after fork
+    global prediction_writer, _services_started
+    if _services_started:
+        return
+    _services_started = True
+    access_log_listener.start()
+    atexit.register(access_log_listener.stop)
+    notification_queue.start()
+    atexit.register(notification_queue.close)
+    prediction_writer = WriteBehindWriter(
+        predictions_collection,
+        batch_size=app.config['PREDICTION_WRITE_BATCH_SIZE'],
+        flush_interval=app.config['PREDICTION_WRITE_INTERVAL_SECONDS'],
+        max_queue=app.config['PREDICTION_WRITE_MAX_QUEUE'],
+        spill_path=app.config['PREDICTION_SPILL_PATH'],
+        overflow=app.config['PREDICTION_WRITE_OVERFLOW']
+    ).start()
+    atexit.register(prediction_writer.close)
+    retrain_scheduler.start()
+    registry_watcher.start()
+    if app.config['DRIFT_RETRAIN']:
+        drift_watcher.start()
+    atexit.register(weather_client.close)
+
+def create_app(config=None):
+    # Builds the services, connects, loads the model unless preload() already did in
+    # this process or its parent, and starts the background services. Call once per
+    # serving process; configuration given after the first call is not picked up.
+    app.config.update(config or {})
+    build_services()
+    if client is None:
+        connect_database()
+    if model_slot.current is None:
+        prepare_database()
+        load_model()
+    start_services()
+    return app
+
+def health_status():
+    # Liveness: the process answers. Readiness: it has a model to predict with.
+    published = model_slot.current
+    if published is None:
+        return {'status': 'unavailable', 'model_loaded': False}, 503
+    return {'status': 'ready', 'model_loaded': True, 'model_version': published.version}, 200
 
 # Define the schema for data validation
 class UpdateDataSchema(Schema):
@@ -80,19 +387,25 @@ update_data_schema = UpdateDataSchema()
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        current_user = get_jwt_identity()
-        user = users_collection.find_one({'username': current_user})
-        if not user or user['role'] != 'admin':
+        role = get_jwt().get('role')
+        if role is None:
+            # Tokens issued before the role was a claim
+            role = user_directory.role(get_jwt_identity())
+        if role != 'admin':
             return jsonify({'error': 'Admin access required'}), 403
         return f(*args, **kwargs)
     return decorated_function
 
-# Track API usage
-api_usage = defaultdict(int)
+@app.route('/healthz', methods=['GET'])
+@limiter.exempt
+def healthz():
+    return jsonify({'status': 'ok'}), 200
 
-@app.before_request
-def track_api_usage():
-    api_usage[request.endpoint] += 1
+@app.route('/readyz', methods=['GET'])
+@limiter.exempt
+def readyz():
+    body, status = health_status()
+    return jsonify(body), status
 
 # User registration endpoint
 @app.route('/register', methods=['POST'])
@@ -105,16 +418,9 @@ def register():
         if not username or not password:
             return jsonify({'error': 'Username and password are required'}), 400
 
-        # Check if user already exists
-        if users_collection.find_one({'username': username}):
+        # Save user to MongoDB; the unique index rejects existing usernames
+        if not user_directory.register(username, password):
             return jsonify({'error': 'Username already exists'}), 400
-
-        # Save user to MongoDB
-        users_collection.insert_one({
-            'username': username,
-            'password': password,
-            'role': 'user'  # Default role
-        })
         return jsonify({'message': 'User registered successfully'}), 201
     except Exception as e:
         logger.error(f"Error: {str(e)}")
@@ -129,68 +435,194 @@ def login():
         password = data.get('password')
 
         # Check if user exists
-        user = users_collection.find_one({'username': username, 'password': password})
+        user = user_directory.authenticate(username, password)
         if not user:
             return jsonify({'error': 'Invalid username or password'}), 401
 
-        # Generate JWT token
-        access_token = create_access_token(identity=username)
+        # Generate JWT token; the role rides along so admin checks need no lookup
+        access_token = create_access_token(identity=username, additional_claims={'role': user.get('role', 'user')})
         return jsonify({'access_token': access_token}), 200
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 # Validate prediction input
-prediction_schema = PredictionInputSchema()
+prediction_schema = SinglePredictionSchema()
 
 @app.route('/predict', methods=['POST'])
 @jwt_required()
 def predict():
     try:
-        # Validate input data
-        errors = prediction_schema.validate(request.json)
-        if errors:
-            return jsonify({'error': errors}), 400
-        data = request.json
-        # Make a prediction
-        prediction = predict_fuel_demand(model, data['temperature'], data['holiday'], data['fuel_price'])
+        # Validate input data; load() also converts numeric strings such as "22.0"
+        with metrics.span('predict.validate'):
+            try:
+                data = prediction_schema.load(request.json)
+            except ValidationError as err:
+                return jsonify({'error': err.messages}), 400
+        mode = request.args.get('mode', app.config['PREDICTION_MODE'])
+        if mode not in ('exact', 'approximate'):
+            return jsonify({'error': 'mode must be exact or approximate'}), 400
+        published = model_slot.current
+        if published is None:
+            return jsonify({'error': 'Model not available'}), 503
+        # Fill in the current temperature for the city
+        if 'temperature' not in data:
+            with metrics.span('predict.weather'):
+                try:
+                    data['temperature'] = weather_client.get(data['city'])['temperature']
+                except UnknownCity as e:
+                    return jsonify({'error': str(e)}), 400
+                except WeatherUnavailable as e:
+                    return jsonify({'error': str(e)}), 503
+        # Interpolate in the grid when asked to; outside it, fall back to the model
+        prediction = None
+        if mode == 'approximate' and published.lookup is not None:
+            prediction = published.lookup.predict_one(data['temperature'], data['holiday'], data['fuel_price'])
+        if prediction is None:
+            mode = 'exact'
+            # Make a prediction, or reuse one for the same model and nearby inputs
+            with metrics.span('predict.inference'):
+                prediction = prediction_cache.get_or_compute(
+                    published.version, data['temperature'], data['holiday'], data['fuel_price'],
+                    lambda temperature, holiday, fuel_price: predict_fuel_demand(published.engine, temperature, holiday, fuel_price)
+                )
+        with metrics.span('predict.monitor'):
+            drift_monitor.observe(published.version, data['temperature'], data['holiday'], data['fuel_price'], prediction)
         # Store the prediction in MongoDB
         prediction_record = {
             'input_data': data,
             'prediction': prediction,
-            'user': get_jwt_identity()
+            'model_version': published.version,
+            'mode': mode,
+            'user': get_jwt_identity(),
+            'timestamp': datetime.now(timezone.utc)
         }
-        predictions_collection.insert_one(prediction_record)
+        with metrics.span('predict.mongo_write'):
+            prediction_writer.write(prediction_record)
         # Send email notification
-        send_email_notification(get_jwt_identity(), prediction)
-        return jsonify({'prediction': prediction})
+        with metrics.span('predict.email'):
+            send_email_notification(get_jwt_identity(), prediction)
+        return jsonify({'prediction': prediction, 'model_version': published.version, 'mode': mode})
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+# Validate batch prediction input
+prediction_batch_schema = PredictionInputSchema(many=True)
+prediction_row_schema = PredictionInputSchema()
+
+# Rows per validation/inference/insert chunk for NDJSON batches
+app.config['BATCH_CHUNK_SIZE'] = 1000
+
+# Prediction history paging
+app.config['HISTORY_MAX_PAGE_SIZE'] = 1000
+app.config['HISTORY_EXPORT_BATCH_SIZE'] = 1000
+
+@app.route('/predict/batch', methods=['POST'])
+@jwt_required()
+def predict_batch():
+    try:
+        user = get_jwt_identity()
+        # The whole batch is served by one model version
+        published = model_slot.current
+        if published is None:
+            return jsonify({'error': 'Model not available'}), 503
+        # Chunked NDJSON in, NDJSON out, in bounded memory
+        if request.mimetype == 'application/x-ndjson':
+            return Response(
+                stream_with_context(stream_batch_predictions(user, published)),
+                mimetype='application/x-ndjson'
+            )
+        # Validate input data
+        try:
+            data = prediction_batch_schema.load(request.json)
+        except ValidationError as err:
+            return jsonify({'error': err.messages}), 400
+        if not data:
+            return jsonify({'predictions': [], 'model_version': published.version})
+        # Make the predictions
+        predictions = predict_fuel_demand_batch(published.engine, data)
+        if predictions is None:
+            return jsonify({'error': 'Batch prediction failed'}), 500
+        predictions = predictions.tolist()
+        drift_monitor.observe_many(published.version, data, predictions)
+        # Store the predictions in MongoDB
+        store_batch_predictions(user, published, data, predictions)
+        return jsonify({'predictions': predictions, 'model_version': published.version})
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def stream_batch_predictions(user, published):
+    chunk_size = app.config['BATCH_CHUNK_SIZE']
+    chunk = []
+    for line in request.stream:
+        line = line.strip()
+        if not line:
+            continue
+        chunk.append(line)
+        if len(chunk) >= chunk_size:
+            yield predict_ndjson_chunk(user, published, chunk)
+            chunk = []
+    if chunk:
+        yield predict_ndjson_chunk(user, published, chunk)
+
+def predict_ndjson_chunk(user, published, lines):
+    # One output line per input line, in input order
+    results = [None] * len(lines)
+    valid = []
+    for i, line in enumerate(lines):
+        try:
+            row = json.loads(line)
+        except ValueError:
+            results[i] = {'error': 'Invalid JSON'}
+            continue
+        try:
+            valid.append((i, prediction_row_schema.load(row)))
+        except ValidationError as err:
+            results[i] = {'error': err.messages}
+    if valid:
+        valid_rows = [row for _, row in valid]
+        predictions = predict_fuel_demand_batch(published.engine, valid_rows)
+        if predictions is None:
+            for i, _ in valid:
+                results[i] = {'error': 'Batch prediction failed'}
+        else:
+            predictions = predictions.tolist()
+            for (i, _), prediction in zip(valid, predictions):
+                results[i] = {'prediction': prediction, 'model_version': published.version}
+            drift_monitor.observe_many(published.version, valid_rows, predictions)
+            store_batch_predictions(user, published, valid_rows, predictions)
+    return ''.join(json.dumps(result) + '\n' for result in results)
+
+def store_batch_predictions(user, published, rows, predictions):
+    timestamp = datetime.now(timezone.utc)
+    prediction_writer.write_many([{
+        'input_data': row,
+        'prediction': prediction,
+        'model_version': published.version,
+        'user': user,
+        'timestamp': timestamp
+    } for row, prediction in zip(rows, predictions)])
+
 def send_email_notification(username, prediction):
-    msg = Message(
-        subject='New Fuel Demand Prediction',
-        sender='your-email@gmail.com',
-        recipients=[f'{username}@example.com']  # Replace with actual email logic
-    )
-    msg.body = f'A new fuel demand prediction has been made: {prediction}'
-    mail.send(msg)
+    # Never blocks: the notification worker owns the SMTP conversation
+    notification_queue.notify(username, prediction)
 
 @app.route('/predictions', methods=['GET'])
 @jwt_required()
 def get_predictions():
     try:
         user = get_jwt_identity()
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 10))
-        skip = (page - 1) * per_page
-        predictions = list(predictions_collection.find({'user': user}, {'_id': 0}).skip(skip).limit(per_page))
-        predictions_collection.update_many({}, {'$set': {'timestamp': datetime.now()}})
-        return jsonify(predictions), 200
+        per_page = max(1, min(int(request.args.get('per_page', 10)), app.config['HISTORY_MAX_PAGE_SIZE']))
+        # Keyset pagination: pass the returned 'next' token as ?cursor= for the following page
+        predictions, next_token = fetch_page(predictions_collection, {'user': user}, per_page, request.args.get('cursor'))
+        return jsonify({'predictions': predictions, 'next': next_token}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error: {str(e)}")
-        return jsonify({'error': str(e)}), 500    
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/update-data', methods=['POST'])
 @jwt_required()
@@ -204,10 +636,24 @@ def update_data():
         data = request.json
         # Save new data to MongoDB
         db['data'].insert_one(data)
-        # Retrain the model
-        global model
-        model = train_model()
-        return jsonify({'message': 'Data updated and model retrained'}), 200
+        # Retrain the model in the background
+        job_id = retrain_scheduler.submit()
+        return jsonify({'message': 'Data updated and model retraining scheduled', 'job_id': job_id}), 202
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/update-data/status/<job_id>', methods=['GET'])
+@jwt_required()
+@admin_required
+def update_data_status(job_id):
+    try:
+        job = retrain_scheduler.status(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        published = model_slot.current
+        job['serving_version'] = published.version if published else None
+        return jsonify(job), 200
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -230,20 +676,39 @@ def get_all_users():
 @admin_required
 def get_all_predictions():
     try:
-        predictions = list(predictions_collection.find({}, {'_id': 0}))
-        return jsonify(predictions), 200
+        # Full export, streamed from the cursor in constant memory
+        if request.args.get('format') == 'ndjson':
+            return Response(
+                stream_with_context(stream_predictions_ndjson(request.args.get('cursor'))),
+                mimetype='application/x-ndjson'
+            )
+        per_page = max(1, min(int(request.args.get('per_page', 100)), app.config['HISTORY_MAX_PAGE_SIZE']))
+        predictions, next_token = fetch_page(predictions_collection, {}, per_page, request.args.get('cursor'))
+        return jsonify({'predictions': predictions, 'next': next_token}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def stream_predictions_ndjson(token):
+    batch_size = app.config['HISTORY_EXPORT_BATCH_SIZE']
+    lines = []
+    for document in iter_documents(predictions_collection, {}, batch_size, token):
+        lines.append(app.json.dumps(document))
+        if len(lines) >= batch_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
 # Admin endpoint to delete a user
 @app.route('/admin/delete-user/<username>', methods=['DELETE'])
 @jwt_required()
 @admin_required
 def delete_user(username):
     try:
-        result = users_collection.delete_one({'username': username})
-        if result.deleted_count == 0:
+        if not user_directory.delete(username):
             return jsonify({'error': 'User not found'}), 404
         return jsonify({'message': 'User deleted'}), 200
     except Exception as e:
@@ -256,23 +721,104 @@ def delete_user(username):
 @admin_required
 def get_api_usage():
     try:
-        return jsonify(dict(api_usage)), 200
+        # Request counts per endpoint, across every worker reporting to METRICS_DIR
+        return jsonify(metrics.counter_totals('http_requests_total', 'endpoint')), 200
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-def fetch_weather_data(api_key, city):
-    url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={api_key}&units=metric"
-    response = requests.get(url)
-    if response.status_code == 200:
-        data = response.json()
-        return {
-            'temperature': data['main']['temp'],
-            'humidity': data['main']['humidity'],
-            'weather_condition': data['weather'][0]['main']
-        }
-    else:
-        raise Exception(f"Failed to fetch weather data: {response.status_code}")
+# Admin endpoint to expose metrics in Prometheus text format
+@app.route('/admin/metrics', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_metrics():
+    try:
+        return Response(metrics.exposition(), mimetype='text/plain; version=0.0.4')
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+# Admin endpoint to get prediction cache statistics
+@app.route('/admin/cache-stats', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_cache_stats():
+    try:
+        return jsonify(prediction_cache.stats()), 200
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+# Admin endpoint to get the approximate-mode grid and its measured error
+@app.route('/admin/lookup-stats', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_lookup_stats():
+    try:
+        published = model_slot.current
+        if published is None or published.lookup is None:
+            return jsonify({'error': 'No lookup table available'}), 404
+        return jsonify({'model_version': published.version, **published.lookup.report}), 200
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+# Admin endpoint to get prediction write-behind statistics
+@app.route('/admin/write-stats', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_write_stats():
+    try:
+        return jsonify(prediction_writer.stats()), 200
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+# Admin endpoint to get email notification statistics
+@app.route('/admin/notification-stats', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_notification_stats():
+    try:
+        return jsonify(notification_queue.stats()), 200
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+# Admin endpoint to get drift of live inputs and predictions from the training data
+@app.route('/admin/drift', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_drift():
+    try:
+        report = drift_monitor.report()
+        report['retrain_job_id'] = drift_watcher.triggered.get(report['model_version'])
+        return jsonify(report), 200
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+# Admin endpoint to get rate limiter statistics
+@app.route('/admin/rate-limit-stats', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_rate_limit_stats():
+    try:
+        return jsonify(limiter.stats()), 200
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+# Admin endpoint to get weather client statistics
+@app.route('/admin/weather-stats', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_weather_stats():
+    try:
+        return jsonify(weather_client.stats()), 200
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
 
 # Swagger UI configuration
 SWAGGER_URL = '/api/docs'  # URL for accessing Swagger UI
@@ -293,6 +839,6 @@ app.register_blueprint(swaggerui_blueprint, url_prefix=SWAGGER_URL)
 def serve_swagger():
     return app.send_static_file('swagger.yaml')
 
-# Run the app
+# Run the app with the development server; see serve.py for production
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
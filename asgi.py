@@ -0,0 +1,144 @@
+import sys
+from anyio import CapacityLimiter, from_thread, to_thread
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+from werkzeug.exceptions import ClientDisconnected
+
+class RequestBody:
+    # wsgi.input over the ASGI receive channel. Read from the WSGI app's worker thread;
+    # each http.request message is pulled from the event loop only when the app asks
+    # for more, so a streamed upload is never held in memory as a whole.
+    def __init__(self, receive):
+        self.receive = receive
+        self.buffer = bytearray()
+        self.done = False
+
+    def _pull(self):
+        message = from_thread.run(self.receive)
+        if message['type'] == 'http.disconnect':
+            self.done = True
+            raise ClientDisconnected()
+        self.buffer.extend(message.get('body', b''))
+        self.done = not message.get('more_body', False)
+
+    def _take(self, size):
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def read(self, size=-1):
+        while not self.done and (size is None or size < 0 or len(self.buffer) < size):
+            self._pull()
+        return self._take(len(self.buffer) if size is None or size < 0 else size)
+
+    def readline(self, size=-1):
+        while True:
+            end = self.buffer.find(b'\n') + 1
+            if end or self.done or (size is not None and 0 <= size <= len(self.buffer)):
+                break
+            self._pull()
+        if not end:
+            end = len(self.buffer)
+        if size is not None and size >= 0:
+            end = min(end, size)
+        return self._take(end)
+
+    def readlines(self, hint=-1):
+        return list(self)
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            yield line
+
+class ThreadPoolWSGI:
+    # Serves a WSGI app from an ASGI server. Each call into the WSGI app, and each pull
+    # of a streamed response chunk, runs on a worker thread under one CapacityLimiter,
+    # so at most `threads` requests compute at once while the event loop stays free to
+    # accept connections and answer health checks. The request body is streamed to the
+    # app as it reads it.
+    def __init__(self, wsgi_app, threads):
+        self.wsgi_app = wsgi_app
+        self.limiter = CapacityLimiter(threads)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        environ = self.environ(scope, RequestBody(receive))
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+        def call():
+            chunks = self.wsgi_app(environ, start_response)
+            return chunks, iter(chunks)
+
+        chunks, iterator = await to_thread.run_sync(call, limiter=self.limiter)
+        try:
+            first = await to_thread.run_sync(next, iterator, None, limiter=self.limiter)
+            await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+            chunk = first
+            while chunk is not None:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                chunk = await to_thread.run_sync(next, iterator, None, limiter=self.limiter)
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(chunks, 'close'):
+                await to_thread.run_sync(chunks.close, limiter=self.limiter)
+
+    @staticmethod
+    def environ(scope, body):
+        # The server ends the body, so Flask reads it without a Content-Length (chunked
+        # uploads); one is passed on only if the client sent it
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.input_terminated': True,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False
+        }
+        for name, value in scope['headers']:
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                environ[name] = value
+            else:
+                key = f'HTTP_{name}'
+                environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+def create_asgi_app(wsgi_app, health_status, threads=8):
+    # Health checks are answered on the event loop, so they stay responsive while every
+    # inference thread is busy; everything else goes to the WSGI app
+    async def healthz(request):
+        return JSONResponse({'status': 'ok'})
+
+    async def readyz(request):
+        body, status = health_status()
+        return JSONResponse(body, status_code=status)
+
+    return Starlette(routes=[
+        Route('/healthz', healthz),
+        Route('/readyz', readyz),
+        Mount('/', app=ThreadPoolWSGI(wsgi_app, threads))
+    ])
@@ -0,0 +1,77 @@
+# Parse/load time of training data: the old path (parse the whole source file on every
+# train_model call) against the columnar cache (parse once, then memory-mapped loads),
+# and appending /update-data rows against re-reading the whole collection. The Mongo
+# stand-in scans every document for the _id range query that a real server answers
+# from its index, so the append figure is an upper bound.
+# Run from the repository root: python benchmarks/bench_dataset.py [csv_rows] [xlsx_rows]
+import os
+import sys
+import tempfile
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import InMemoryMongoClient, synthetic_frame
+from dataset import TrainingDataStore
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def old_csv(path):
+    df = pd.read_csv(path)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return df
+
+def old_xlsx(path):
+    df = pd.read_excel(path)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return df
+
+def compare(label, path, old):
+    old_seconds, df = timed(lambda: old(path))
+    store = TrainingDataStore(path)
+    start = time.perf_counter()
+    store.base()
+    build_seconds = time.perf_counter() - start
+    warm_seconds, _ = timed(lambda: TrainingDataStore(path).frame(include_ingested=False))
+    print(f"{label}: {len(df)} rows, {os.path.getsize(path) / 2**20:.1f} MiB")
+    print(f"  old parse per load:        {old_seconds * 1000:9.1f} ms")
+    print(f"  cache build (once):        {build_seconds * 1000:9.1f} ms")
+    print(f"  cached load per load:      {warm_seconds * 1000:9.1f} ms  ({old_seconds / warm_seconds:.0f}x)")
+
+def compare_ingest(root, rows, batch):
+    collection = InMemoryMongoClient()['bench']['data']
+    for row in synthetic_frame(rows, seed=1).drop(columns='timestamp').to_dict('records'):
+        collection.insert_one(row)
+    store = TrainingDataStore(os.path.join(root, 'history.csv'))
+    store.sync(collection)
+    for row in synthetic_frame(batch, seed=2).drop(columns='timestamp').to_dict('records'):
+        collection.insert_one(row)
+    full_seconds, _ = timed(lambda: pd.DataFrame(list(collection.find({}, {'_id': 0}))), repeat=1)
+    start = time.perf_counter()
+    store.sync(collection)
+    store.ingested.frame()
+    incremental_seconds = time.perf_counter() - start
+    print(f"ingested: {rows} rows in Mongo, {batch} new")
+    print(f"  re-read whole collection:  {full_seconds * 1000:9.1f} ms")
+    print(f"  append since watermark:    {incremental_seconds * 1000:9.1f} ms")
+
+def main():
+    csv_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    xlsx_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'history.csv')
+        synthetic_frame(csv_rows).to_csv(path, index=False)
+        compare('csv', path, old_csv)
+        path = os.path.join(root, 'history.xlsx')
+        synthetic_frame(xlsx_rows).to_excel(path, index=False)
+        compare('xlsx', path, old_xlsx)
+        compare_ingest(root, 20000, 100)
+
+if __name__ == '__main__':
+    main()
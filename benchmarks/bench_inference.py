@@ -0,0 +1,55 @@
+# Per-row latency of the sklearn /predict path against the compiled forest engine.
+# Run from the repository root: python benchmarks/bench_inference.py
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from inference import compile_forest
+from model import FEATURES
+
+def per_row_us(fn, rows):
+    start = time.perf_counter()
+    for row in rows:
+        fn(row)
+    return (time.perf_counter() - start) / len(rows) * 1e6
+
+def main():
+    rng = np.random.default_rng(0)
+    n = 5000
+    train = pd.DataFrame({
+        'temperature': rng.uniform(-10, 45, n),
+        'holiday': rng.integers(0, 2, n),
+        'fuel_price': rng.uniform(1.0, 2.2, n)
+    })
+    y = 1000 + 10 * train['temperature'] + 200 * train['holiday'] - 150 * train['fuel_price'] + rng.normal(0, 30, n)
+    model = RandomForestRegressor(n_estimators=100, random_state=42).fit(train[FEATURES], y)
+    engine = compile_forest(model)
+    queries = train[FEATURES].to_numpy()[:2000]
+
+    def sklearn_one(row):
+        return model.predict(pd.DataFrame([{
+            'temperature': row[0], 'holiday': row[1], 'fuel_price': row[2]
+        }]))[0]
+
+    results = {
+        'sklearn DataFrame, 1 row': per_row_us(sklearn_one, queries[:100]),
+        'engine.predict_one': per_row_us(lambda row: engine.predict_one(row[0], row[1], row[2]), queries),
+    }
+    start = time.perf_counter()
+    model.predict(pd.DataFrame(queries, columns=FEATURES))
+    results['sklearn batch, per row'] = (time.perf_counter() - start) / len(queries) * 1e6
+    start = time.perf_counter()
+    engine.predict(queries)
+    results['engine.predict batch, per row'] = (time.perf_counter() - start) / len(queries) * 1e6
+
+    print(f"forest: {engine.n_trees} trees, {len(engine.value)} nodes, max depth {engine.max_depth}")
+    baseline = results['sklearn DataFrame, 1 row']
+    for name, us in results.items():
+        print(f"{name:32s} {us:10.1f} us/row  {baseline / us:7.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# Cost of one DriftMonitor.observe call on the /predict path, from one thread and from
+# several at once, and of building the /admin/drift report.
+# Run from the repository root: python benchmarks/bench_monitoring.py [observations] [threads]
+import os
+import sys
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from monitoring import DriftMonitor, build_profile
+from registry import PublishedModel
+
+def synthetic_frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'temperature': rng.uniform(-10, 45, n),
+        'holiday': rng.integers(0, 2, n),
+        'fuel_price': rng.uniform(1.0, 2.2, n)
+    })
+    df['demand'] = 1000 + 10 * df['temperature'] + 200 * df['holiday'] - 150 * df['fuel_price'] + rng.normal(0, 30, n)
+    return df
+
+def observe_all(monitor, rows):
+    for temperature, holiday, fuel_price, demand in rows:
+        monitor.observe('bench', temperature, holiday, fuel_price, demand)
+
+def main():
+    observations = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    reference = synthetic_frame(100000)
+    monitor = DriftMonitor()
+    monitor.on_publish(PublishedModel('bench', None, None, None, build_profile(reference, reference['demand'])))
+    rows = synthetic_frame(observations, seed=1)[['temperature', 'holiday', 'fuel_price', 'demand']].to_numpy().tolist()
+
+    started = time.perf_counter()
+    observe_all(monitor, rows)
+    single = (time.perf_counter() - started) / len(rows)
+
+    per_thread = len(rows) // threads
+    workers = [threading.Thread(target=observe_all, args=(monitor, rows[i * per_thread:(i + 1) * per_thread]))
+               for i in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    contended = (time.perf_counter() - started) / (per_thread * threads)
+
+    started = time.perf_counter()
+    report = monitor.report()
+    report_seconds = time.perf_counter() - started
+    bins = sum(len(column['edges']) + 1 for column in monitor._state.profile['columns'].values())
+    print(f"observe, 1 thread:   {single * 1e6:6.2f} us")
+    print(f"observe, {threads} threads:  {contended * 1e6:6.2f} us (wall time per observation)")
+    print(f"report:              {report_seconds * 1e3:6.2f} ms over {report['observations']} observations")
+    print(f"state: {bins} bins per shard, {len(monitor._shards)} live shards")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# Per-request cost of the rate limit check: leased tokens against a round-trip per
+# request, and through a Flask request against the previous Flask-Limiter setup.
+# Run from the repository root: python benchmarks/bench_ratelimit.py [redis_url]
+# Without a Redis URL, a stand-in that sleeps for a LAN round-trip per pipeline is used.
+import os
+import sys
+import time
+import redis
+from flask import Flask, request
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from limits import parse_many
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ratelimit import RateLimiter, RedisQuotaStore
+
+ROUND_TRIP_SECONDS = 0.0003
+CHECKS = 20000
+
+class SlowRedis:
+    def __init__(self, round_trip):
+        self.round_trip = round_trip
+        self.data = {}
+
+    def pipeline(self, transaction=True):
+        return SlowPipeline(self)
+
+class SlowPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.results = []
+
+    def incrby(self, name, amount):
+        self.redis.data[name] = self.redis.data.get(name, 0) + amount
+        self.results.append(self.redis.data[name])
+
+    def expire(self, name, seconds):
+        self.results.append(True)
+
+    def execute(self):
+        time.sleep(self.redis.round_trip)
+        return self.results
+
+def time_checks(limiter, checks):
+    items = parse_many('10000000 per day;1000000 per hour')
+    started = time.perf_counter()
+    for i in range(checks):
+        limiter.hit(f'user:client-{i % 50}', items)
+    return (time.perf_counter() - started) / checks
+
+def time_requests(app, checks):
+    client = app.test_client()
+    started = time.perf_counter()
+    for i in range(checks):
+        client.get('/ping', headers={'X-User': f'client-{i % 50}'})
+    return (time.perf_counter() - started) / checks
+
+def flask_app(setup):
+    app = Flask(__name__)
+    setup(app)
+
+    @app.route('/ping')
+    def ping():
+        return 'ok'
+    return app
+
+def main():
+    if len(sys.argv) > 1:
+        client = redis.Redis.from_url(sys.argv[1])
+        client.flushdb()
+        label = sys.argv[1]
+    else:
+        client = SlowRedis(ROUND_TRIP_SECONDS)
+        label = f'stand-in, {ROUND_TRIP_SECONDS * 1e6:.0f}us round-trip'
+    print(f"store: {label}")
+    for lease_size in (1, 10, 100):
+        limiter = RateLimiter(RedisQuotaStore(client, prefix=f'bench-{lease_size}'), lease_size=lease_size)
+        per_check = time_checks(limiter, CHECKS)
+        stats = limiter.stats()
+        print(f"lease {lease_size:>3}: {per_check * 1e6:8.2f} us per check, "
+              f"{stats['store_calls'] / stats['allowed']:.3f} round-trips per check")
+
+    key_func = lambda: (request.headers['X-User'], 'user')
+    setups = {
+        'no limiter': lambda app: None,
+        'Flask-Limiter, memory': lambda app: Limiter(get_remote_address, app=app, default_limits=['10000000 per day', '1000000 per hour']),
+        'RateLimiter, lease 100': lambda app: RateLimiter(
+            RedisQuotaStore(client, prefix='bench-flask'), quotas={'user': '10000000 per day;1000000 per hour'},
+            key_func=key_func).init_app(app)
+    }
+    baseline = None
+    for name, setup in setups.items():
+        per_request = time_requests(flask_app(setup), CHECKS // 4)
+        baseline = baseline or per_request
+        print(f"{name:<24} {per_request * 1e6:8.1f} us per request (+{(per_request - baseline) * 1e6:.1f})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# Cold start (train + save) against warm start (memory-mapped load), and the memory each
+# forked worker pays for its model with and without memory mapping.
+# Run from the repository root: python benchmarks/bench_registry.py [rows] [workers]
+import os
+import sys
+import tempfile
+import time
+import joblib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from registry import ModelRegistry, artifact_key, data_fingerprint
+from model import MODEL_PARAMS
+
+def synthetic_frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'temperature': rng.uniform(-10, 45, n),
+        'holiday': rng.integers(0, 2, n),
+        'fuel_price': rng.uniform(1.0, 2.2, n)
+    })
+    df['demand'] = 1000 + 10 * df['temperature'] + 200 * df['holiday'] - 150 * df['fuel_price'] + rng.normal(0, 30, n)
+    return df
+
+def memory_kb():
+    # Rss counts shared pages in full for every process; Pss splits them between sharers
+    usage = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if name in ('Rss', 'Pss'):
+                usage[name] = int(rest.split()[0])
+    return usage
+
+def worker_memory(path, mmap_mode, workers):
+    # Each forked worker loads the engine and touches every array, like serving traffic
+    reads = []
+    for _ in range(workers):
+        read_fd, write_fd = os.pipe()
+        if os.fork() == 0:
+            os.close(read_fd)
+            before = memory_kb()
+            engine = joblib.load(os.path.join(path, 'engine.joblib'), mmap_mode=mmap_mode)
+            engine.predict(np.array([[20.0, 0, 1.5]] * 256))
+            checksum = float(engine.threshold.sum() + engine.value.sum() + engine.children.sum())
+            time.sleep(0.5)  # let all workers map the file before measuring Pss
+            after = memory_kb()
+            os.write(write_fd, f"{after['Rss'] - before['Rss']} {after['Pss'] - before['Pss']} {checksum}".encode())
+            os._exit(0)
+        os.close(write_fd)
+        reads.append(read_fd)
+    results = []
+    for fd in reads:
+        results.append(os.read(fd, 256).decode().split())
+        os.close(fd)
+    for _ in range(workers):
+        os.wait()
+    rss = [int(r[0]) for r in results]
+    pss = [int(r[1]) for r in results]
+    return sum(rss) / len(rss), sum(pss) / len(pss)
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    df = synthetic_frame(rows)
+    with tempfile.TemporaryDirectory() as root:
+        registry = ModelRegistry(root)
+        start = time.perf_counter()
+        registry.load_or_train(df, MODEL_PARAMS)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        registry.load_or_train(df, MODEL_PARAMS)
+        warm = time.perf_counter() - start
+        path = registry.path(artifact_key(data_fingerprint(df), MODEL_PARAMS))
+        size_mb = os.path.getsize(os.path.join(path, 'engine.joblib')) / 2**20
+        print(f"{rows} rows, engine artifact {size_mb:.1f} MiB")
+        print(f"cold start (train + save + load): {cold:8.2f} s")
+        print(f"warm start (hash + mmap load):    {warm:8.2f} s  ({cold / warm:.0f}x)")
+        for mmap_mode in (None, 'r'):
+            rss, pss = worker_memory(path, mmap_mode, workers)
+            label = 'mmap' if mmap_mode else 'copy'
+            print(f"engine per worker ({label}, {workers} workers): RSS +{rss / 1024:6.1f} MiB  PSS +{pss / 1024:6.1f} MiB")
+
+if __name__ == '__main__':
+    main()
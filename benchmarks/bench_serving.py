@@ -0,0 +1,105 @@
+# Requests per second through serve.py, threaded WSGI against ASGI, with Mongo
+# replaced by the in-memory stand-in so only the serving path is measured.
+# Run from the repository root: python benchmarks/bench_serving.py [workers] [seconds] [clients]
+import http.client
+import json
+import logging
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import import_app, synthetic_frame
+import serve
+
+PAYLOAD = json.dumps({'temperature': 21.5, 'holiday': 0, 'fuel_price': 1.45})
+
+def wait_ready(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/readyz')
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('Server did not become ready')
+
+def drive(port, path, token, seconds, clients):
+    # Each client keeps one connection open and sends requests back to back
+    counts = [0] * clients
+    errors = [0] * clients
+    deadline = time.monotonic() + seconds
+    headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+
+    def client(index):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        while time.monotonic() < deadline:
+            if path == '/predict':
+                connection.request('POST', path, body=PAYLOAD, headers=headers)
+            else:
+                connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+            if response.status == 200:
+                counts[index] += 1
+            else:
+                errors[index] += 1
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    return {'rps': sum(counts) / elapsed, 'requests': sum(counts), 'errors': sum(errors)}
+
+def run(service, token, mode, workers, threads, seconds, clients):
+    sock = serve.listen('127.0.0.1', 0)
+    port = sock.getsockname()[1]
+    pid = os.fork()
+    if pid == 0:
+        try:
+            serve.serve(service, mode, sock, workers, threads)
+        finally:
+            os._exit(0)
+    sock.close()
+    try:
+        wait_ready(port)
+        return {path: drive(port, path, token, seconds, clients) for path in ('/predict', '/healthz')}
+    finally:
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    clients = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+    with tempfile.TemporaryDirectory() as workdir:
+        os.makedirs(os.path.join(workdir, 'data'))
+        synthetic_frame(2000).to_csv(os.path.join(workdir, 'data', 'historical_data.csv'), index=False)
+        os.chdir(workdir)
+        service = import_app()
+        logging.getLogger().setLevel(logging.WARNING)
+        service.preload()
+        # No notification mail for each prediction
+        service.app.extensions['mail'].suppress = True
+        service.limiter.enabled = False
+        with service.app.app_context():
+            token = service.create_access_token(identity='benchmark')
+        print(f"cpus: {os.cpu_count()}, clients: {clients}, {seconds:.0f}s per run")
+        for mode, count in (('wsgi', 1), ('wsgi', workers), ('asgi', 1), ('asgi', workers)):
+            result = run(service, token, mode, count, 8, seconds, clients)
+            print(f"{mode} x{count}: "
+                  f"/predict {result['/predict']['rps']:8.1f} rps ({result['/predict']['errors']} errors), "
+                  f"/healthz {result['/healthz']['rps']:8.1f} rps")
+
+if __name__ == '__main__':
+    main()
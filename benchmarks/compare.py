@@ -0,0 +1,30 @@
+# Compares two benchmark result files from benchmarks/run.py, metric by metric.
+#   python benchmarks/compare.py base.json head.json
+import json
+import sys
+
+def flatten(value, prefix=''):
+    if isinstance(value, dict):
+        for key, child in value.items():
+            yield from flatten(child, f'{prefix}.{key}' if prefix else key)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, float(value)
+
+def main():
+    if len(sys.argv) != 3:
+        sys.exit('usage: compare.py base.json head.json')
+    with open(sys.argv[1]) as f:
+        base = json.load(f)
+    with open(sys.argv[2]) as f:
+        head = json.load(f)
+    print(f"base {base.get('commit')}  head {head.get('commit')}")
+    base_metrics = dict(flatten(base['benchmarks']))
+    for name, value in flatten(head['benchmarks']):
+        if name not in base_metrics:
+            continue
+        old = base_metrics[name]
+        change = (value - old) / old * 100 if old else 0.0
+        print(f'{name:70s} {old:14.6g} {value:14.6g} {change:+8.1f}%')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+# Replays a recorded JSONL request log through the Flask app at a target rate.
+# Each line is one request: {"method": "POST", "path": "/predict", "json": {...}}.
+# "auth": false sends it without the benchmark user's token.
+#   python benchmarks/replay.py traffic.jsonl --rate 200 --output replay.json
+#   python benchmarks/replay.py --generate 5000 > traffic.jsonl
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+import numpy as np
+from harness import BenchmarkApp, percentiles
+
+def generate(count, seed=0):
+    # Synthetic traffic: mostly single predictions, some batches and history reads
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.85:
+            yield {'method': 'POST', 'path': '/predict', 'json': {
+                'temperature': round(float(rng.normal(28, 8)), 1),
+                'holiday': int(rng.random() < 0.3),
+                'fuel_price': round(float(rng.normal(1.6, 0.25)), 2)
+            }}
+        elif kind < 0.95:
+            yield {'method': 'POST', 'path': '/predict/batch', 'json': [{
+                'temperature': round(float(rng.normal(28, 8)), 1),
+                'holiday': int(rng.random() < 0.3),
+                'fuel_price': round(float(rng.normal(1.6, 0.25)), 2)
+            } for _ in range(int(rng.integers(10, 200)))]}
+        else:
+            yield {'method': 'GET', 'path': '/predictions', 'query': {'per_page': 20}}
+
+def replay(bench, entries, rate=None):
+    headers = {'Authorization': f'Bearer {bench.token()}'}
+    latencies = []
+    statuses = Counter()
+    interval = 1.0 / rate if rate else 0.0
+    started = time.perf_counter()
+    for i, entry in enumerate(entries):
+        # Open-loop pacing: request i is due at started + i * interval
+        if interval:
+            delay = started + i * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        sent = time.perf_counter()
+        response = bench.client.open(
+            entry['path'],
+            method=entry.get('method', 'GET'),
+            json=entry.get('json'),
+            query_string=entry.get('query'),
+            headers=headers if entry.get('auth', True) else None
+        )
+        response.close()
+        latencies.append(time.perf_counter() - sent)
+        statuses[response.status_code] += 1
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': len(latencies),
+        'target_rate': rate,
+        'achieved_rate': len(latencies) / elapsed if elapsed else 0.0,
+        'latency_seconds': percentiles(latencies),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())}
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('log', nargs='?', help='JSONL request log to replay')
+    parser.add_argument('--rate', type=float, default=None, help='target requests per second (default: as fast as possible)')
+    parser.add_argument('--generate', type=int, metavar='N', help='write N synthetic log lines to stdout and exit')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+    if args.generate:
+        for entry in generate(args.generate):
+            sys.stdout.write(json.dumps(entry) + '\n')
+        return
+    if not args.log:
+        parser.error('a request log is required unless --generate is given')
+    with open(args.log) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    with BenchmarkApp() as bench:
+        results = replay(bench, entries, args.rate)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+# Offline benchmark suite for the prediction service. Writes machine-readable JSON so
+# runs on different commits can be diffed with benchmarks/compare.py.
+#   python benchmarks/run.py --output bench_results.json [--quick]
+import argparse
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime
+import numpy as np
+import sklearn
+from harness import ROOT, BenchmarkApp, percentiles, synthetic_frame
+from replay import generate, replay
+
+def predict_latency(bench, requests):
+    # Distinct inputs per request, so the prediction cache never answers
+    headers = {'Authorization': f'Bearer {bench.token()}'}
+    rng = np.random.default_rng(1)
+    samples = []
+    for _ in range(requests):
+        payload = {
+            'temperature': float(rng.uniform(-10, 45)),
+            'holiday': int(rng.integers(0, 2)),
+            'fuel_price': float(rng.uniform(1.0, 2.2))
+        }
+        started = time.perf_counter()
+        response = bench.client.post('/predict', json=payload, headers=headers)
+        samples.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.json
+    return {'latency_seconds': percentiles(samples)}
+
+def batch_throughput(bench, sizes):
+    headers = {'Authorization': f'Bearer {bench.token()}'}
+    rng = np.random.default_rng(2)
+    results = {}
+    for size in sizes:
+        rows = [{
+            'temperature': float(t), 'holiday': int(h), 'fuel_price': float(p)
+        } for t, h, p in zip(rng.uniform(-10, 45, size), rng.integers(0, 2, size), rng.uniform(1.0, 2.2, size))]
+        started = time.perf_counter()
+        response = bench.client.post('/predict/batch', json=rows, headers=headers)
+        json_seconds = time.perf_counter() - started
+        assert response.status_code == 200, response.json
+        body = ''.join(json.dumps(row) + '\n' for row in rows)
+        started = time.perf_counter()
+        response = bench.client.post('/predict/batch', data=body, headers={
+            **headers, 'Content-Type': 'application/x-ndjson'
+        })
+        lines = response.get_data().count(b'\n')
+        ndjson_seconds = time.perf_counter() - started
+        assert lines == size
+        results[str(size)] = {
+            'json_rows_per_second': size / json_seconds,
+            'ndjson_rows_per_second': size / ndjson_seconds
+        }
+    return results
+
+def training_time(sizes):
+    from model import MODEL_PARAMS, train_model
+    results = {}
+    for size in sizes:
+        df = synthetic_frame(size, seed=3)
+        started = time.perf_counter()
+        model = train_model(df, MODEL_PARAMS)
+        assert model is not None
+        results[str(size)] = {'fit_seconds': time.perf_counter() - started}
+    return results
+
+def cache_behaviour(bench, requests):
+    # Inputs drawn the way dashboards send them: rounded, clustered around typical values
+    headers = {'Authorization': f'Bearer {bench.token()}'}
+    cache = bench.module.prediction_cache
+    before = cache.stats()
+    rng = np.random.default_rng(4)
+    hits, misses = [], []
+    for _ in range(requests):
+        payload = {
+            'temperature': round(float(rng.normal(28, 4)), 1),
+            'holiday': int(rng.random() < 0.3),
+            'fuel_price': round(float(rng.normal(1.6, 0.05)), 2)
+        }
+        hits_before = cache.hits
+        started = time.perf_counter()
+        bench.client.post('/predict', json=payload, headers=headers)
+        elapsed = time.perf_counter() - started
+        (hits if cache.hits > hits_before else misses).append(elapsed)
+    after = cache.stats()
+    lookups = (after['hits'] - before['hits']) + (after['misses'] - before['misses'])
+    return {
+        'hit_rate': (after['hits'] - before['hits']) / lookups,
+        'hit_latency_seconds': percentiles(hits) if hits else None,
+        'miss_latency_seconds': percentiles(misses) if misses else None,
+        'evictions': after.get('evictions', 0) - before.get('evictions', 0)
+    }
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--quick', action='store_true', help='smaller sizes, for a smoke run')
+    args = parser.parse_args()
+    scale = 0.1 if args.quick else 1.0
+    results = {
+        'commit': git_commit(),
+        'created_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+        'benchmarks': {}
+    }
+    benchmarks = results['benchmarks']
+    with BenchmarkApp(rows=int(20000 * scale) or 1000) as bench:
+        benchmarks['predict_single_row'] = predict_latency(bench, int(2000 * scale))
+        benchmarks['predict_batch'] = batch_throughput(bench, [100, 1000, int(20000 * scale)])
+        benchmarks['prediction_cache'] = cache_behaviour(bench, int(5000 * scale))
+        benchmarks['replay'] = replay(bench, list(generate(int(2000 * scale), seed=5)))
+    benchmarks['train_model'] = training_time([int(n * scale) for n in (1000, 10000, 50000)])
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+        f.write('\n')
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
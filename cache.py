@@ -0,0 +1,157 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Inputs closer together than these steps share a cache entry
+DEFAULT_RESOLUTION = {'temperature': 0.1, 'fuel_price': 0.01}
+
+class LocalCacheBackend:
+    # Per-process LRU with a per-entry TTL
+    def __init__(self, maxsize=10000, ttl=300.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= self.clock():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, self.clock() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, version):
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == version]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'local',
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+class RedisCacheBackend:
+    # Shared by every worker; Redis enforces the TTL and its own maxmemory eviction
+    def __init__(self, client, ttl=300.0, prefix='prediction-cache'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, key):
+        return ':'.join([self.prefix] + [str(part) for part in key])
+
+    def get(self, key):
+        value = self.client.get(self._key(key))
+        return float(value) if value is not None else None
+
+    def set(self, key, value):
+        self.client.setex(self._key(key), max(1, int(self.ttl)), repr(value))
+
+    def invalidate(self, version):
+        stale = list(self.client.scan_iter(match=f'{self.prefix}:{version}:*'))
+        if stale:
+            self.client.delete(*stale)
+        return len(stale)
+
+    def stats(self):
+        return {'backend': 'redis', 'ttl': self.ttl}
+
+class PredictionCache:
+    # Keys are (model version, quantized inputs). Predictions are computed from the
+    # quantized inputs too, so a cached answer never depends on which nearby input
+    # happened to fill the entry.
+    def __init__(self, backend, resolution=None):
+        self.backend = backend
+        self.resolution = dict(DEFAULT_RESOLUTION, **(resolution or {}))
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def quantize(self, temperature, holiday, fuel_price):
+        return (
+            self._snap(temperature, self.resolution['temperature']),
+            int(holiday),
+            self._snap(fuel_price, self.resolution['fuel_price'])
+        )
+
+    @staticmethod
+    def _snap(value, step):
+        if not step:
+            return float(value)
+        # round() again to drop the binary noise of q * step (e.g. 220 * 0.1)
+        return round(round(value / step) * step, 9)
+
+    def get_or_compute(self, version, temperature, holiday, fuel_price, compute):
+        inputs = self.quantize(temperature, holiday, fuel_price)
+        key = (version,) + inputs
+        try:
+            value = self.backend.get(key)
+        except Exception as error:
+            # A broken shared cache degrades to computing every prediction
+            self.errors += 1
+            logger.error(f"Error reading prediction cache: {str(error)}")
+            value = None
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = compute(*inputs)
+        if value is not None:
+            try:
+                self.backend.set(key, value)
+            except Exception as error:
+                self.errors += 1
+                logger.error(f"Error writing prediction cache: {str(error)}")
+        return value
+
+    def invalidate(self, version):
+        removed = self.backend.invalidate(version)
+        self.invalidations += 1
+        logger.info(f"Invalidated {removed} cached predictions for model {version}")
+        return removed
+
+    def on_publish(self, published, previous):
+        if previous is not None and previous.version != published.version:
+            self.invalidate(previous.version)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        stats = {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'invalidations': self.invalidations,
+            'errors': self.errors,
+            'resolution': self.resolution
+        }
+        stats.update(self.backend.stats())
+        return stats
@@ -0,0 +1,305 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from bson import ObjectId
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single process owns the cache
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = 100000
+
+# Training columns and the dtype each is stored as; timestamps as int64 nanoseconds
+COLUMNS = {
+    'timestamp': 'datetime64[ns]',
+    'temperature': 'float64',
+    'holiday': 'int64',
+    'fuel_price': 'float64',
+    'demand': 'float64'
+}
+
+def detect_format(path):
+    # By content, not extension: data/historical_data.csv is really an XLSX workbook
+    with open(path, 'rb') as f:
+        magic = f.read(8)
+    if magic.startswith(b'PK\x03\x04'):
+        return 'xlsx'
+    if magic.startswith(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'):
+        return 'xls'
+    return 'csv'
+
+def read_source(path, chunk_rows=CHUNK_ROWS):
+    # Yields the source file as typed DataFrames of at most chunk_rows rows
+    file_format = detect_format(path)
+    if file_format == 'csv':
+        for chunk in pd.read_csv(path, chunksize=chunk_rows):
+            yield normalize(chunk)
+    elif file_format == 'xlsx':
+        yield from _read_xlsx(path, chunk_rows)
+    else:
+        yield normalize(pd.read_excel(path))
+
+def _read_xlsx(path, chunk_rows):
+    # openpyxl's read-only mode streams rows instead of loading the whole workbook. It
+    # is handed a file object because it refuses paths without an Excel extension.
+    from openpyxl import load_workbook
+    with open(path, 'rb') as f:
+        yield from _read_workbook(load_workbook(f, read_only=True, data_only=True), chunk_rows)
+
+def _read_workbook(workbook, chunk_rows):
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(name).strip() for name in next(rows)]
+        chunk = []
+        for row in rows:
+            if any(value is not None for value in row):
+                chunk.append(row)
+            if len(chunk) >= chunk_rows:
+                yield normalize(pd.DataFrame(chunk, columns=header))
+                chunk = []
+        if chunk:
+            yield normalize(pd.DataFrame(chunk, columns=header))
+    finally:
+        workbook.close()
+
+def normalize(df):
+    columns = {}
+    for name, dtype in COLUMNS.items():
+        if name == 'timestamp':
+            values = df[name] if name in df else pd.Series(pd.NaT, index=df.index)
+            columns[name] = pd.to_datetime(values).astype('datetime64[ns]')
+        else:
+            columns[name] = df[name].astype(dtype)
+    return pd.DataFrame(columns)
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class Segment:
+    # A directory of raw little-endian column files (<name>.bin) plus meta.json.
+    # meta['rows'] is authoritative: rows are appended to the column files first and
+    # only counted once meta.json is replaced, so a torn append is simply ignored.
+    def __init__(self, path):
+        self.path = path
+        self.meta = self._read_meta()
+
+    def _read_meta(self):
+        try:
+            with open(os.path.join(self.path, 'meta.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @property
+    def rows(self):
+        return self.meta['rows'] if self.meta else 0
+
+    def column_path(self, name):
+        return os.path.join(self.path, f'{name}.bin')
+
+    def append(self, frame, **meta):
+        os.makedirs(self.path, exist_ok=True)
+        rows = self.rows
+        for name in COLUMNS:
+            values = np.ascontiguousarray(frame[name].to_numpy().view('int64') if name == 'timestamp'
+                                          else frame[name].to_numpy())
+            with open(self.column_path(name), 'r+b' if os.path.exists(self.column_path(name)) else 'wb') as f:
+                # Overwrite anything past the committed rows left by a torn append
+                f.seek(rows * values.itemsize)
+                f.truncate()
+                f.write(values.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        self.commit(rows=rows + len(frame), **meta)
+
+    def commit(self, **meta):
+        meta = {**(self.meta or {}), **meta}
+        fd, staging = tempfile.mkstemp(dir=self.path, prefix='.meta-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(staging, os.path.join(self.path, 'meta.json'))
+        self.meta = meta
+
+    def frame(self):
+        return pd.DataFrame(self.columns())
+
+    def columns(self):
+        # Memory-mapped, read-only views of the committed rows
+        columns = {}
+        for name, dtype in COLUMNS.items():
+            if not self.rows:
+                columns[name] = np.empty(0, dtype=dtype)
+                continue
+            mapped = np.memmap(self.column_path(name), dtype='int64' if name == 'timestamp' else dtype,
+                               mode='r', shape=(self.rows,))
+            columns[name] = mapped.view(dtype) if name == 'timestamp' else mapped
+        return columns
+
+def cache_dir(source):
+    # data/historical_data.csv -> data/cache/historical_data.csv/
+    return os.path.join(os.path.dirname(source), 'cache', os.path.basename(source))
+
+class TrainingDataStore:
+    # Columnar cache of the training data under root (cache_dir(source) by default):
+    #   base-<hash>/  the source file, parsed once; reused while the file's mtime and
+    #                 size are unchanged, or while its content hash still matches
+    #   ingested/     rows from the /update-data collection, appended in _id order
+    #                 after the watermark recorded in its meta.json
+    #   current.json  which base-<hash> directory is live
+    # The source is parsed in chunks, so building the cache never holds the raw file in
+    # memory; reads come from memory-mapped columns. arrays() materializes every row
+    # once, as the X and y the estimators fit on.
+    def __init__(self, source, root=None, chunk_rows=CHUNK_ROWS):
+        self.source = source
+        self.root = root or cache_dir(source)
+        self.chunk_rows = chunk_rows
+        self.ingested = Segment(os.path.join(self.root, 'ingested'))
+
+    def _lock(self):
+        os.makedirs(self.root, exist_ok=True)
+        handle = open(os.path.join(self.root, '.lock'), 'w')
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    def _current(self):
+        try:
+            with open(os.path.join(self.root, 'current.json')) as f:
+                return json.load(f)['base']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def base(self):
+        # The base segment for the source as it is on disk now, building it if needed
+        stat = os.stat(self.source)
+        current = self._current()
+        if current:
+            segment = Segment(os.path.join(self.root, current))
+            if segment.meta and (segment.meta['mtime_ns'], segment.meta['size']) == (stat.st_mtime_ns, stat.st_size):
+                return segment
+        with self._lock():
+            return self._refresh_base(stat)
+
+    def _refresh_base(self, stat):
+        current = self._current()
+        digest = file_digest(self.source)
+        name = f'base-{digest[:16]}'
+        segment = Segment(os.path.join(self.root, name))
+        if segment.meta and segment.meta.get('sha256') == digest:
+            # Touched but unchanged: remember the new mtime and keep the columns
+            segment.commit(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        else:
+            segment = self._build_base(name, digest, stat)
+        if current != name:
+            fd, staging = tempfile.mkstemp(dir=self.root, prefix='.current-')
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'base': name}, f)
+            os.replace(staging, os.path.join(self.root, 'current.json'))
+            if current:
+                shutil.rmtree(os.path.join(self.root, current), ignore_errors=True)
+        return segment
+
+    def _build_base(self, name, digest, stat):
+        staging = tempfile.mkdtemp(prefix='.staging-', dir=self.root)
+        try:
+            segment = Segment(staging)
+            for chunk in read_source(self.source, self.chunk_rows):
+                segment.append(chunk)
+            segment.commit(rows=segment.rows, source=self.source, format=detect_format(self.source),
+                           sha256=digest, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            path = os.path.join(self.root, name)
+            shutil.rmtree(path, ignore_errors=True)
+            os.rename(staging, path)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        logger.info(f"Cached {segment.rows} rows of {self.source} as columns")
+        return Segment(path)
+
+    def sync(self, collection):
+        # Append documents added to the collection since the last sync. ObjectIds from
+        # concurrent clients are not strictly ordered, so if the totals disagree the
+        # segment is rebuilt from the whole collection instead. The total comes from
+        # collection metadata, so the check costs nothing while they agree.
+        with self._lock():
+            self.ingested = Segment(self.ingested.path)
+            watermark = self.ingested.meta.get('watermark') if self.ingested.meta else None
+            appended = self._append_from(collection, {'_id': {'$gt': ObjectId(watermark)}} if watermark else {})
+            if self.ingested.rows != collection.estimated_document_count():
+                logger.info("Ingested rows out of step with the collection, rebuilding")
+                shutil.rmtree(self.ingested.path, ignore_errors=True)
+                self.ingested = Segment(self.ingested.path)
+                appended = self._append_from(collection, {})
+            return appended
+
+    def _append_from(self, collection, query):
+        appended = 0
+        cursor = collection.find(query).sort('_id', 1).batch_size(self.chunk_rows)
+        try:
+            chunk = []
+            for document in cursor:
+                chunk.append(document)
+                if len(chunk) >= self.chunk_rows:
+                    appended += self._append_documents(chunk)
+                    chunk = []
+            if chunk:
+                appended += self._append_documents(chunk)
+        finally:
+            cursor.close()
+        if not self.ingested.meta:
+            os.makedirs(self.ingested.path, exist_ok=True)
+            self.ingested.commit(rows=0, watermark=None)
+        return appended
+
+    def _append_documents(self, documents):
+        self.ingested.append(normalize(pd.DataFrame(documents)), watermark=str(documents[-1]['_id']))
+        return len(documents)
+
+    def segments(self, include_ingested=True):
+        return [self.base(), Segment(self.ingested.path)] if include_ingested else [self.base()]
+
+    def arrays(self, features, target='demand', include_ingested=True):
+        # X and y for fitting, oldest row first, filled straight from the memory-mapped
+        # columns with one allocation each; ingested rows have no timestamp and go last
+        segments = [(segment.rows, segment.columns()) for segment in self.segments(include_ingested) if segment.rows]
+        total = sum(rows for rows, _ in segments)
+        timestamps = np.empty(total, dtype='int64')
+        offset = 0
+        for rows, columns in segments:
+            timestamps[offset:offset + rows] = columns['timestamp'].view('int64')
+            offset += rows
+        # NaT is the smallest int64; order it after every timestamp instead
+        timestamps[timestamps == np.iinfo('int64').min] = np.iinfo('int64').max
+        positions = None
+        if not np.all(timestamps[:-1] <= timestamps[1:]):
+            positions = np.empty(total, dtype='int64')
+            positions[np.argsort(timestamps, kind='stable')] = np.arange(total)
+        del timestamps
+        X = np.empty((total, len(features)))
+        y = np.empty(total)
+        offset = 0
+        for rows, columns in segments:
+            target_rows = slice(offset, offset + rows) if positions is None else positions[offset:offset + rows]
+            for i, name in enumerate(features):
+                X[target_rows, i] = columns[name]
+            y[target_rows] = columns[target]
+            offset += rows
+        return X, y
+
+    def frame(self, include_ingested=True):
+        frames = [segment.frame() for segment in self.segments(include_ingested) if segment.rows]
+        if not frames:
+            return normalize(pd.DataFrame({name: [] for name in COLUMNS}))
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
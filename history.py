@@ -0,0 +1,59 @@
+import base64
+import json
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+
+# Newest first; _id breaks ties between records stamped in the same millisecond
+HISTORY_SORT = [('timestamp', DESCENDING), ('_id', DESCENDING)]
+
+def ensure_prediction_indexes(collection):
+    collection.create_index([('user', ASCENDING), ('timestamp', DESCENDING), ('_id', DESCENDING)])
+    collection.create_index([('timestamp', DESCENDING), ('_id', DESCENDING)])
+    # Records from before timestamps were stamped at insert get their ObjectId's
+    # creation time; later starts find nothing to update
+    collection.update_many(
+        {'timestamp': {'$exists': False}},
+        [{'$set': {'timestamp': {'$toDate': '$_id'}}}]
+    )
+
+def encode_token(document):
+    payload = json.dumps({'t': document['timestamp'].isoformat(), 'i': str(document['_id'])})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_token(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload['t']), ObjectId(payload['i'])
+    except Exception:
+        raise ValueError('Invalid continuation token')
+
+def after_token(query, token):
+    # Everything strictly after the token's (timestamp, _id) in HISTORY_SORT order
+    if not token:
+        return query
+    timestamp, object_id = decode_token(token)
+    return {'$and': [query, {'$or': [
+        {'timestamp': {'$lt': timestamp}},
+        {'timestamp': timestamp, '_id': {'$lt': object_id}}
+    ]}]}
+
+def fetch_page(collection, query, limit, token=None):
+    documents = list(
+        collection.find(after_token(query, token)).sort(HISTORY_SORT).limit(limit + 1)
+    )
+    next_token = encode_token(documents[limit - 1]) if len(documents) > limit else None
+    documents = documents[:limit]
+    for document in documents:
+        del document['_id']
+    return documents, next_token
+
+def iter_documents(collection, query, batch_size=1000, token=None):
+    # Streams from one server-side cursor; memory stays at one batch
+    cursor = collection.find(after_token(query, token), {'_id': 0}).sort(HISTORY_SORT).batch_size(batch_size)
+    try:
+        for document in cursor:
+            yield document
+    finally:
+        cursor.close()
@@ -0,0 +1,192 @@
+import threading
+import numpy as np
+
+# Rows evaluated per step of the vectorized path; bounds the (trees x rows) scratch arrays
+BATCH_BLOCK_CELLS = 1 << 18
+
+class ForestEngine:
+    # Flattened RandomForestRegressor: every tree's nodes packed into shared arrays.
+    # Node i splits on feature[i] at threshold[i]; its children are children[2*i] (left,
+    # x <= threshold) and children[2*i + 1] (right). Leaves point both children at
+    # themselves, so every tree can be stepped in lockstep for max_depth steps.
+    # sklearn compares float32 inputs against float64 thresholds; thresholds are stored
+    # rounded down to float32, which gives the same decision for every float32 input.
+    def __init__(self, feature, threshold, children, value, roots, max_depth, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+        self.n_trees = len(roots)
+        self.is_leaf = children[0::2] == np.arange(len(feature), dtype=children.dtype)
+        self._scratch = threading.local()
+
+    # Scratch buffers are per thread and never pickled
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_scratch']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._scratch = threading.local()
+
+    def _buffers(self):
+        scratch = self._scratch
+        if not hasattr(scratch, 'node'):
+            n = self.n_trees
+            scratch.x = np.empty(self.n_features_in_, dtype=np.float32)
+            scratch.node = np.empty(n, dtype=np.int32)
+            scratch.feature = np.empty(n, dtype=np.int32)
+            scratch.xv = np.empty(n, dtype=np.float32)
+            scratch.threshold = np.empty(n, dtype=np.float32)
+            scratch.go_right = np.empty(n, dtype=np.bool_)
+            scratch.index = np.empty(n, dtype=np.int32)
+            scratch.value = np.empty(n, dtype=np.float64)
+            scratch.total = np.empty(n, dtype=np.float64)
+        return scratch
+
+    def predict_one(self, temperature, holiday, fuel_price):
+        s = self._buffers()
+        s.x[0] = temperature
+        s.x[1] = holiday
+        s.x[2] = fuel_price
+        node = s.node
+        node[:] = self.roots
+        for _ in range(self.max_depth):
+            np.take(self.feature, node, out=s.feature)
+            np.take(s.x, s.feature, out=s.xv)
+            np.take(self.threshold, node, out=s.threshold)
+            np.greater(s.xv, s.threshold, out=s.go_right)
+            np.multiply(node, 2, out=s.index)
+            np.add(s.index, s.go_right, out=s.index)
+            np.take(self.children, s.index, out=node)
+        np.take(self.value, node, out=s.value)
+        # Sequential sum over trees, in estimator order, like ForestRegressor.predict
+        np.cumsum(s.value, out=s.total)
+        return float(s.total[-1] / self.n_trees)
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected input of shape (n, {self.n_features_in_}), got {X.shape}")
+        n_rows = X.shape[0]
+        out = np.zeros(n_rows, dtype=np.float64)
+        block = max(1, BATCH_BLOCK_CELLS // self.n_trees)
+        for start in range(0, n_rows, block):
+            # Feature-major copy so x for (tree, row) is XT[feature * m + row]
+            XT = np.ascontiguousarray(X[start:start + block].T).ravel()
+            m = XT.shape[0] // self.n_features_in_
+            leaf = np.repeat(self.roots, m)
+            rows = np.tile(np.arange(m, dtype=np.int32), self.n_trees)
+            # Only (tree, row) cells that have not reached a leaf are stepped
+            active = np.flatnonzero(~self.is_leaf[leaf])
+            node = leaf[active]
+            while active.size:
+                xv = XT[self.feature[node] * m + rows[active]]
+                node = self.children[2 * node + (xv > self.threshold[node])]
+                done = self.is_leaf[node]
+                leaf[active[done]] = node[done]
+                pending = ~done
+                active = active[pending]
+                node = node[pending]
+            values = self.value[leaf].reshape(self.n_trees, m)
+            total = out[start:start + m]
+            # Sequential sum over trees, in estimator order, like ForestRegressor.predict
+            for t in range(self.n_trees):
+                total += values[t]
+        out /= self.n_trees
+        return out
+
+def float32_floor(values):
+    # Largest float32 not greater than each float64 value
+    rounded = values.astype(np.float32)
+    over = rounded.astype(np.float64) > values
+    rounded[over] = np.nextafter(rounded[over], np.float32(-np.inf))
+    return np.ascontiguousarray(rounded)
+
+def compile_forest(model):
+    if getattr(model, 'n_outputs_', 1) != 1:
+        raise ValueError("Only single-output forests can be compiled")
+    features = []
+    thresholds = []
+    children = []
+    values = []
+    roots = []
+    offset = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        index = np.arange(n_nodes) + offset
+        is_leaf = tree.children_left == -1
+        left = np.where(is_leaf, index, tree.children_left + offset)
+        right = np.where(is_leaf, index, tree.children_right + offset)
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+        children.append(np.column_stack([left, right]).ravel())
+        values.append(tree.value[:, 0, 0])
+        roots.append(offset)
+        offset += n_nodes
+    return ForestEngine(
+        feature=np.ascontiguousarray(np.concatenate(features), dtype=np.int32),
+        threshold=float32_floor(np.concatenate(thresholds)),
+        children=np.ascontiguousarray(np.concatenate(children), dtype=np.int32),
+        value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+        roots=np.asarray(roots, dtype=np.int32),
+        max_depth=max(estimator.tree_.max_depth for estimator in model.estimators_),
+        n_features=model.n_features_in_
+    )
+
+class LinearEngine:
+    # A fitted linear model reduced to its coefficients
+    def __init__(self, coef, intercept):
+        self.coef = np.ascontiguousarray(coef, dtype=np.float64).ravel()
+        self.intercept = float(intercept)
+        self.n_features_in_ = len(self.coef)
+        self._terms = [float(c) for c in self.coef]
+
+    def predict_one(self, temperature, holiday, fuel_price):
+        c0, c1, c2 = self._terms
+        return self.intercept + c0 * float(temperature) + c1 * float(holiday) + c2 * float(fuel_price)
+
+    def predict(self, X):
+        return np.asarray(X, dtype=np.float64) @ self.coef + self.intercept
+
+class EstimatorEngine:
+    # Any other fitted regressor behind the same predict_one/predict interface. The
+    # estimator must have been fitted on arrays, not DataFrames with feature names.
+    def __init__(self, model):
+        self.model = model
+        self.n_features_in_ = int(model.n_features_in_)
+        self._scratch = threading.local()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_scratch']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._scratch = threading.local()
+
+    def predict_one(self, temperature, holiday, fuel_price):
+        row = getattr(self._scratch, 'row', None)
+        if row is None:
+            row = self._scratch.row = np.empty((1, self.n_features_in_), dtype=np.float64)
+        row[0, 0] = temperature
+        row[0, 1] = holiday
+        row[0, 2] = fuel_price
+        return float(self.model.predict(row)[0])
+
+    def predict(self, X):
+        return self.model.predict(np.asarray(X, dtype=np.float64))
+
+def compile_model(model):
+    # The fastest serving engine for a fitted regressor
+    if hasattr(model, 'estimators_') and all(hasattr(estimator, 'tree_') for estimator in model.estimators_):
+        return compile_forest(model)
+    if hasattr(model, 'coef_') and np.ndim(model.coef_) == 1:
+        return LinearEngine(model.coef_, model.intercept_)
+    return EstimatorEngine(model)
@@ -0,0 +1,156 @@
+import logging
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+GRID_STEPS = {'temperature': 128, 'fuel_price': 128}
+
+# Share of the training rows held out of the grid's ranges to measure interpolation
+# error against the engine, at most ERROR_SAMPLES of them; as many points again are drawn
+# uniformly over the grid, where sparse regions weigh as much as dense ones
+HOLDOUT_FRACTION = 0.2
+ERROR_SAMPLES = 10000
+
+# Slack, in grid cells, for the range ends not landing exactly on the last grid line
+EDGE = 1e-9
+
+class LookupTable:
+    # Precomputed predictions on a regular temperature x fuel_price grid, one grid per
+    # holiday value, answered by bilinear interpolation in constant time. Inputs outside
+    # the grid (or an unseen holiday value) return None so the caller can fall back to
+    # the exact model.
+    def __init__(self, temperature, fuel_price, holidays, grids, report=None):
+        self.temperature = np.asarray(temperature, dtype=np.float64)
+        self.fuel_price = np.asarray(fuel_price, dtype=np.float64)
+        self.holidays = [int(holiday) for holiday in holidays]
+        self.grids = np.ascontiguousarray(grids, dtype=np.float64)
+        self.report = report or {}
+        self._scalars()
+
+    # Python lists are faster than numpy for one-element reads; rebuilt after loading
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ('_t0', '_tstep', '_tcells', '_p0', '_pstep', '_pcells', '_rows'):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._scalars()
+
+    def _scalars(self):
+        self._t0 = float(self.temperature[0])
+        self._tstep = float(self.temperature[1] - self.temperature[0])
+        self._tcells = len(self.temperature) - 1
+        self._p0 = float(self.fuel_price[0])
+        self._pstep = float(self.fuel_price[1] - self.fuel_price[0])
+        self._pcells = len(self.fuel_price) - 1
+        self._rows = {holiday: grid.tolist() for holiday, grid in zip(self.holidays, self.grids)}
+
+    def predict_one(self, temperature, holiday, fuel_price):
+        rows = self._rows.get(holiday)
+        if rows is None:
+            return None
+        x = (float(temperature) - self._t0) / self._tstep
+        y = (float(fuel_price) - self._p0) / self._pstep
+        if not (-EDGE <= x <= self._tcells + EDGE and -EDGE <= y <= self._pcells + EDGE):
+            return None
+        x = min(max(x, 0.0), self._tcells)
+        y = min(max(y, 0.0), self._pcells)
+        i = min(int(x), self._tcells - 1)
+        j = min(int(y), self._pcells - 1)
+        x -= i
+        y -= j
+        row, below = rows[i], rows[i + 1]
+        top = row[j] + (row[j + 1] - row[j]) * y
+        bottom = below[j] + (below[j + 1] - below[j]) * y
+        return top + (bottom - top) * x
+
+    def predict(self, X):
+        # Vectorized predict_one; NaN where the exact model is needed
+        X = np.asarray(X, dtype=np.float64)
+        out = np.full(len(X), np.nan)
+        x = (X[:, 0] - self._t0) / self._tstep
+        y = (X[:, 2] - self._p0) / self._pstep
+        inside = (x >= -EDGE) & (x <= self._tcells + EDGE) & (y >= -EDGE) & (y <= self._pcells + EDGE)
+        x = np.clip(x, 0, self._tcells)
+        y = np.clip(y, 0, self._pcells)
+        for index, holiday in enumerate(self.holidays):
+            rows = inside & (X[:, 1] == holiday)
+            i = np.minimum(x[rows].astype(np.intp), self._tcells - 1)
+            j = np.minimum(y[rows].astype(np.intp), self._pcells - 1)
+            wx = x[rows] - i
+            wy = y[rows] - j
+            grid = self.grids[index]
+            top = grid[i, j] + (grid[i, j + 1] - grid[i, j]) * wy
+            bottom = grid[i + 1, j] + (grid[i + 1, j + 1] - grid[i + 1, j]) * wy
+            out[rows] = top + (bottom - top) * wx
+        return out
+
+def interpolation_errors(table, engine, X):
+    # Absolute error against the engine at the points inside the grid, and how many were
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    approximate = table.predict(X)
+    inside = ~np.isnan(approximate)
+    if not inside.any():
+        return np.empty(0), 0
+    return np.abs(approximate[inside] - np.asarray(engine.predict(X[inside]))), int(inside.sum())
+
+def error_summary(errors):
+    if not len(errors):
+        return None, None
+    return float(errors.max()), float(errors.mean())
+
+def build_lookup(engine, df, steps=None, seed=0):
+    # Grid over the ranges of most training rows, evaluated in one batched pass of the
+    # engine, then checked against the engine on the held-out rows and on uniform points
+    steps = {**GRID_STEPS, **(steps or {})}
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(df))
+    holdout = min(ERROR_SAMPLES, int(len(df) * HOLDOUT_FRACTION))
+    held_out, fitted = df.iloc[order[:holdout]], df.iloc[order[holdout:]]
+    temperature = np.linspace(fitted['temperature'].min(), fitted['temperature'].max(), steps['temperature'])
+    fuel_price = np.linspace(fitted['fuel_price'].min(), fitted['fuel_price'].max(), steps['fuel_price'])
+    holidays = sorted(int(holiday) for holiday in fitted['holiday'].unique())
+    if len(temperature) < 2 or len(fuel_price) < 2 or temperature[0] == temperature[-1] or fuel_price[0] == fuel_price[-1]:
+        raise ValueError("Training data does not span a grid")
+    t, p = np.meshgrid(temperature, fuel_price, indexing='ij')
+    grids = []
+    for holiday in holidays:
+        X = np.column_stack([t.ravel(), np.full(t.size, float(holiday)), p.ravel()])
+        grids.append(np.asarray(engine.predict(X)).reshape(t.shape))
+    table = LookupTable(temperature, fuel_price, holidays, np.stack(grids))
+    errors, covered = interpolation_errors(
+        table, engine, held_out[['temperature', 'holiday', 'fuel_price']].to_numpy(dtype=np.float64)
+    )
+    uniform = np.column_stack([
+        rng.uniform(temperature[0], temperature[-1], ERROR_SAMPLES),
+        rng.choice(np.asarray(holidays, dtype=np.float64), ERROR_SAMPLES),
+        rng.uniform(fuel_price[0], fuel_price[-1], ERROR_SAMPLES)
+    ])
+    uniform_errors, _ = interpolation_errors(table, engine, uniform)
+    max_error, mean_error = error_summary(errors)
+    uniform_max_error, uniform_mean_error = error_summary(uniform_errors)
+    table.report = {
+        'grid': [len(temperature), len(fuel_price), len(holidays)],
+        'temperature_range': [float(temperature[0]), float(temperature[-1])],
+        'fuel_price_range': [float(fuel_price[0]), float(fuel_price[-1])],
+        'holidays': holidays,
+        # Held-out rows outside the grid are answered by the exact model, not measured
+        'error_samples': covered,
+        'held_out_rows': int(len(held_out)),
+        'held_out_coverage': covered / len(held_out) if len(held_out) else None,
+        'max_abs_error': max_error,
+        'mean_abs_error': mean_error,
+        'uniform_max_abs_error': uniform_max_error,
+        'uniform_mean_abs_error': uniform_mean_error,
+        'build_seconds': time.perf_counter() - started
+    }
+    if max_error is None:
+        logger.info(f"Built lookup table {table.report['grid']}: too few held-out rows to measure its error")
+    else:
+        logger.info(f"Built lookup table {table.report['grid']}: max error {max_error:.2f}, "
+                    f"mean error {mean_error:.2f} on {covered} held-out rows")
+    return table
@@ -0,0 +1,232 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TRAINING_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+class Metrics:
+    # Counters and histograms with no lock on the update path: each thread writes to
+    # its own shard and shards are only merged when the metrics are read. With a
+    # directory configured, every process also snapshots its totals to
+    # <directory>/metrics-<pid>.json, and reads merge all of those files, so the
+    # numbers cover every forked worker rather than just the one answering. Shards of
+    # finished threads (one per connection under a threaded server) are folded into a
+    # retired shard, so memory follows the number of live threads.
+    def __init__(self, max_shards=64):
+        self.histograms = {}
+        self.help = {}
+        self.directory = None
+        self.flush_interval = 5.0
+        self.max_shards = max_shards
+        self._local = threading.local()
+        self._shards = []
+        self._retired = new_shard()
+        self._shards_lock = threading.Lock()
+        self._flusher = None
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def configure(self, directory=None, flush_interval=5.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._start_flusher()
+            atexit.register(self.flush)
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.histograms[name] = tuple(buckets)
+        self.help[name] = help_text
+
+    def counter(self, name, help_text):
+        self.help[name] = help_text
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = new_shard(threading.current_thread())
+            with self._shards_lock:
+                if len(self._shards) >= self.max_shards:
+                    self._fold()
+                self._shards.append(shard)
+        return shard
+
+    def _fold(self):
+        # Called with the lock held; finished threads never write to their shard again
+        alive = []
+        for shard in self._shards:
+            if shard['thread'].is_alive():
+                alive.append(shard)
+            else:
+                merge_shard(self._retired, shard)
+        self._shards = alive
+
+    def inc(self, name, amount=1, **labels):
+        counters = self._shard()['counters']
+        key = (name, tuple(sorted(labels.items())))
+        counters[key] = counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        histograms = self._shard()['histograms']
+        key = (name, tuple(sorted(labels.items())))
+        state = histograms.get(key)
+        if state is None:
+            # One count per bucket, then +Inf, sum and count
+            state = histograms[key] = [0] * (len(self.histograms[name]) + 1) + [0.0, 0]
+        state[bisect_left(self.histograms[name], value)] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('span_duration_seconds', time.perf_counter() - start, span=name)
+
+    def local_snapshot(self):
+        totals = new_shard()
+        with self._shards_lock:
+            self._fold()
+            merge_shard(totals, self._retired)
+            shards = list(self._shards)
+        for shard in shards:
+            merge_shard(totals, shard)
+        return totals['counters'], totals['histograms']
+
+    def snapshot(self):
+        # Totals across every process sharing the metrics directory
+        counters, histograms = self.local_snapshot()
+        if not self.directory:
+            return counters, histograms
+        own = self._snapshot_path()
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            if path == own:
+                continue
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, labels, value in data['counters']:
+                key = (name, tuple(tuple(label) for label in labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, state in data['histograms']:
+                key = (name, tuple(tuple(label) for label in labels))
+                merged = histograms.setdefault(key, [0] * len(state))
+                for i, value in enumerate(state):
+                    merged[i] += value
+        return counters, histograms
+
+    def counter_totals(self, name, label):
+        counters, _ = self.snapshot()
+        totals = {}
+        for (counter_name, labels), value in counters.items():
+            if counter_name == name:
+                label_value = dict(labels).get(label)
+                totals[label_value] = totals.get(label_value, 0) + value
+        return totals
+
+    def exposition(self):
+        # Prometheus text format 0.0.4
+        counters, histograms = self.snapshot()
+        lines = []
+        for name in sorted({key[0] for key in counters}):
+            lines.append(f'# HELP {name} {self.help.get(name, name)}')
+            lines.append(f'# TYPE {name} counter')
+            for (counter_name, labels), value in sorted(counters.items()):
+                if counter_name == name:
+                    lines.append(f'{name}{format_labels(labels)} {value}')
+        for name in sorted({key[0] for key in histograms}):
+            buckets = self.histograms[name]
+            lines.append(f'# HELP {name} {self.help.get(name, name)}')
+            lines.append(f'# TYPE {name} histogram')
+            for (histogram_name, labels), state in sorted(histograms.items()):
+                if histogram_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + ('+Inf',), state[:-2]):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else repr(float(bound))
+                    lines.append(f'{name}_bucket{format_labels(labels + (("le", le),))} {cumulative}')
+                lines.append(f'{name}_sum{format_labels(labels)} {state[-2]}')
+                lines.append(f'{name}_count{format_labels(labels)} {state[-1]}')
+        return '\n'.join(lines) + '\n'
+
+    def _snapshot_path(self):
+        return os.path.join(self.directory, f'metrics-{os.getpid()}.json')
+
+    def flush(self):
+        if not self.directory:
+            return
+        counters, histograms = self.local_snapshot()
+        data = {
+            'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+            'histograms': [[name, labels, state] for (name, labels), state in histograms.items()]
+        }
+        fd, staging = tempfile.mkstemp(dir=self.directory, prefix='.metrics-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(staging, self._snapshot_path())
+
+    def _start_flusher(self):
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as error:
+                logger.error(f"Error writing metrics snapshot: {str(error)}")
+
+    def _after_fork(self):
+        # A forked worker starts from zero; the parent keeps reporting its own totals
+        self._local = threading.local()
+        self._shards = []
+        self._retired = new_shard()
+        self._shards_lock = threading.Lock()
+        self._flusher = None
+        if self.directory:
+            self._start_flusher()
+
+def new_shard(thread=None):
+    return {'thread': thread, 'counters': {}, 'histograms': {}}
+
+def merge_shard(target, shard):
+    # The source may still be written by its thread, so iterate over copies
+    counters = target['counters']
+    for key, value in list(shard['counters'].items()):
+        counters[key] = counters.get(key, 0) + value
+    histograms = target['histograms']
+    for key, state in list(shard['histograms'].items()):
+        merged = histograms.setdefault(key, [0] * len(state))
+        for i, value in enumerate(list(state)):
+            merged[i] += value
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in labels) + '}'
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+metrics = Metrics()
+metrics.histogram('http_request_duration_seconds', 'Time spent handling HTTP requests')
+metrics.histogram('span_duration_seconds', 'Time spent in named sections of request handling')
+metrics.histogram('model_training_seconds', 'Time spent fitting a model', TRAINING_BUCKETS)
+metrics.counter('http_requests_total', 'HTTP requests handled')
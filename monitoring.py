@@ -0,0 +1,267 @@
+import logging
+import threading
+from bisect import bisect_right
+import numpy as np
+from model import FEATURES
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = FEATURES + ['prediction']
+
+# Reference bins per column, cut at training-set quantiles so each holds an equal share
+REFERENCE_BINS = 20
+
+# Population stability index: below 0.1 stable, 0.1-0.25 moderate, above 0.25 drifted
+PSI_THRESHOLD = 0.25
+
+# Floor on bin shares, so empty bins keep the PSI finite
+SMOOTHING = 1e-4
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+def column_profile(values, bins=REFERENCE_BINS):
+    values = np.asarray(values, dtype=np.float64)
+    # Repeated quantiles (discrete columns such as holiday) collapse into one edge
+    edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+    counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+    return {
+        'edges': edges.tolist(),
+        'proportions': (counts / len(values)).tolist(),
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'mean': float(values.mean()),
+        'std': float(values.std())
+    }
+
+def build_profile(df, predictions, bins=REFERENCE_BINS):
+    # What the training data and the model's predictions on it look like; the
+    # reference that live traffic is scored against
+    columns = {name: column_profile(df[name], bins) for name in FEATURES}
+    columns['prediction'] = column_profile(predictions, bins)
+    return {'rows': int(len(df)), 'bins': bins, 'columns': columns}
+
+def histogram_quantile(counts, edges, low, high, q):
+    # Linear interpolation inside the bin holding the q-th observation; the open-ended
+    # outer bins are bounded by the observed min and max
+    total = sum(counts)
+    target = q * total
+    seen = 0
+    for index, count in enumerate(counts):
+        if count and seen + count >= target:
+            start = low if index == 0 else max(edges[index - 1], low)
+            end = high if index == len(edges) else min(edges[index], high)
+            return start + (end - start) * (target - seen) / count
+        seen += count
+    return high
+
+class _Sketch:
+    # One column in one shard: bin counts over the reference edges plus running totals
+    __slots__ = ('edges', 'low', 'high', 'counts', 'total', 'min', 'max', 'outside')
+
+    def __init__(self, reference):
+        self.edges = reference['edges']
+        self.low = reference['min']
+        self.high = reference['max']
+        self.counts = [0] * (len(self.edges) + 1)
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+        self.outside = 0
+
+    def add(self, value):
+        self.counts[bisect_right(self.edges, value)] += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value < self.low or value > self.high:
+            self.outside += 1
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.outside += other.outside
+
+class _Shard:
+    # Written only by its own thread, so updates need no lock; readers sum the shards
+    def __init__(self, state, thread=None):
+        self.state = state
+        self.thread = thread
+        self.sketches = [_Sketch(state.profile['columns'][name]) for name in COLUMNS]
+
+    def merge(self, other):
+        for sketch, other_sketch in zip(self.sketches, other.sketches):
+            sketch.merge(other_sketch)
+
+class _State:
+    # Everything tied to one model version; replaced as a whole on publish
+    def __init__(self, version, profile):
+        self.version = version
+        self.profile = profile
+        self.retired = _Shard(self) if profile else None
+
+class DriftMonitor:
+    # Streaming sketches of every /predict input and prediction for the current model
+    # version, in memory fixed by the reference profile's bin count. Each serving thread
+    # updates a shard of its own; shards of finished threads are folded into one, so
+    # memory follows the number of live threads, not connections served.
+    def __init__(self, threshold=PSI_THRESHOLD, min_samples=1000, max_shards=64):
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.max_shards = max_shards
+        self._state = _State(None, None)
+        self._shards = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def on_publish(self, published, previous=None):
+        state = _State(published.version, getattr(published, 'profile', None))
+        with self._lock:
+            self._state = state
+            self._shards = []
+        if state.profile is None:
+            logger.warning(f"No reference profile for model {published.version}, drift monitoring is off")
+
+    def _shard(self, state):
+        shard = getattr(self._local, 'shard', None)
+        if shard is not None and shard.state is state:
+            return shard
+        shard = _Shard(state, threading.current_thread())
+        with self._lock:
+            if len(self._shards) >= self.max_shards:
+                self._fold()
+            self._shards.append(shard)
+        self._local.shard = shard
+        return shard
+
+    def _fold(self):
+        # Called with the lock held; finished threads never write to their shard again
+        alive = []
+        for shard in self._shards:
+            if shard.state is not self._state:
+                continue
+            if shard.thread.is_alive():
+                alive.append(shard)
+            else:
+                shard.state.retired.merge(shard)
+        self._shards = alive
+
+    def observe(self, version, temperature, holiday, fuel_price, prediction):
+        state = self._state
+        # Requests still finishing on a replaced model are not counted against the new one
+        if state.profile is None or state.version != version or prediction is None:
+            return
+        sketches = self._shard(state).sketches
+        sketches[0].add(float(temperature))
+        sketches[1].add(float(holiday))
+        sketches[2].add(float(fuel_price))
+        sketches[3].add(float(prediction))
+
+    def observe_many(self, version, rows, predictions):
+        for row, prediction in zip(rows, predictions):
+            self.observe(version, row['temperature'], row['holiday'], row['fuel_price'], prediction)
+
+    def snapshot(self):
+        with self._lock:
+            self._fold()
+            state = self._state
+            shards = list(self._shards)
+        if state.profile is None:
+            return state, None
+        merged = _Shard(state)
+        merged.merge(state.retired)
+        for shard in shards:
+            merged.merge(shard)
+        return state, merged
+
+    def report(self):
+        state, merged = self.snapshot()
+        if merged is None:
+            return {'model_version': state.version, 'status': 'no_reference'}
+        observations = sum(merged.sketches[0].counts)
+        columns = {}
+        for name, sketch in zip(COLUMNS, merged.sketches):
+            reference = state.profile['columns'][name]
+            columns[name] = self._score(reference, sketch, observations)
+        drifted = [name for name, scores in columns.items() if scores['psi'] is not None and scores['psi'] > self.threshold]
+        if observations < self.min_samples:
+            status = 'insufficient_data'
+        else:
+            status = 'drift' if drifted else 'stable'
+        return {
+            'model_version': state.version,
+            'status': status,
+            'observations': observations,
+            'min_samples': self.min_samples,
+            'psi_threshold': self.threshold,
+            'reference_rows': state.profile['rows'],
+            'drifted': drifted if status == 'drift' else [],
+            'columns': columns
+        }
+
+    @staticmethod
+    def _score(reference, sketch, observations):
+        if not observations:
+            return {'count': 0, 'psi': None, 'ks': None}
+        live = np.asarray(sketch.counts, dtype=np.float64) / observations
+        expected = np.asarray(reference['proportions'])
+        actual_share = np.maximum(live, SMOOTHING)
+        expected_share = np.maximum(expected, SMOOTHING)
+        return {
+            'count': observations,
+            'psi': float(np.sum((actual_share - expected_share) * np.log(actual_share / expected_share))),
+            # Kolmogorov-Smirnov distance, evaluated at the reference bin edges
+            'ks': float(np.max(np.abs(np.cumsum(live) - np.cumsum(expected)))),
+            'mean': sketch.total / observations,
+            'min': sketch.min,
+            'max': sketch.max,
+            'outside_reference_range': sketch.outside / observations,
+            'quantiles': {
+                f'p{round(q * 100)}': histogram_quantile(sketch.counts, sketch.edges, sketch.min, sketch.max, q)
+                for q in QUANTILES
+            },
+            'reference': {key: reference[key] for key in ('mean', 'std', 'min', 'max')}
+        }
+
+class DriftWatcher:
+    # Checks the monitor periodically and submits a retrain when it reports drift, at
+    # most once per model version. Only the current version's job is remembered: once
+    # a newer model is served, the older versions never report again.
+    def __init__(self, monitor, submit, interval=60.0):
+        self.monitor = monitor
+        self.submit = submit
+        self.interval = interval
+        self.triggered = {}
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='drift-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def check(self):
+        report = self.monitor.report()
+        version = report['model_version']
+        if report['status'] != 'drift' or version in self.triggered:
+            return None
+        job_id = self.submit()
+        self.triggered = {version: job_id}
+        logger.warning(f"Drift in {', '.join(report['drifted'])} for model {version}, submitted retrain {job_id}")
+        return job_id
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.check()
+            except Exception as error:
+                logger.error(f"Error checking drift: {str(error)}")
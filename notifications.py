@@ -0,0 +1,163 @@
+import logging
+import queue
+import smtplib
+import threading
+import time
+from flask_mail import Message
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class NotificationQueue:
+    # Prediction emails, sent off the request path by one worker thread.
+    # notify() only enqueues; when the bounded queue is full the event is dropped and
+    # counted. The worker folds each user's events into a digest that is sent
+    # digest_window seconds after the first event, so a burst of N predictions becomes
+    # one email. Digests go out over a single SMTP connection that is kept open for
+    # idle_timeout seconds between sends. Failed digests are retried with exponential
+    # backoff up to max_retries times.
+    def __init__(self, app, mail, sender, digest_window=60.0, max_queue=10000, max_retries=3,
+                 backoff=2.0, idle_timeout=30.0, recipient=lambda username: f'{username}@example.com'):
+        self.app = app
+        self.mail = mail
+        self.sender = sender
+        self.digest_window = digest_window
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self.recipient = recipient
+        self.counters = {
+            'enqueued': 0,
+            'dropped': 0,
+            'sent': 0,
+            'predictions_sent': 0,
+            'retries': 0,
+            'failed': 0,
+            'connections': 0
+        }
+        self._events = queue.Queue(maxsize=max_queue)
+        self._digests = {}
+        self._retries = []
+        self._connection = None
+        self._last_send = 0.0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='notifications', daemon=True)
+            self._thread.start()
+        return self
+
+    def notify(self, username, prediction):
+        try:
+            self._events.put_nowait((username, prediction, time.monotonic()))
+            self.counters['enqueued'] += 1
+            return True
+        except queue.Full:
+            self.counters['dropped'] += 1
+            return False
+
+    def close(self, timeout=10.0):
+        # Send whatever is pending now instead of waiting out the digest window
+        self._stopped.set()
+        try:
+            # Wake the worker if it is waiting for events
+            self._events.put_nowait(None)
+        except queue.Full:
+            pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats['queue_depth'] = self._events.qsize()
+        stats['pending_digests'] = len(self._digests)
+        stats['pending_retries'] = len(self._retries)
+        return stats
+
+    def _run(self):
+        while True:
+            stopping = self._stopped.is_set()
+            self._collect(timeout=0 if stopping else self._next_wakeup())
+            now = float('inf') if stopping else time.monotonic()
+            due = [username for username, digest in self._digests.items() if digest['due'] <= now]
+            batch = [(username, self._digests.pop(username)['predictions'], 0) for username in due]
+            retry_due = [retry for retry in self._retries if retry[0] <= now]
+            self._retries = [retry for retry in self._retries if retry[0] > now]
+            batch.extend((username, predictions, attempt) for _, username, predictions, attempt in retry_due)
+            if batch:
+                with self.app.app_context():
+                    for username, predictions, attempt in batch:
+                        self._send(username, predictions, attempt, final=stopping)
+            if self._connection is not None and (stopping or time.monotonic() - self._last_send > self.idle_timeout):
+                self._disconnect()
+            if stopping:
+                return
+
+    def _next_wakeup(self):
+        deadlines = [digest['due'] for digest in self._digests.values()]
+        deadlines.extend(retry[0] for retry in self._retries)
+        if self._connection is not None:
+            deadlines.append(self._last_send + self.idle_timeout)
+        # Poll at least every second so close() is noticed promptly
+        if not deadlines:
+            return 1.0
+        return min(1.0, max(0.0, min(deadlines) - time.monotonic()))
+
+    def _collect(self, timeout):
+        try:
+            event = self._events.get(timeout=timeout) if timeout > 0 else self._events.get_nowait()
+        except queue.Empty:
+            return
+        while True:
+            if event is not None:
+                username, prediction, at = event
+                digest = self._digests.setdefault(username, {'due': at + self.digest_window, 'predictions': []})
+                digest['predictions'].append(prediction)
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                return
+
+    def _message(self, username, predictions):
+        if len(predictions) == 1:
+            subject = 'New Fuel Demand Prediction'
+            body = f'A new fuel demand prediction has been made: {predictions[0]}'
+        else:
+            subject = f'{len(predictions)} New Fuel Demand Predictions'
+            body = f'{len(predictions)} new fuel demand predictions have been made:\n' + \
+                '\n'.join(f'- {prediction}' for prediction in predictions)
+        msg = Message(subject=subject, sender=self.sender, recipients=[self.recipient(username)])
+        msg.body = body
+        return msg
+
+    def _send(self, username, predictions, attempt, final=False):
+        try:
+            if self._connection is None:
+                self._connection = self.mail.connect().__enter__()
+                self.counters['connections'] += 1
+            with metrics.span('smtp.send'):
+                self._connection.send(self._message(username, predictions))
+            self._last_send = time.monotonic()
+            self.counters['sent'] += 1
+            self.counters['predictions_sent'] += len(predictions)
+        except Exception as error:
+            # The connection may be half dead; the next send opens a fresh one
+            self._disconnect()
+            if attempt < self.max_retries and not final:
+                self.counters['retries'] += 1
+                retry_at = time.monotonic() + self.backoff * (2 ** attempt)
+                self._retries.append((retry_at, username, predictions, attempt + 1))
+            else:
+                self.counters['failed'] += 1
+                logger.error(f"Error sending notification to {username}: {str(error)}")
+
+    def _disconnect(self):
+        connection, self._connection = self._connection, None
+        if connection is not None and connection.host is not None:
+            try:
+                connection.host.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
@@ -0,0 +1,289 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from bson import json_util
+from pymongo.errors import BulkWriteError
+from metrics import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks only hold within this process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+_process_locks = {}
+_process_locks_lock = threading.Lock()
+
+@contextmanager
+def file_lock(path, blocking=True):
+    # An flock on a side file, shared by every process using the same spill path;
+    # yields False when blocking is off and another process holds it
+    if fcntl is None:
+        with _process_locks_lock:
+            lock = _process_locks.setdefault(os.path.abspath(path), threading.Lock())
+        if not lock.acquire(blocking):
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            lock.release()
+        return
+    with open(path, 'a') as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+class WriteBehindWriter:
+    # Buffers documents for a Mongo collection and writes them from a background
+    # thread with insert_many(ordered=False), once batch_size documents are queued or
+    # flush_interval seconds have passed. Documents that cannot be written (Mongo down,
+    # or the queue full under the 'spill' policy) are appended to an NDJSON spill file
+    # and replayed once Mongo accepts writes again. Replays are idempotent: _id is
+    # assigned before the first attempt and duplicate-key errors count as written.
+    # Forked workers may share one spill path: appends and the hand-over to replay are
+    # serialized with flock, and only one process replays at a time.
+    def __init__(self, collection, batch_size=500, flush_interval=1.0, max_queue=10000,
+                 spill_path='spill/predictions.ndjson', overflow='spill', block_timeout=0.5,
+                 retry_interval=5.0):
+        if overflow not in ('spill', 'block', 'drop'):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.spill_path = spill_path
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.retry_interval = retry_interval
+        self.counters = {
+            'enqueued': 0,
+            'written': 0,
+            'flushes': 0,
+            'flush_errors': 0,
+            'spilled': 0,
+            'replayed': 0,
+            'corrupt': 0,
+            'dropped': 0
+        }
+        self.flush_seconds_total = 0.0
+        self.flush_seconds_max = 0.0
+        self.last_flush_seconds = 0.0
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._spill_lock = threading.Lock()
+        self._last_failure = None
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+        return self
+
+    def write(self, document):
+        self.write_many([document])
+
+    def write_many(self, documents):
+        overflow = []
+        with self._condition:
+            for document in documents:
+                if len(self._queue) >= self.max_queue and self.overflow == 'block':
+                    deadline = time.monotonic() + self.block_timeout
+                    while len(self._queue) >= self.max_queue and not self._stopped:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._condition.notify_all()
+                        self._condition.wait(remaining)
+                if len(self._queue) >= self.max_queue:
+                    overflow.append(document)
+                    continue
+                self._queue.append(document)
+                self.counters['enqueued'] += 1
+            if len(self._queue) >= self.batch_size:
+                self._condition.notify_all()
+        if overflow:
+            if self.overflow == 'drop':
+                with self._condition:
+                    self.counters['dropped'] += len(overflow)
+                logger.warning(f"Write-behind queue full, dropped {len(overflow)} documents")
+            else:
+                self._spill(overflow)
+
+    def close(self, timeout=30.0):
+        # Flush everything still queued; whatever Mongo refuses ends up in the spill file
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        while self._queue:
+            self._flush(self._drain())
+
+    def stats(self):
+        with self._condition:
+            stats = dict(self.counters)
+            stats['queue_depth'] = len(self._queue)
+            stats['max_queue'] = self.max_queue
+            stats['last_flush_seconds'] = self.last_flush_seconds
+            stats['max_flush_seconds'] = self.flush_seconds_max
+            stats['avg_flush_seconds'] = (
+                self.flush_seconds_total / self.counters['flushes'] if self.counters['flushes'] else 0.0
+            )
+        stats['spill_file_bytes'] = os.path.getsize(self.spill_path) if os.path.exists(self.spill_path) else 0
+        return stats
+
+    def _drain(self):
+        with self._condition:
+            batch = []
+            while self._queue and len(batch) < self.batch_size:
+                batch.append(self._queue.popleft())
+            self._condition.notify_all()
+            return batch
+
+    def _run(self):
+        while True:
+            with self._condition:
+                deadline = time.monotonic() + self.flush_interval
+                while not self._stopped and len(self._queue) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                stopping = self._stopped
+            while True:
+                batch = self._drain()
+                if not batch:
+                    break
+                self._flush(batch)
+                if not stopping and len(self._queue) < self.batch_size:
+                    break
+            if stopping:
+                return
+            try:
+                self._replay_spill()
+            except Exception as error:
+                # The spill file stays in place and the next round tries again
+                logger.error(f"Error replaying spilled documents: {str(error)}")
+
+    def _mongo_suspect(self):
+        return self._last_failure is not None and time.monotonic() - self._last_failure < self.retry_interval
+
+    def _flush(self, batch):
+        # While Mongo is known to be down, go straight to the spill file
+        if self._mongo_suspect():
+            self._spill(batch)
+            return
+        start = time.perf_counter()
+        failed = self._insert(batch)
+        elapsed = time.perf_counter() - start
+        metrics.observe('span_duration_seconds', elapsed, span='mongo.insert_many')
+        with self._condition:
+            self.counters['flushes'] += 1
+            self.counters['written'] += len(batch) - len(failed)
+            self.last_flush_seconds = elapsed
+            self.flush_seconds_total += elapsed
+            self.flush_seconds_max = max(self.flush_seconds_max, elapsed)
+        if failed:
+            self._spill(failed)
+
+    def _insert(self, documents):
+        # Returns the documents that were not written
+        try:
+            self.collection.insert_many(documents, ordered=False)
+            self._last_failure = None
+            return []
+        except BulkWriteError as error:
+            failed = {
+                write_error['index'] for write_error in error.details.get('writeErrors', [])
+                if write_error.get('code') != DUPLICATE_KEY
+            }
+            return [document for i, document in enumerate(documents) if i in failed]
+        except Exception as error:
+            self._last_failure = time.monotonic()
+            with self._condition:
+                self.counters['flush_errors'] += 1
+            logger.error(f"Error flushing {len(documents)} documents to MongoDB: {str(error)}")
+            return documents
+
+    def _spill(self, documents):
+        try:
+            with self._spill_lock:
+                directory = os.path.dirname(self.spill_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with file_lock(self.spill_path + '.lock'), open(self.spill_path, 'a') as f:
+                    for document in documents:
+                        f.write(json_util.dumps(document) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+            with self._condition:
+                self.counters['spilled'] += len(documents)
+        except Exception as error:
+            with self._condition:
+                self.counters['dropped'] += len(documents)
+            logger.error(f"Error spilling {len(documents)} documents: {str(error)}")
+
+    def _replay_spill(self):
+        replaying = self.spill_path + '.replaying'
+        if not os.path.exists(self.spill_path) and not os.path.exists(replaying):
+            return
+        if self._mongo_suspect():
+            return
+        with file_lock(replaying + '.lock', blocking=False) as locked:
+            if not locked:
+                # Another worker is replaying
+                return
+            # New spills go to a fresh file while this one is replayed
+            with self._spill_lock, file_lock(self.spill_path + '.lock'):
+                if not os.path.exists(replaying):
+                    if not os.path.exists(self.spill_path):
+                        return
+                    os.replace(self.spill_path, replaying)
+            batch = []
+            with open(replaying) as f:
+                for number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        batch.append(json_util.loads(line))
+                    except ValueError as error:
+                        # A line torn by a crash mid-write; the rest of the file is still good
+                        with self._condition:
+                            self.counters['corrupt'] += 1
+                        logger.error(f"Skipping corrupt spill line {number}: {str(error)}")
+                        continue
+                    if len(batch) >= self.batch_size:
+                        if not self._replay_batch(batch):
+                            return
+                        batch = []
+            if batch and not self._replay_batch(batch):
+                return
+            os.remove(replaying)
+        logger.info("Replayed spilled documents into MongoDB")
+
+    def _replay_batch(self, batch):
+        failed = self._insert(batch)
+        if len(failed) == len(batch) and self._last_failure is not None:
+            # Still down: keep the .replaying file and try again later
+            return False
+        with self._condition:
+            self.counters['replayed'] += len(batch) - len(failed)
+        if failed:
+            self._spill(failed)
+        return True
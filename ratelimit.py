@@ -0,0 +1,190 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, jsonify, request
+from limits import parse_many
+
+logger = logging.getLogger(__name__)
+
+# Quotas per role, in Flask-Limiter's notation; roles without an entry get 'user'
+DEFAULT_QUOTAS = {
+    'anonymous': '200 per day;50 per hour',
+    'user': '2000 per day;500 per hour',
+    'batch': '500000 per day;50000 per hour',
+    'admin': '500000 per day;50000 per hour'
+}
+
+class LocalQuotaStore:
+    # Window counters for a single process
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, requests):
+        now = self.clock()
+        with self._lock:
+            if len(self._counts) > 10000:
+                self._counts = {key: entry for key, entry in self._counts.items() if entry[1] > now}
+            totals = []
+            for key, amount, expiry in requests:
+                count, expires_at = self._counts.get(key, (0, now + expiry))
+                self._counts[key] = (count + amount, expires_at)
+                totals.append(count + amount)
+            return totals
+
+class RedisQuotaStore:
+    # Window counters shared by every worker; one pipelined round-trip per acquire
+    def __init__(self, client, prefix='rate-limit'):
+        self.client = client
+        self.prefix = prefix
+
+    def acquire(self, requests):
+        pipeline = self.client.pipeline(transaction=False)
+        for key, amount, expiry in requests:
+            name = f'{self.prefix}:{key}'
+            pipeline.incrby(name, amount)
+            pipeline.expire(name, expiry)
+        results = pipeline.execute()
+        return [int(total) for total in results[::2]]
+
+class _Lease:
+    # Tokens this process has taken from one shared window counter and not yet spent
+    __slots__ = ('window', 'tokens', 'total', 'exhausted')
+
+    def __init__(self, window):
+        self.window = window
+        self.tokens = 0
+        self.total = 0
+        self.exhausted = False
+
+class RateLimiter:
+    # Fixed-window quotas, counted in a shared store. Each process takes tokens from the
+    # shared counter in leases and spends them locally, so most checks are a dict lookup
+    # and only one in `lease_size` costs a round-trip. Leases shrink as the window
+    # fills, so tokens left unspent in other workers cost little of the quota. Admission
+    # never exceeds the quota; unspent leases can only under-admit.
+    def __init__(self, store=None, quotas=None, key_func=None, lease_size=100, lease_divisor=16,
+                 max_keys=100000, clock=time.time):
+        self.key_func = key_func or (lambda: (request.remote_addr, 'anonymous'))
+        self.lease_divisor = lease_divisor
+        self.max_keys = max_keys
+        self.clock = clock
+        self.enabled = True
+        self.allowed = 0
+        self.denied = 0
+        self.store_calls = 0
+        self.store_errors = 0
+        self._exempt = set()
+        self._lock = threading.Lock()
+        self.configure(store, quotas, lease_size)
+
+    def configure(self, store=None, quotas=None, lease_size=100):
+        # The hook is registered at import, before the app's configuration is final, so
+        # the store and quotas can be replaced afterwards; leases from the old store go
+        with self._lock:
+            self.store = store or LocalQuotaStore(self.clock)
+            self.quotas = {role: parse_many(limits) for role, limits in {**DEFAULT_QUOTAS, **(quotas or {})}.items()}
+            self.lease_size = lease_size
+            self._leases = OrderedDict()
+        return self
+
+    def init_app(self, app):
+        app.before_request(self._check_request)
+        return self
+
+    def exempt(self, f):
+        self._exempt.add(f)
+        return f
+
+    def limits_for(self, role):
+        return self.quotas.get(role) or self.quotas['user']
+
+    def _check_request(self):
+        if not self.enabled:
+            return None
+        if current_app.view_functions.get(request.endpoint) in self._exempt:
+            return None
+        key, role = self.key_func()
+        allowed, retry_after = self.hit(f'{role}:{key}', self.limits_for(role))
+        if allowed:
+            return None
+        response = jsonify({'error': 'Rate limit exceeded', 'retry_after': math.ceil(retry_after)})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(math.ceil(retry_after))
+        return response
+
+    def _lease(self, key, item, window):
+        lease_key = (key, item.amount, item.get_expiry())
+        lease = self._leases.get(lease_key)
+        if lease is None or lease.window != window:
+            lease = self._leases[lease_key] = _Lease(window)
+            while len(self._leases) > self.max_keys:
+                self._leases.popitem(last=False)
+        self._leases.move_to_end(lease_key)
+        return lease
+
+    def hit(self, key, items):
+        # Returns (allowed, seconds until the blocking window resets). Other threads may
+        # spend freshly acquired tokens first, so this tops up again until it either gets
+        # a token or the store reports the window exhausted; every round advances the
+        # shared counter, so the loop ends within the quota.
+        now = self.clock()
+        windows = [int(now // item.get_expiry()) for item in items]
+        while True:
+            with self._lock:
+                leases = [self._lease(key, item, window) for item, window in zip(items, windows)]
+                result = self._take(items, windows, leases, now)
+                if result is not None:
+                    return result
+                requests = []
+                for item, window, lease in zip(items, windows, leases):
+                    if lease.tokens < 1:
+                        want = max(1, min(self.lease_size, (item.amount - lease.total) // self.lease_divisor))
+                        requests.append((item, window, lease, want))
+            try:
+                totals = self.store.acquire([
+                    (f'{key}:{item.amount}/{item.get_expiry()}:{window}', want, item.get_expiry() + 1)
+                    for item, window, lease, want in requests
+                ])
+            except Exception as error:
+                # An unreachable store fails open rather than taking the API down with it
+                with self._lock:
+                    self.store_errors += 1
+                logger.error(f"Error acquiring rate limit tokens: {str(error)}")
+                return True, 0.0
+            with self._lock:
+                self.store_calls += 1
+                for (item, window, lease, want), total in zip(requests, totals):
+                    lease.tokens += max(0, min(want, item.amount - (total - want)))
+                    lease.total = max(lease.total, total)
+                    lease.exhausted = total >= item.amount
+
+    def _take(self, items, windows, leases, now):
+        # Called with the lock held. Decides from local state alone, or returns None
+        # when a lease needs topping up from the store.
+        blocked = [(window + 1) * item.get_expiry() - now
+                   for item, window, lease in zip(items, windows, leases)
+                   if lease.tokens < 1 and lease.exhausted]
+        if blocked:
+            self.denied += 1
+            return False, max(blocked)
+        if any(lease.tokens < 1 for lease in leases):
+            return None
+        for lease in leases:
+            lease.tokens -= 1
+        self.allowed += 1
+        return True, 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'store': type(self.store).__name__,
+                'keys': len(self._leases),
+                'allowed': self.allowed,
+                'denied': self.denied,
+                'store_calls': self.store_calls,
+                'store_errors': self.store_errors
+            }
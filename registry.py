@@ -0,0 +1,247 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import namedtuple
+from datetime import datetime
+import joblib
+import pandas as pd
+import sklearn
+from inference import compile_model
+from model import FEATURES, MODEL_PARAMS, load_data, train_model
+from training import select_and_train
+from lookup import GRID_STEPS, build_lookup
+from monitoring import build_profile
+from persistence import file_lock
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_DIR = 'models'
+
+def data_fingerprint(df):
+    # Content hash of the training columns, independent of file format and row index
+    hashed = pd.util.hash_pandas_object(df[FEATURES + ['demand']], index=False)
+    return hashlib.sha256(hashed.to_numpy().tobytes()).hexdigest()
+
+def reference_profile(df, engine):
+    X = df[FEATURES].to_numpy(dtype='float64')
+    return build_profile(df, engine.predict(X))
+
+def artifact_key(data_hash, params):
+    # Pickles are only safe to load with the sklearn that wrote them
+    payload = json.dumps({
+        'data': data_hash,
+        'params': params,
+        'sklearn': sklearn.__version__
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class LazyModel:
+    # The fitted estimator, read from model.joblib on first attribute access. Serving
+    # only uses the engine, so workers that never touch the estimator never unpickle a
+    # private copy of its trees.
+    def __init__(self, path):
+        self.path = path
+        self._model = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = joblib.load(self.path, mmap_mode='r')
+        return self._model
+
+    def __getattr__(self, name):
+        # Only reached for attributes not set in __init__
+        if name in ('path', '_model', '_lock'):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+# What /predict serves: an immutable snapshot, swapped as a whole. lookup is the
+# optional approximate-mode grid, profile the training-set reference for drift scores.
+PublishedModel = namedtuple('PublishedModel', ['version', 'model', 'engine', 'lookup', 'profile'], defaults=(None, None))
+
+class ModelRegistry:
+    # One directory per artifact under root, named by artifact_key:
+    #   model.joblib   the fitted estimator
+    #   engine.joblib  its compiled serving engine (packed arrays, memory-mapped on load)
+    #   meta.json      version, data hash, params and row count
+    #   training_report.json  per-candidate validation results, when selection was run
+    #   profile.json   feature and prediction distributions of the training set
+    #   lookup-<steps>.joblib  approximate-mode prediction grid, when requested
+    # plus root/CURRENT, naming the artifact most recently published by any process
+    def __init__(self, root=REGISTRY_DIR):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, key)
+
+    def exists(self, key):
+        return os.path.exists(os.path.join(self.path(key), 'meta.json'))
+
+    def save(self, key, model, engine, meta, report=None, profile=None):
+        os.makedirs(self.root, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix='.staging-', dir=self.root)
+        try:
+            # Uncompressed dumps so arrays can be memory-mapped back
+            joblib.dump(model, os.path.join(staging, 'model.joblib'))
+            joblib.dump(engine, os.path.join(staging, 'engine.joblib'))
+            with open(os.path.join(staging, 'meta.json'), 'w') as f:
+                json.dump(meta, f, indent=2)
+            if report is not None:
+                with open(os.path.join(staging, 'training_report.json'), 'w') as f:
+                    json.dump(report, f, indent=2)
+            if profile is not None:
+                with open(os.path.join(staging, 'profile.json'), 'w') as f:
+                    json.dump(profile, f)
+            # Publish the whole directory in one rename; a concurrent writer of the same key loses
+            os.rename(staging, self.path(key))
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            if not self.exists(key):
+                raise
+
+    def load(self, key):
+        path = self.path(key)
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        # mmap_mode='r' maps the engine's arrays from the page cache, so forked workers
+        # share them instead of each holding a copy. sklearn copies tree nodes out of
+        # the mapping when unpickling, so the estimator is only loaded if it is used.
+        engine = joblib.load(os.path.join(path, 'engine.joblib'), mmap_mode='r')
+        return meta, LazyModel(os.path.join(path, 'model.joblib')), engine
+
+    def set_current(self, key):
+        fd, staging = tempfile.mkstemp(dir=self.root, prefix='.current-')
+        with os.fdopen(fd, 'w') as f:
+            f.write(key)
+        os.replace(staging, os.path.join(self.root, 'CURRENT'))
+
+    def current_key(self):
+        try:
+            with open(os.path.join(self.root, 'CURRENT')) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def load_lookup(self, key, engine, df, steps):
+        # Built once per artifact and grid size, then memory-mapped like the engine
+        steps = {**GRID_STEPS, **steps}
+        path = os.path.join(self.path(key), f"lookup-{steps['temperature']}x{steps['fuel_price']}.joblib")
+        if not os.path.exists(path):
+            if df is None:
+                return None
+            table = build_lookup(engine, df, steps)
+            fd, staging = tempfile.mkstemp(dir=self.path(key), prefix='.lookup-')
+            os.close(fd)
+            joblib.dump(table, staging)
+            os.replace(staging, path)
+        return joblib.load(path, mmap_mode='r')
+
+    def load_profile(self, key, engine, df):
+        # Artifacts saved before profiles were recorded get one when df is at hand
+        path = os.path.join(self.path(key), 'profile.json')
+        if not os.path.exists(path):
+            if df is None:
+                return None
+            profile = reference_profile(df, engine)
+            fd, staging = tempfile.mkstemp(dir=self.path(key), prefix='.profile-')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(profile, f)
+            os.replace(staging, path)
+            return profile
+        with open(path) as f:
+            return json.load(f)
+
+    def load_or_train(self, df=None, params=None, selection=None, lookup=None, arrays=None):
+        # With selection, candidates are cross-validated and the best one is kept (see
+        # training.select_and_train); otherwise a random forest is fitted with params.
+        # lookup (grid steps, possibly empty) also builds the approximate-mode grid.
+        # arrays, the (X, y) of df in training order, saves selection a copy of them.
+        try:
+            params = {'selection': selection} if selection else (params or MODEL_PARAMS)
+            if df is None:
+                df = load_data()
+            if df is None:
+                raise ValueError("Data loading failed")
+            data_hash = data_fingerprint(df)
+            key = artifact_key(data_hash, params)
+            if not self.exists(key):
+                # Retrain only when the data or the hyperparameters changed. Every worker
+                # may retrain the same data at once; one trains and the rest wait on the
+                # lock, then load its artifact.
+                os.makedirs(self.root, exist_ok=True)
+                with file_lock(os.path.join(self.root, 'train.lock')):
+                    if not self.exists(key):
+                        self.train(key, df, data_hash, params, selection, arrays)
+            published = self.load_published(key, df, lookup)
+            self.set_current(key)
+            return published
+        except Exception as error:
+            logger.error(f"Error loading model from registry: {str(error)}")
+            return None
+
+    def train(self, key, df, data_hash, params, selection=None, arrays=None):
+        report = None
+        if selection:
+            model, report = select_and_train(df, selection, arrays=arrays)
+        else:
+            model = train_model(df, params)
+        if model is None:
+            raise ValueError("Model training failed")
+        engine = compile_model(model)
+        self.save(key, model, engine, {
+            'version': key[:12],
+            'key': key,
+            'data_hash': data_hash,
+            'params': params,
+            'estimator': type(model).__name__,
+            'rows': len(df),
+            'sklearn_version': sklearn.__version__,
+            'created_at': datetime.now().isoformat()
+        }, report, reference_profile(df, engine))
+        logger.info(f"Saved model artifact {key[:12]}")
+
+    def load_published(self, key, df=None, lookup=None):
+        # Without df, a lookup grid is only loaded if some process already built it
+        meta, model, engine = self.load(key)
+        logger.info(f"Loaded model artifact {meta['version']}")
+        table = None
+        if lookup is not None:
+            try:
+                table = self.load_lookup(key, engine, df, lookup)
+            except Exception as error:
+                # Approximate mode is optional; serve exact predictions without it
+                logger.error(f"Error building lookup table: {str(error)}")
+        profile = None
+        try:
+            profile = self.load_profile(key, engine, df)
+        except Exception as error:
+            # Drift monitoring is optional too
+            logger.error(f"Error building reference profile: {str(error)}")
+        return PublishedModel(meta['version'], model, engine, table, profile)
+
+class ModelSlot:
+    # Readers take slot.current once per request and use that snapshot throughout;
+    # publishing replaces the reference in a single assignment, so a request never
+    # sees the version of one model and the engine of another.
+    def __init__(self, published=None):
+        self.current = published
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def publish(self, published):
+        previous = self.current
+        self.current = published
+        logger.info(f"Published model {published.version}")
+        for callback in self._subscribers:
+            try:
+                callback(published, previous)
+            except Exception as error:
+                logger.error(f"Error in model publish subscriber: {str(error)}")
@@ -0,0 +1,267 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+import pandas as pd
+from dataset import TrainingDataStore
+from model import DATA_PATH, FEATURES
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs kept for status polling
+MAX_JOB_HISTORY = 100
+
+def load_training_data(collection):
+    # CSV history plus every row ingested through /update-data; only rows added since
+    # the last call are read from Mongo, the rest come from the columnar cache. Returns
+    # the frame and the (X, y) arrays training fits on, or (None, None); the frame's
+    # columns are views of the arrays, so the rows are held in memory once.
+    store = TrainingDataStore(DATA_PATH)
+    store.sync(collection)
+    try:
+        X, y = store.arrays(FEATURES)
+    except Exception as error:
+        logger.error(f"Error loading data: {str(error)}")
+        return None, None
+    if not len(y):
+        return None, None
+    columns = {name: X[:, i] for i, name in enumerate(FEATURES)}
+    return pd.DataFrame({**columns, 'demand': y}, copy=False), (X, y)
+
+class JobStore:
+    # One JSON file per job under directory, replaced atomically on every change, so a
+    # status poll can be answered by any worker process, not only the one that took the
+    # submission
+    def __init__(self, directory, max_jobs=MAX_JOB_HISTORY):
+        self.directory = directory
+        self.max_jobs = max_jobs
+
+    def path(self, job_id):
+        # Job ids are uuid4 hex; anything else could name a path outside the directory
+        if not job_id.isalnum():
+            raise ValueError(f"Invalid job id: {job_id}")
+        return os.path.join(self.directory, f'{job_id}.json')
+
+    def save(self, job):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, staging = tempfile.mkstemp(dir=self.directory, prefix='.job-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(job, f)
+        os.replace(staging, self.path(job['job_id']))
+
+    def load(self, job_id):
+        try:
+            with open(self.path(job_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def prune(self):
+        # Oldest finished jobs first, keeping max_jobs files
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith('.json')]
+        except OSError:
+            return
+        paths = sorted((os.path.join(self.directory, name) for name in names), key=self._mtime)
+        for path in paths[:max(0, len(paths) - self.max_jobs)]:
+            job = self.load(os.path.basename(path)[:-len('.json')])
+            if job is not None and job['status'] in ('pending', 'running'):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return 0.0
+
+class RetrainScheduler:
+    # Runs train_fn on a worker thread and publishes its result to slot.
+    # A burst of submits coalesces into one pending job: the job starts once no new
+    # submit has arrived for `debounce` seconds (but at most `max_wait` after the first
+    # one), and never sooner than `min_interval` after the previous run started.
+    # With a store, every job change is also written there for other processes to read.
+    def __init__(self, train_fn, slot, debounce=5.0, min_interval=60.0, max_wait=120.0, store=None):
+        self.train_fn = train_fn
+        self.slot = slot
+        self.store = store
+        self.debounce = debounce
+        self.min_interval = min_interval
+        self.max_wait = max_wait
+        self.jobs = OrderedDict()
+        self._pending = None
+        self._first_submit = None
+        self._last_submit = None
+        self._last_start = None
+        self._stopped = False
+        self._condition = threading.Condition()
+        self._store_lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='retrain-scheduler', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self):
+        with self._condition:
+            now = time.monotonic()
+            if self._pending is None:
+                self._pending = uuid.uuid4().hex
+                self._first_submit = now
+                self.jobs[self._pending] = {
+                    'job_id': self._pending,
+                    'status': 'pending',
+                    'requests': 0,
+                    'submitted_at': datetime.now().isoformat(),
+                    'started_at': None,
+                    'finished_at': None,
+                    'model_version': None,
+                    'error': None
+                }
+                self._trim_history()
+                created = True
+            else:
+                created = False
+            self._last_submit = now
+            job = self.jobs[self._pending]
+            job['requests'] += 1
+            self._condition.notify_all()
+        self._persist(job)
+        if created and self.store is not None:
+            self.store.prune()
+        return job['job_id']
+
+    def status(self, job_id):
+        with self._condition:
+            job = self.jobs.get(job_id)
+            if job:
+                return dict(job)
+        # Submitted to another worker process
+        return self.store.load(job_id) if self.store is not None else None
+
+    def _persist(self, job):
+        # The snapshot is taken under the store lock, so a slower writer never replaces
+        # a newer state with an older one
+        if self.store is None:
+            return
+        with self._store_lock:
+            with self._condition:
+                job = dict(job)
+            try:
+                self.store.save(job)
+            except Exception as error:
+                logger.error(f"Error saving retrain job {job['job_id']}: {str(error)}")
+
+    def _trim_history(self):
+        while len(self.jobs) > MAX_JOB_HISTORY:
+            oldest = next(iter(self.jobs))
+            if self.jobs[oldest]['status'] in ('pending', 'running'):
+                break
+            self.jobs.popitem(last=False)
+
+    def _start_time(self):
+        start = min(self._last_submit + self.debounce, self._first_submit + self.max_wait)
+        if self._last_start is not None:
+            start = max(start, self._last_start + self.min_interval)
+        return start
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    if self._pending is not None:
+                        delay = self._start_time() - time.monotonic()
+                        if delay <= 0:
+                            break
+                        self._condition.wait(delay)
+                    else:
+                        self._condition.wait()
+                if self._stopped:
+                    return
+                job = self.jobs[self._pending]
+                # Submits from here on need a fresh run: this one may not see their data
+                self._pending = None
+                self._last_start = time.monotonic()
+                job['status'] = 'running'
+                job['started_at'] = datetime.now().isoformat()
+            self._persist(job)
+            self._execute(job)
+
+    def _execute(self, job):
+        try:
+            published = self.train_fn()
+            if published is None:
+                raise ValueError("Model training failed")
+            current = self.slot.current
+            if current is None or current.version != published.version:
+                self.slot.publish(published)
+            with self._condition:
+                job['model_version'] = published.version
+                job['status'] = 'succeeded'
+        except Exception as error:
+            logger.error(f"Error retraining model: {str(error)}")
+            with self._condition:
+                job['status'] = 'failed'
+                job['error'] = str(error)
+        finally:
+            with self._condition:
+                job['finished_at'] = datetime.now().isoformat()
+            self._persist(job)
+
+class RegistryWatcher:
+    # Follows the registry's CURRENT pointer, so a model trained by any worker process is
+    # served by all of them. Artifacts are memory-mapped, so a reload is cheap.
+    def __init__(self, registry, slot, load_fn, interval=5.0):
+        self.registry = registry
+        self.slot = slot
+        self.load_fn = load_fn
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='registry-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def check(self):
+        key = self.registry.current_key()
+        current = self.slot.current
+        if key is None or (current is not None and current.version == key[:12]):
+            return False
+        published = self.load_fn(key)
+        if published is None:
+            return False
+        self.slot.publish(published)
+        return True
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.check()
+            except Exception as error:
+                logger.error(f"Error reloading published model: {str(error)}")
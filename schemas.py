@@ -1,10 +1,20 @@
-from marshmallow import Schema, fields, ValidationError
+from marshmallow import Schema, fields, validates_schema, ValidationError
 
 class PredictionInputSchema(Schema):
     temperature = fields.Float(required=True)
     holiday = fields.Integer(required=True)
     fuel_price = fields.Float(required=True)
 
+class SinglePredictionSchema(PredictionInputSchema):
+    # temperature may be left out when city is given; it is filled in from the weather
+    temperature = fields.Float()
+    city = fields.String()
+
+    @validates_schema
+    def require_temperature_or_city(self, data, **kwargs):
+        if 'temperature' not in data and not data.get('city'):
+            raise ValidationError('Provide temperature or city', 'temperature')
+
 class UpdateDataSchema(Schema):
     temperature = fields.Float(required=True)
     holiday = fields.Integer(required=True)
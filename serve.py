@@ -0,0 +1,156 @@
+# Production entry point: a pre-fork master that loads the model once, then forks
+# worker processes that share it copy-on-write and serve from one listening socket.
+#
+#   python serve.py --mode wsgi --workers 4 --threads 8
+#   python serve.py --mode asgi --workers 4 --threads 8
+#
+# wsgi: each worker runs a threaded WSGI server, one thread per connection.
+# asgi: each worker runs uvicorn; health checks are answered on the event loop and every
+# other request runs the Flask app on a pool of at most --threads threads.
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+
+logger = logging.getLogger(__name__)
+
+# A worker that dies sooner than this after starting is not respawned, so a crash on
+# startup does not turn into a fork loop
+MIN_WORKER_LIFETIME = 1.0
+
+def listen(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    # Accepted connections inherit this. Servers write headers and body separately, and
+    # with Nagle on, keep-alive clients wait out the peer's delayed ACK (~40ms) each time.
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def run_wsgi(app, sock, threads):
+    # werkzeug's threaded server spawns a thread per connection; --threads is not a cap
+    # here, it only applies to asgi
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class RequestHandler(WSGIRequestHandler):
+        # The app writes its own sampled access log
+        def log_request(self, *args, **kwargs):
+            pass
+
+    host, port = sock.getsockname()[:2]
+    server = make_server(host, port, app, threaded=True, request_handler=RequestHandler, fd=sock.fileno())
+
+    def interrupt(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, interrupt)
+    server.serve_forever()
+
+def run_asgi(service, sock, threads):
+    import uvicorn
+    from asgi import create_asgi_app
+    asgi_app = create_asgi_app(service.app.wsgi_app, service.health_status, threads)
+    config = uvicorn.Config(asgi_app, lifespan='off', access_log=False, log_level='warning')
+    uvicorn.Server(config).run(sockets=[sock])
+
+def worker(service, mode, sock, threads):
+    # Runs in the forked child until SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    app = service.create_app()
+    try:
+        if mode == 'asgi':
+            run_asgi(service, sock, threads)
+        else:
+            run_wsgi(app, sock, threads)
+    except KeyboardInterrupt:
+        pass
+
+def spawn(service, mode, sock, threads):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            worker(service, mode, sock, threads)
+        except SystemExit as exit:
+            code = exit.code if isinstance(exit.code, int) else 1
+        except BaseException:
+            logger.exception("Worker failed")
+            code = 1
+        else:
+            code = 0
+        # The atexit hooks flush the write-behind queue and stop the worker's background
+        # threads; os._exit keeps the child from unwinding into the master's stack
+        import atexit
+        atexit._run_exitfuncs()
+        logging.shutdown()
+        os._exit(code)
+    return pid
+
+def warn_unshared_limits(service, workers):
+    # A process-local quota store counts each worker's own window, so N workers admit
+    # N times the configured quota
+    from ratelimit import LocalQuotaStore
+    limiter = getattr(service, 'limiter', None)
+    if workers > 1 and limiter is not None and isinstance(limiter.store, LocalQuotaStore):
+        logger.warning(f"Rate limits are counted per worker, so {workers} workers admit {workers}x "
+                       f"the configured quotas; set RATE_LIMIT_REDIS_URL to share them")
+
+def serve(service, mode='wsgi', sock=None, workers=None, threads=8):
+    # The caller has already run service.preload(), so workers inherit the loaded
+    # model. gc.freeze() moves everything loaded so far out of the collector's reach;
+    # otherwise the first collection in each worker writes to every object header and
+    # un-shares the pages.
+    workers = workers or os.cpu_count()
+    warn_unshared_limits(service, workers)
+    gc.collect()
+    gc.freeze()
+    children = {}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        children[spawn(service, mode, sock, threads)] = time.monotonic()
+    logger.info(f"Serving {mode} on {sock.getsockname()} with {workers} workers")
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        logger.error(f"Worker {pid} exited with status {status}")
+        if time.monotonic() - started < MIN_WORKER_LIFETIME:
+            logger.error("Worker died during startup, not respawning")
+            continue
+        children[spawn(service, mode, sock, threads)] = time.monotonic()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the fuel demand prediction API.')
+    parser.add_argument('--mode', choices=['wsgi', 'asgi'], default='wsgi')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    args = parser.parse_args(argv)
+    sock = listen(args.host, args.port)
+    import app as service
+    service.preload()
+    serve(service, args.mode, sock, args.workers, args.threads)
+
+if __name__ == '__main__':
+    main()
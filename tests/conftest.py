@@ -0,0 +1,30 @@
+# Helpers shared by the test modules; import them with `from conftest import ...`
+import numpy as np
+import pandas as pd
+import pytest
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+def make_frame(n=200, seed=0, timestamps=False, noise=0.0):
+    # Demand is linear in the features, plus optional Gaussian noise
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'temperature': rng.uniform(0, 40, n),
+        'holiday': rng.integers(0, 2, n),
+        'fuel_price': rng.uniform(1.0, 2.0, n)
+    })
+    df['demand'] = 1000 + 10 * df['temperature'] + 200 * df['holiday'] - 100 * df['fuel_price']
+    if noise:
+        df['demand'] += rng.normal(0, noise, n)
+    if timestamps:
+        df.insert(0, 'timestamp', pd.date_range('2023-01-01', periods=n, freq='h'))
+    return df
@@ -0,0 +1,241 @@
+# In-process stand-in for the parts of MongoDB the app uses, for tests and the
+# benchmark harness
+import copy
+import threading
+from datetime import timezone
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+def _stored(value):
+    # As BSON stores them: datetimes in naive UTC, which is also how they read back
+    if isinstance(value, dict):
+        return {key: _stored(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_stored(item) for item in value]
+    if hasattr(value, 'tzinfo') and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return copy.deepcopy(value)
+
+def _get(document, path):
+    for part in path.split('.'):
+        if not isinstance(document, dict) or part not in document:
+            return None, False
+        document = document[part]
+    return document, True
+
+def _compare(value, condition):
+    if isinstance(condition, dict) and any(key.startswith('$') for key in condition):
+        present, value = value
+        for operator, operand in condition.items():
+            if operator == '$exists':
+                if bool(operand) != present:
+                    return False
+            elif not present or value is None:
+                return False
+            elif operator == '$lt' and not value < operand:
+                return False
+            elif operator == '$lte' and not value <= operand:
+                return False
+            elif operator == '$gt' and not value > operand:
+                return False
+            elif operator == '$gte' and not value >= operand:
+                return False
+            elif operator == '$in' and value not in operand:
+                return False
+        return True
+    present, value = value
+    return (value if present else None) == condition
+
+def matches(document, query):
+    for key, condition in query.items():
+        if key == '$and':
+            if not all(matches(document, part) for part in condition):
+                return False
+        elif key == '$or':
+            if not any(matches(document, part) for part in condition):
+                return False
+        else:
+            value, present = _get(document, key)
+            if not _compare((present, value), condition):
+                return False
+    return True
+
+def project(document, projection):
+    if not projection:
+        return copy.deepcopy(document)
+    excluded = {key for key, flag in projection.items() if not flag}
+    included = {key for key, flag in projection.items() if flag}
+    if included:
+        result = {key: document[key] for key in included if key in document}
+        if '_id' not in excluded and '_id' in document:
+            result['_id'] = document['_id']
+        return copy.deepcopy(result)
+    return copy.deepcopy({key: value for key, value in document.items() if key not in excluded})
+
+class _SortKey:
+    # Mongo orders missing/None before any value
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        if self.value is None:
+            return other.value is not None
+        if other.value is None:
+            return False
+        return self.value < other.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+class Cursor:
+    def __init__(self, documents, projection):
+        self._documents = documents
+        self._projection = projection
+        self._limit = 0
+
+    def sort(self, keys, direction=None):
+        if isinstance(keys, str):
+            keys = [(keys, direction or 1)]
+        for key, order in reversed(keys):
+            self._documents.sort(key=lambda document: _SortKey(_get(document, key)[0]), reverse=order < 0)
+        return self
+
+    def limit(self, limit):
+        self._limit = limit
+        return self
+
+    def skip(self, skip):
+        self._documents = self._documents[skip:]
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def close(self):
+        pass
+
+    def __iter__(self):
+        documents = self._documents[:self._limit] if self._limit else self._documents
+        return (project(document, self._projection) for document in documents)
+
+class Result:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+class Collection:
+    def __init__(self):
+        self.documents = []
+        self.indexes = []
+        self.unique = []
+        self._lock = threading.Lock()
+
+    def create_index(self, keys, unique=False, **kwargs):
+        if unique:
+            fields = [key for key, _ in keys] if isinstance(keys, list) else [keys]
+            with self._lock:
+                values = [tuple(document.get(field) for field in fields) for document in self.documents]
+            if len(set(values)) < len(values):
+                raise DuplicateKeyError('E11000 duplicate key error collection')
+            self.unique.append(fields)
+        self.indexes.append((keys, unique))
+        return '_'.join(f'{key}_{order}' for key, order in keys) if isinstance(keys, list) else keys
+
+    def _check_unique(self, document):
+        for fields in self.unique:
+            value = tuple(document.get(field) for field in fields)
+            if any(tuple(existing.get(field) for field in fields) == value for existing in self.documents):
+                raise DuplicateKeyError('E11000 duplicate key error collection')
+
+    def insert_one(self, document):
+        document.setdefault('_id', ObjectId())
+        with self._lock:
+            self._check_unique(document)
+            self.documents.append(_stored(document))
+        return Result(inserted_id=document['_id'])
+
+    def insert_many(self, documents, ordered=True):
+        for document in documents:
+            document.setdefault('_id', ObjectId())
+        with self._lock:
+            self.documents.extend(_stored(document) for document in documents)
+        return Result(inserted_ids=[document['_id'] for document in documents])
+
+    def find(self, query=None, projection=None):
+        with self._lock:
+            found = [document for document in self.documents if matches(document, query or {})]
+        return Cursor(found, projection)
+
+    def find_one(self, query=None, projection=None):
+        return next(iter(self.find(query, projection)), None)
+
+    def count_documents(self, query):
+        return sum(1 for _ in self.find(query))
+
+    def estimated_document_count(self):
+        return len(self.documents)
+
+    def _update(self, query, update, many, upsert=False):
+        modified = 0
+        with self._lock:
+            targets = [document for document in self.documents if matches(document, query)]
+            if not many:
+                targets = targets[:1]
+            for document in targets:
+                if isinstance(update, list):
+                    # Aggregation-pipeline updates: only the {$toDate: '$_id'} backfill is needed
+                    for stage in update:
+                        for key, value in stage.get('$set', {}).items():
+                            if value == {'$toDate': '$_id'}:
+                                document[key] = document['_id'].generation_time.replace(tzinfo=None)
+                    modified += 1
+                    continue
+                document.update(_stored(update.get('$set', {})))
+                modified += 1
+            if not targets and upsert:
+                document = {key: value for key, value in query.items() if not key.startswith('$')}
+                document.update(_stored(update.get('$setOnInsert', {})))
+                document.update(_stored(update.get('$set', {})))
+                document.setdefault('_id', ObjectId())
+                self.documents.append(document)
+        return Result(matched_count=len(targets), modified_count=modified)
+
+    def update_one(self, query, update, upsert=False):
+        return self._update(query, update, many=False, upsert=upsert)
+
+    def update_many(self, query, update, upsert=False):
+        return self._update(query, update, many=True, upsert=upsert)
+
+    def delete_one(self, query):
+        with self._lock:
+            for i, document in enumerate(self.documents):
+                if matches(document, query):
+                    del self.documents[i]
+                    return Result(deleted_count=1)
+        return Result(deleted_count=0)
+
+    def delete_many(self, query):
+        with self._lock:
+            kept = [document for document in self.documents if not matches(document, query)]
+            deleted = len(self.documents) - len(kept)
+            self.documents = kept
+        return Result(deleted_count=deleted)
+
+class Database:
+    def __init__(self):
+        self._collections = {}
+
+    def __getitem__(self, name):
+        return self._collections.setdefault(name, Collection())
+
+class InMemoryMongoClient:
+    def __init__(self, *args, **kwargs):
+        self._databases = {}
+
+    def __getitem__(self, name):
+        return self._databases.setdefault(name, Database())
+
+    def get_default_database(self, default=None):
+        return self[default]
+
+    def close(self):
+        pass
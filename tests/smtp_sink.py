@@ -0,0 +1,67 @@
+import socketserver
+import threading
+
+class SMTPSink:
+    # Minimal local SMTP server that accepts and records every message
+    def __init__(self, fail_first=0):
+        self.messages = []
+        self.connections = 0
+        self.fail_first = fail_first
+        self._lock = threading.Lock()
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(line.encode() + b'\r\n')
+
+            def handle(self):
+                with sink._lock:
+                    sink.connections += 1
+                self.reply('220 localhost SMTP sink')
+                envelope = {}
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command = line.decode().strip()
+                    verb = command.split(' ', 1)[0].upper()
+                    if verb in ('EHLO', 'HELO'):
+                        self.reply('250 localhost')
+                    elif verb == 'MAIL':
+                        envelope = {'from': command[10:], 'to': []}
+                        self.reply('250 OK')
+                    elif verb == 'RCPT':
+                        envelope['to'].append(command[8:])
+                        self.reply('250 OK')
+                    elif verb == 'DATA':
+                        self.reply('354 End data with <CR><LF>.<CR><LF>')
+                        data = []
+                        for data_line in iter(self.rfile.readline, b''):
+                            if data_line in (b'.\r\n', b'.\n'):
+                                break
+                            data.append(data_line.decode())
+                        with sink._lock:
+                            if sink.fail_first > 0:
+                                sink.fail_first -= 1
+                                self.reply('451 Try again later')
+                                continue
+                            sink.messages.append(dict(envelope, data=''.join(data)))
+                        self.reply('250 OK')
+                    elif verb == 'QUIT':
+                        self.reply('221 Bye')
+                        return
+                    else:
+                        self.reply('250 OK')
+
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
@@ -1,11 +1,17 @@
+import json
+from datetime import datetime
 import pytest
-from app import app
+from app import create_app
 from pymongo import MongoClient
 
 @pytest.fixture
 def client():
-    app.config['TESTING'] = True
-    app.config['MONGO_URI'] = 'mongodb://localhost:27017/fuel_demand_test_db'
+    app = create_app({
+        'TESTING': True,
+        'MONGO_URI': 'mongodb://localhost:27017/fuel_demand_test_db',
+        'RETRAIN_DEBOUNCE_SECONDS': 0.1,
+        'WEATHER_CACHE_TTL': 30
+    })
     with app.test_client() as client:
         yield client
 
@@ -17,6 +23,20 @@ def cleanup_db():
     db['predictions'].delete_many({})
     db['users'].delete_many({})
 
+def admin_token(client):
+    # cleanup_db removes the admin account created at startup; restore it the way
+    # bootstrap does, so this works whichever test ran first
+    MongoClient('mongodb://localhost:27017/')['fuel_demand_test_db']['users'].update_one(
+        {'username': 'admin'},
+        {'$setOnInsert': {'password': 'adminpassword', 'role': 'admin'}},
+        upsert=True
+    )
+    response = client.post('/login', json={
+        'username': 'admin',
+        'password': 'adminpassword'
+    })
+    return response.json['access_token']
+
 def test_register(client):
     response = client.post('/register', json={
         'username': 'testuser',
@@ -55,7 +75,7 @@ def test_predict(client):
     assert response.status_code == 200
     assert 'prediction' in response.json
 
-def test_get_predictions(client):
+def test_predict_accepts_numeric_strings(client):
     client.post('/register', json={
         'username': 'testuser',
         'password': 'testpassword'
@@ -65,10 +85,22 @@ def test_get_predictions(client):
         'password': 'testpassword'
     })
     token = response.json['access_token']
-    response = client.get('/predictions', headers={'Authorization': f'Bearer {token}'})
+    response = client.post('/predict', json={
+        'temperature': '22.0',
+        'holiday': '0',
+        'fuel_price': '1.3'
+    }, headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    assert 'prediction' in response.json
+    response = client.post('/predict/batch', json=[{
+        'temperature': '22.0',
+        'holiday': 0,
+        'fuel_price': '1.3'
+    }], headers={'Authorization': f'Bearer {token}'})
     assert response.status_code == 200
+    assert len(response.json['predictions']) == 1
 
-def test_update_data(client):
+def test_get_predictions(client):
     client.post('/register', json={
         'username': 'testuser',
         'password': 'testpassword'
@@ -78,11 +110,97 @@ def test_update_data(client):
         'password': 'testpassword'
     })
     token = response.json['access_token']
+    response = client.get('/predictions', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+
+def test_update_data(client):
+    # Retraining is admin-only
+    token = admin_token(client)
     response = client.post('/update-data', json={
         'temperature': 25.0,
         'holiday': 1,
         'fuel_price': 1.5,
         'demand': 1000.0
     }, headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 202
+    assert 'message' in response.json
+    job_id = response.json['job_id']
+    response = client.get(f'/update-data/status/{job_id}', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    assert response.json['status'] in ('pending', 'running', 'succeeded')
+
+def insert_predictions(username, count):
+    client = MongoClient('mongodb://localhost:27017/')
+    timestamp = datetime(2024, 5, 1, 12, 0)
+    # Every record shares one timestamp, so paging relies on the _id tie-break
+    client['fuel_demand_test_db']['predictions'].insert_many([{
+        'input_data': {'temperature': 20.0 + i, 'holiday': 0, 'fuel_price': 1.5},
+        'prediction': 1000.0 + i,
+        'user': username,
+        'timestamp': timestamp
+    } for i in range(count)])
+
+def test_predictions_pages(client):
+    client.post('/register', json={
+        'username': 'testuser',
+        'password': 'testpassword'
+    })
+    response = client.post('/login', json={
+        'username': 'testuser',
+        'password': 'testpassword'
+    })
+    token = response.json['access_token']
+    insert_predictions('testuser', 5)
+    insert_predictions('otheruser', 3)
+    seen = []
+    cursor = None
+    while True:
+        query = {'per_page': 2, **({'cursor': cursor} if cursor else {})}
+        response = client.get('/predictions', query_string=query, headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 200
+        seen.extend(prediction['prediction'] for prediction in response.json['predictions'])
+        cursor = response.json['next']
+        if cursor is None:
+            break
+    assert seen == [1004.0, 1003.0, 1002.0, 1001.0, 1000.0]
+    response = client.get('/predictions', query_string={'cursor': 'not-a-token'}, headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 400
+
+def test_admin_prediction_export(client):
+    token = admin_token(client)
+    insert_predictions('testuser', 5)
+    response = client.get('/admin/predictions', query_string={'per_page': 3}, headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    assert len(response.json['predictions']) == 3
+    response = client.get('/admin/predictions', query_string={'format': 'ndjson', 'cursor': response.json['next']},
+                          headers={'Authorization': f'Bearer {token}'})
     assert response.status_code == 200
-    assert 'message' in response.json
\ No newline at end of file
+    assert response.mimetype == 'application/x-ndjson'
+    assert [json.loads(line)['prediction'] for line in response.data.decode().splitlines()] == [1001.0, 1000.0]
+
+def test_weather_errors_do_not_leak_the_api_key(client, monkeypatch):
+    import app as app_module
+    from weather import WeatherClient
+    # Nothing listens on port 1, so the upstream call fails with the request URL in its error
+    monkeypatch.setattr(app_module, 'weather_client', WeatherClient('SECRETKEY123', url='http://127.0.0.1:1/weather'))
+    client.post('/register', json={
+        'username': 'testuser',
+        'password': 'testpassword'
+    })
+    response = client.post('/login', json={
+        'username': 'testuser',
+        'password': 'testpassword'
+    })
+    token = response.json['access_token']
+    response = client.post('/predict', json={
+        'city': 'London',
+        'holiday': 0,
+        'fuel_price': 1.3
+    }, headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 503
+    assert 'SECRETKEY123' not in response.get_data(as_text=True)
+
+def test_services_follow_create_app_config(client):
+    import app as app_module
+    assert app_module.retrain_scheduler.debounce == 0.1
+    assert app_module.weather_client.ttl == 30
@@ -0,0 +1,83 @@
+import fnmatch
+from cache import LocalCacheBackend, PredictionCache, RedisCacheBackend
+from registry import PublishedModel
+
+class FakeRedis:
+    # Just the commands RedisCacheBackend uses; TTLs are not modelled
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value.encode()
+
+    def scan_iter(self, match):
+        return [key for key in list(self.data) if fnmatch.fnmatchcase(key, match)]
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+def counting_compute(calls):
+    def compute(temperature, holiday, fuel_price):
+        calls.append((temperature, holiday, fuel_price))
+        return temperature * 10 + holiday + fuel_price
+    return compute
+
+def test_nearby_inputs_share_an_entry():
+    cache = PredictionCache(LocalCacheBackend())
+    calls = []
+    first = cache.get_or_compute('v1', 22.0, 0, 1.3, counting_compute(calls))
+    second = cache.get_or_compute('v1', 22.01, 0, 1.3001, counting_compute(calls))
+    assert first == second
+    assert calls == [(22.0, 0, 1.3)]
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+def test_versions_do_not_share_entries():
+    cache = PredictionCache(LocalCacheBackend())
+    calls = []
+    cache.get_or_compute('v1', 22.0, 0, 1.3, counting_compute(calls))
+    cache.get_or_compute('v2', 22.0, 0, 1.3, counting_compute(calls))
+    assert len(calls) == 2
+
+def test_lru_eviction():
+    backend = LocalCacheBackend(maxsize=2)
+    cache = PredictionCache(backend)
+    calls = []
+    for temperature in (10.0, 20.0, 10.0, 30.0, 20.0):
+        cache.get_or_compute('v1', temperature, 0, 1.3, counting_compute(calls))
+    # 20.0 was least recently used when 30.0 arrived, so it was recomputed
+    assert [call[0] for call in calls] == [10.0, 20.0, 30.0, 20.0]
+    assert backend.stats()['evictions'] == 2
+
+def test_ttl_expiry(clock):
+    backend = LocalCacheBackend(ttl=10, clock=clock)
+    cache = PredictionCache(backend)
+    calls = []
+    cache.get_or_compute('v1', 22.0, 0, 1.3, counting_compute(calls))
+    clock.now = 11
+    cache.get_or_compute('v1', 22.0, 0, 1.3, counting_compute(calls))
+    assert len(calls) == 2
+    assert backend.stats()['expirations'] == 1
+
+def test_publish_invalidates_previous_version():
+    backend = LocalCacheBackend()
+    cache = PredictionCache(backend)
+    cache.get_or_compute('v1', 22.0, 0, 1.3, counting_compute([]))
+    cache.on_publish(PublishedModel('v2', None, None), PublishedModel('v1', None, None))
+    assert backend.stats()['size'] == 0
+    assert cache.stats()['invalidations'] == 1
+
+def test_redis_backend():
+    client = FakeRedis()
+    cache = PredictionCache(RedisCacheBackend(client))
+    calls = []
+    cache.get_or_compute('v1', 22.0, 0, 1.3, counting_compute(calls))
+    assert cache.get_or_compute('v1', 22.04, 0, 1.3, counting_compute(calls)) == 221.3
+    assert len(calls) == 1
+    cache.get_or_compute('v2', 22.0, 0, 1.3, counting_compute(calls))
+    assert cache.invalidate('v1') == 1
+    assert list(client.data) == ['prediction-cache:v2:22.0:0:1.3']
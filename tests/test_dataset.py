@@ -0,0 +1,119 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+from bson import ObjectId
+import dataset as dataset_module
+from dataset import TrainingDataStore, detect_format
+from memory_mongo import Collection
+from model import FEATURES
+from training import training_arrays
+
+HISTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'historical_data.csv')
+
+def write_csv(path, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    pd.DataFrame({
+        'timestamp': pd.date_range('2023-01-01', periods=rows, freq='h'),
+        'temperature': rng.uniform(0, 40, rows).round(1),
+        'holiday': rng.integers(0, 2, rows),
+        'fuel_price': rng.uniform(1.0, 2.0, rows).round(2),
+        'demand': rng.integers(500, 1500, rows)
+    }).to_csv(path, index=False)
+
+@pytest.fixture
+def parses(monkeypatch):
+    calls = []
+    read_source = dataset_module.read_source
+    def counting_read_source(path, chunk_rows):
+        calls.append(path)
+        return read_source(path, chunk_rows)
+    monkeypatch.setattr(dataset_module, 'read_source', counting_read_source)
+    return calls
+
+def test_bundled_history_is_read_as_xlsx(tmp_path):
+    source = tmp_path / 'historical_data.csv'
+    shutil.copy(HISTORY, source)
+    assert detect_format(source) == 'xlsx'
+    df = TrainingDataStore(str(source)).frame()
+    assert len(df) == 5
+    assert df['timestamp'].dtype == 'datetime64[ns]'
+    assert df['demand'].tolist()[:2] == [800.0, 1100.0]
+
+def test_source_parsed_once_until_it_changes(tmp_path, parses):
+    source = str(tmp_path / 'history.csv')
+    write_csv(source, 250)
+    expected = pd.read_csv(source)
+    store = TrainingDataStore(source, chunk_rows=100)
+    np.testing.assert_allclose(store.frame()['temperature'], expected['temperature'])
+    TrainingDataStore(source).frame()
+    # Touched but identical content keeps the cached columns
+    os.utime(source, ns=(0, 0))
+    TrainingDataStore(source).frame()
+    assert len(parses) == 1
+    write_csv(source, 300, seed=1)
+    assert len(TrainingDataStore(source).frame()) == 300
+    assert len(parses) == 2
+    assert len([name for name in os.listdir(store.root) if name.startswith('base-')]) == 1
+
+def test_ingested_rows_are_appended_incrementally(tmp_path):
+    source = str(tmp_path / 'history.csv')
+    write_csv(source, 10)
+    collection = Collection()
+    store = TrainingDataStore(source)
+    collection.insert_one({'temperature': 10, 'holiday': 0, 'fuel_price': 1.5, 'demand': 700})
+    assert store.sync(collection) == 1
+    collection.insert_one({'temperature': 12, 'holiday': 1, 'fuel_price': 1.6, 'demand': 750.5})
+    assert store.sync(collection) == 1
+    assert store.sync(collection) == 0
+    df = store.frame()
+    assert len(df) == 12
+    assert df['demand'].tolist()[-2:] == [700.0, 750.5]
+    assert df['timestamp'].iloc[-1] is pd.NaT
+
+def test_out_of_order_ids_trigger_a_rebuild(tmp_path):
+    source = str(tmp_path / 'history.csv')
+    write_csv(source, 10)
+    collection = Collection()
+    collection.insert_one({'temperature': 10, 'holiday': 0, 'fuel_price': 1.5, 'demand': 700})
+    store = TrainingDataStore(source)
+    store.sync(collection)
+    # Written by another client with an earlier ObjectId than the watermark
+    collection.documents.append({
+        '_id': ObjectId.from_datetime(pd.Timestamp('2020-01-01')),
+        'temperature': 5, 'holiday': 0, 'fuel_price': 1.2, 'demand': 600
+    })
+    store.sync(collection)
+    assert sorted(store.ingested.frame()['demand']) == [600.0, 700.0]
+
+def test_torn_append_is_ignored(tmp_path):
+    source = str(tmp_path / 'history.csv')
+    write_csv(source, 10)
+    collection = Collection()
+    collection.insert_one({'temperature': 10, 'holiday': 0, 'fuel_price': 1.5, 'demand': 700})
+    store = TrainingDataStore(source)
+    store.sync(collection)
+    with open(store.ingested.column_path('demand'), 'ab') as f:
+        f.write(np.array([9999.0]).tobytes())
+    assert store.ingested.frame()['demand'].tolist() == [700.0]
+    collection.insert_one({'temperature': 11, 'holiday': 0, 'fuel_price': 1.5, 'demand': 710})
+    store.sync(collection)
+    assert store.ingested.frame()['demand'].tolist() == [700.0, 710.0]
+
+def test_training_arrays_come_from_the_columns_in_time_order(tmp_path):
+    source = str(tmp_path / 'history.csv')
+    write_csv(source, 50)
+    # Out of order on disk, so the rows have to be reordered into X and y
+    rows = pd.read_csv(source)
+    rows.sample(frac=1, random_state=0).to_csv(source, index=False)
+    collection = Collection()
+    collection.insert_one({'temperature': 10, 'holiday': 0, 'fuel_price': 1.5, 'demand': 700})
+    store = TrainingDataStore(source)
+    store.sync(collection)
+    X, y = store.arrays(FEATURES)
+    expected_X, expected_y = training_arrays(store.frame())
+    assert np.array_equal(X, expected_X)
+    assert np.array_equal(y, expected_y)
+    assert y[-1] == 700.0
+    assert X.flags['C_CONTIGUOUS']
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from bson import ObjectId
+from memory_mongo import Collection
+from history import HISTORY_SORT, after_token, decode_token, encode_token, ensure_prediction_indexes, fetch_page, iter_documents
+
+def make_collection(n=23):
+    # Runs of three records share a timestamp, as a batch insert stamps them
+    collection = Collection()
+    start = datetime(2024, 5, 1, 12, 0)
+    collection.insert_many([
+        {'user': 'alice' if i % 4 else 'bob', 'n': i, 'timestamp': start + timedelta(seconds=i // 3)}
+        for i in range(n)
+    ])
+    return collection
+
+def expected_order(collection, query):
+    return [document['n'] for document in collection.find(query).sort(HISTORY_SORT)]
+
+def test_token_round_trip():
+    document = {'timestamp': datetime(2024, 5, 1, 12, 30, 0, 123000), '_id': ObjectId()}
+    assert decode_token(encode_token(document)) == (document['timestamp'], document['_id'])
+
+def test_invalid_token():
+    with pytest.raises(ValueError):
+        decode_token('not-a-token')
+
+def test_after_token_continues_strictly_after_last_document():
+    document = {'timestamp': datetime(2024, 5, 1, 12, 30), '_id': ObjectId()}
+    query = after_token({'user': 'alice'}, encode_token(document))
+    assert query == {'$and': [{'user': 'alice'}, {'$or': [
+        {'timestamp': {'$lt': document['timestamp']}},
+        {'timestamp': document['timestamp'], '_id': {'$lt': document['_id']}}
+    ]}]}
+    assert after_token({'user': 'alice'}, None) == {'user': 'alice'}
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 4, 23, 50])
+def test_pages_cover_every_record_once(limit):
+    collection = make_collection()
+    for query in ({}, {'user': 'alice'}):
+        seen = []
+        token = None
+        while True:
+            page, token = fetch_page(collection, query, limit, token)
+            assert len(page) <= limit
+            assert all('_id' not in document for document in page)
+            seen.extend(document['n'] for document in page)
+            if token is None:
+                break
+        assert seen == expected_order(collection, query)
+
+def test_records_added_while_paging_do_not_shift_pages():
+    collection = make_collection()
+    page, token = fetch_page(collection, {}, 5)
+    # Newer than anything seen so far, so it belongs before the cursor
+    collection.insert_one({'user': 'bob', 'n': 99, 'timestamp': datetime(2024, 5, 2)})
+    rest = []
+    while token:
+        more, token = fetch_page(collection, {}, 5, token)
+        rest.extend(document['n'] for document in more)
+    assert [document['n'] for document in page] + rest == [n for n in expected_order(collection, {}) if n != 99]
+
+def test_export_resumes_from_a_page_token():
+    collection = make_collection()
+    page, token = fetch_page(collection, {}, 7)
+    exported = [document['n'] for document in iter_documents(collection, {}, batch_size=4, token=token)]
+    assert [document['n'] for document in page] + exported == expected_order(collection, {})
+
+def test_indexes_and_timestamp_backfill():
+    collection = Collection()
+    stamped = datetime(2020, 1, 1)
+    legacy_id = ObjectId.from_datetime(datetime(2023, 3, 4, 5, 6, 7))
+    collection.insert_many([{'_id': legacy_id, 'user': 'alice'}, {'user': 'alice', 'timestamp': stamped}])
+    ensure_prediction_indexes(collection)
+    assert [keys for keys, _ in collection.indexes] == [
+        [('user', 1), ('timestamp', -1), ('_id', -1)],
+        [('timestamp', -1), ('_id', -1)]
+    ]
+    assert collection.find_one({'_id': legacy_id})['timestamp'] == datetime(2023, 3, 4, 5, 6, 7)
+    assert collection.find_one({'timestamp': stamped}) is not None
+    # A second start finds nothing left to backfill
+    ensure_prediction_indexes(collection)
+    assert collection.count_documents({'timestamp': {'$exists': False}}) == 0
+
+def test_utc_stamps_order_with_backfilled_records():
+    # New records are stamped in UTC, as the $toDate backfill of older ones is
+    collection = Collection()
+    legacy_id = ObjectId.from_datetime(datetime(2024, 5, 1, 9, 0))
+    collection.insert_many([
+        {'_id': legacy_id, 'n': 0},
+        {'n': 1, 'timestamp': datetime(2024, 5, 1, 10, 0, tzinfo=timezone.utc)},
+        {'n': 2, 'timestamp': datetime(2024, 5, 1, 8, 30, tzinfo=timezone(timedelta(hours=-2)))}
+    ])
+    ensure_prediction_indexes(collection)
+    page, _ = fetch_page(collection, {}, 10)
+    assert [document['n'] for document in page] == [2, 1, 0]
@@ -0,0 +1,65 @@
+import pickle
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from inference import compile_forest
+from model import FEATURES, predict_fuel_demand
+
+def make_frame(n, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'temperature': rng.uniform(-10, 45, n).round(1),
+        'holiday': rng.integers(0, 2, n),
+        'fuel_price': rng.uniform(1.0, 2.2, n).round(2)
+    })
+
+def make_queries(train):
+    rng = np.random.default_rng(7)
+    # Off-grid points plus every training row, so inputs land exactly on thresholds
+    random = np.column_stack([
+        rng.uniform(-15, 50, 2000),
+        rng.integers(0, 2, 2000),
+        rng.uniform(0.9, 2.3, 2000)
+    ])
+    return np.vstack([random, train[FEATURES].to_numpy(dtype=np.float64)])
+
+@pytest.fixture(scope='module', params=[
+    {'n_estimators': 100, 'random_state': 42},
+    {'n_estimators': 1, 'random_state': 0},
+    {'n_estimators': 25, 'max_depth': 3, 'random_state': 1},
+    {'n_estimators': 30, 'min_samples_leaf': 5, 'max_features': 1, 'random_state': 2}
+])
+def forest(request):
+    train = make_frame(500, seed=request.param['random_state'])
+    rng = np.random.default_rng(3)
+    y = 1000 + 10 * train['temperature'] + 200 * train['holiday'] - 150 * train['fuel_price'] + rng.normal(0, 30, len(train))
+    model = RandomForestRegressor(**request.param).fit(train[FEATURES], y)
+    return model, train
+
+def test_vectorized_parity(forest):
+    model, train = forest
+    queries = make_queries(train)
+    expected = model.predict(pd.DataFrame(queries, columns=FEATURES))
+    assert np.array_equal(compile_forest(model).predict(queries), expected)
+
+def test_single_row_parity(forest):
+    model, train = forest
+    queries = make_queries(train)[::10]
+    expected = model.predict(pd.DataFrame(queries, columns=FEATURES))
+    engine = compile_forest(model)
+    actual = np.array([engine.predict_one(*row) for row in queries])
+    assert np.array_equal(actual, expected)
+
+def test_predict_fuel_demand_uses_engine(forest):
+    model, _ = forest
+    engine = compile_forest(model)
+    expected = model.predict(pd.DataFrame([[22.0, 0, 1.3]], columns=FEATURES))[0]
+    assert predict_fuel_demand(engine, 22.0, 0, 1.3) == expected
+
+def test_engine_pickles_without_scratch(forest):
+    model, _ = forest
+    engine = compile_forest(model)
+    engine.predict_one(22.0, 0, 1.3)
+    restored = pickle.loads(pickle.dumps(engine))
+    assert restored.predict_one(22.0, 0, 1.3) == engine.predict_one(22.0, 0, 1.3)
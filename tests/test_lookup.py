@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from inference import LinearEngine, compile_forest
+from lookup import build_lookup
+from registry import ModelRegistry
+from conftest import make_frame
+
+def test_bilinear_is_exact_for_a_linear_model():
+    engine = LinearEngine([10.0, 200.0, -100.0], 1000.0)
+    table = build_lookup(engine, make_frame(500), {'temperature': 9, 'fuel_price': 5})
+    assert table.predict_one(21.3, 1, 1.37) == pytest.approx(engine.predict_one(21.3, 1, 1.37))
+    assert table.report['max_abs_error'] < 1e-9
+    X = np.array([[5.0, 0, 1.1], [39.0, 1, 1.9]])
+    np.testing.assert_allclose(table.predict(X), engine.predict(X))
+
+def test_outside_the_grid_falls_back():
+    table = build_lookup(LinearEngine([10.0, 200.0, -100.0], 1000.0), make_frame(500))
+    assert table.predict_one(-5.0, 0, 1.5) is None
+    assert table.predict_one(20.0, 0, 3.0) is None
+    assert table.predict_one(20.0, 2, 1.5) is None
+    assert np.isnan(table.predict(np.array([[-5.0, 0, 1.5]]))).all()
+
+def test_forest_grid_error_is_reported(tmp_path):
+    df = make_frame(500)
+    model = RandomForestRegressor(n_estimators=10, random_state=42).fit(df[['temperature', 'holiday', 'fuel_price']], df['demand'])
+    engine = compile_forest(model)
+    table = build_lookup(engine, df, {'temperature': 64, 'fuel_price': 64})
+    report = table.report
+    assert report['grid'] == [64, 64, 2]
+    assert 0 < report['mean_abs_error'] <= report['max_abs_error']
+    # Interpolation stays within the range of the model's own predictions
+    assert table.grids.min() >= engine.value.min() - 1e-9
+
+def test_error_is_measured_on_held_out_rows():
+    df = make_frame(500)
+    model = RandomForestRegressor(n_estimators=10, random_state=42).fit(df[['temperature', 'holiday', 'fuel_price']], df['demand'])
+    report = build_lookup(compile_forest(model), df, {'temperature': 16, 'fuel_price': 16}).report
+    assert report['held_out_rows'] == 100
+    # Held-out rows beyond the ranges of the rest are not measured
+    assert 90 <= report['error_samples'] <= 100
+    assert report['held_out_coverage'] == report['error_samples'] / 100
+    assert 0 < report['mean_abs_error'] <= report['max_abs_error']
+    assert 0 < report['uniform_mean_abs_error'] <= report['uniform_max_abs_error']
+    # Too few rows to hold any out: the grid is built but its error is unknown
+    tiny = build_lookup(LinearEngine([10.0, 200.0, -100.0], 1000.0), make_frame(4), {'temperature': 4, 'fuel_price': 4})
+    assert tiny.report['held_out_rows'] == 0
+    assert tiny.report['max_abs_error'] is None
+
+def test_registry_builds_and_reloads_the_grid(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    params = {'n_estimators': 5, 'random_state': 42}
+    published = registry.load_or_train(make_frame(500), params, lookup={'temperature': 16, 'fuel_price': 16})
+    reloaded = registry.load_or_train(make_frame(500), params, lookup={'temperature': 16, 'fuel_price': 16})
+    assert reloaded.lookup.predict_one(20.0, 0, 1.5) == published.lookup.predict_one(20.0, 0, 1.5)
+    assert registry.load_or_train(make_frame(500), params).lookup is None
@@ -0,0 +1,63 @@
+import os
+import threading
+import pytest
+from metrics import Metrics
+
+@pytest.fixture
+def registry():
+    registry = Metrics()
+    registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    registry.counter('requests_total', 'Requests')
+    return registry
+
+def test_threads_are_merged_on_read(registry):
+    def work():
+        for _ in range(1000):
+            registry.inc('requests_total', endpoint='predict')
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert registry.counter_totals('requests_total', 'endpoint') == {'predict': 4000}
+
+def test_prometheus_exposition(registry):
+    registry.inc('requests_total', endpoint='predict', status=200)
+    for value in (0.05, 0.1, 0.5, 3.0):
+        registry.observe('latency_seconds', value, endpoint='predict')
+    text = registry.exposition()
+    assert '# TYPE requests_total counter' in text
+    assert 'requests_total{endpoint="predict",status="200"} 1' in text
+    assert '# TYPE latency_seconds histogram' in text
+    assert 'latency_seconds_bucket{endpoint="predict",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{endpoint="predict",le="1.0"} 3' in text
+    assert 'latency_seconds_bucket{endpoint="predict",le="+Inf"} 4' in text
+    assert 'latency_seconds_count{endpoint="predict"} 4' in text
+    assert 'latency_seconds_sum{endpoint="predict"} 3.65' in text
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_forked_workers_aggregate_through_directory(registry, tmp_path):
+    registry.configure(str(tmp_path), flush_interval=3600)
+    registry.inc('requests_total', endpoint='predict')
+    pids = []
+    for _ in range(2):
+        pid = os.fork()
+        if pid == 0:
+            # The child starts from zero and reports only its own requests
+            registry.inc('requests_total', endpoint='predict', amount=10)
+            registry.flush()
+            os._exit(0)
+        pids.append(pid)
+    for pid in pids:
+        os.waitpid(pid, 0)
+    assert registry.counter_totals('requests_total', 'endpoint') == {'predict': 21}
+
+def test_finished_threads_are_folded(registry):
+    registry.max_shards = 8
+    for _ in range(200):
+        thread = threading.Thread(target=registry.inc, args=('requests_total',), kwargs={'endpoint': 'predict'})
+        thread.start()
+        thread.join()
+    assert len(registry._shards) <= 8
+    assert registry.counter_totals('requests_total', 'endpoint') == {'predict': 200}
+    assert len(registry._shards) == 0
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from model import FEATURES, build_feature_matrix, predict_fuel_demand_batch
+
+@pytest.fixture
+def fitted_model():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'temperature': rng.uniform(0, 40, 200),
+        'holiday': rng.integers(0, 2, 200),
+        'fuel_price': rng.uniform(1.0, 2.0, 200)
+    })
+    y = 1000 + 10 * df['temperature'] + 200 * df['holiday'] - 100 * df['fuel_price']
+    model = RandomForestRegressor(n_estimators=10, random_state=42)
+    model.fit(df[FEATURES], y)
+    return model
+
+def test_build_feature_matrix():
+    X = build_feature_matrix([
+        {'temperature': 22.0, 'holiday': 0, 'fuel_price': 1.3},
+        {'temperature': 30.5, 'holiday': 1, 'fuel_price': 1.5}
+    ])
+    assert X.dtype == np.float64
+    assert X.flags['C_CONTIGUOUS']
+    assert X.tolist() == [[22.0, 0.0, 1.3], [30.5, 1.0, 1.5]]
+
+def test_predict_fuel_demand_batch(fitted_model):
+    rows = [
+        {'temperature': 22.0, 'holiday': 0, 'fuel_price': 1.3},
+        {'temperature': 30.5, 'holiday': 1, 'fuel_price': 1.5}
+    ]
+    predictions = predict_fuel_demand_batch(fitted_model, rows)
+    expected = fitted_model.predict(pd.DataFrame(rows)[FEATURES])
+    assert predictions.tolist() == expected.tolist()
@@ -0,0 +1,94 @@
+import json
+import os
+import threading
+import pytest
+from monitoring import DriftMonitor, DriftWatcher, build_profile, histogram_quantile
+from registry import ModelRegistry, PublishedModel
+from conftest import make_frame
+
+def published(version='v1', seed=0):
+    df = make_frame(5000, seed=seed)
+    return PublishedModel(version, None, None, None, build_profile(df, df['demand']))
+
+def replay(monitor, df, version='v1', shift=0.0):
+    for row in df.itertuples():
+        monitor.observe(version, row.temperature + shift, row.holiday, row.fuel_price, row.demand + 10 * shift)
+
+def test_matching_traffic_is_stable_and_shifted_traffic_drifts():
+    monitor = DriftMonitor(min_samples=1000)
+    monitor.on_publish(published())
+    replay(monitor, make_frame(2000, seed=1))
+    report = monitor.report()
+    assert report['status'] == 'stable'
+    assert report['observations'] == 2000
+    assert all(scores['psi'] < 0.05 and scores['ks'] < 0.05 for scores in report['columns'].values())
+    assert report['columns']['temperature']['quantiles']['p50'] == pytest.approx(20, abs=1.5)
+
+    monitor.on_publish(published())
+    replay(monitor, make_frame(2000, seed=1), shift=15.0)
+    report = monitor.report()
+    assert report['status'] == 'drift'
+    assert report['drifted'] == ['temperature', 'prediction']
+    assert report['columns']['temperature']['outside_reference_range'] == pytest.approx(15 / 40, abs=0.05)
+    assert report['columns']['temperature']['max'] > 50
+
+def test_other_versions_are_not_counted_and_publish_resets():
+    monitor = DriftMonitor(min_samples=10)
+    monitor.on_publish(published('v1'))
+    replay(monitor, make_frame(50), version='v1')
+    replay(monitor, make_frame(50), version='v0')
+    assert monitor.report()['observations'] == 50
+    monitor.on_publish(published('v2'))
+    report = monitor.report()
+    assert report['model_version'] == 'v2'
+    assert report['observations'] == 0
+    assert report['status'] == 'insufficient_data'
+    monitor.on_publish(PublishedModel('v3', None, None))
+    assert monitor.report() == {'model_version': 'v3', 'status': 'no_reference'}
+    monitor.observe('v3', 20.0, 0, 1.5, 1000.0)
+
+def test_shards_of_finished_threads_are_folded():
+    monitor = DriftMonitor(max_shards=4)
+    monitor.on_publish(published())
+    df = make_frame(100, seed=2)
+    for _ in range(20):
+        thread = threading.Thread(target=replay, args=(monitor, df))
+        thread.start()
+        thread.join()
+    assert len(monitor._shards) <= 4
+    assert monitor.report()['observations'] == 2000
+
+def test_histogram_quantiles_use_the_observed_range():
+    counts = [0, 10, 10, 0]
+    edges = [0.0, 1.0, 2.0]
+    assert histogram_quantile(counts, edges, 0.5, 1.5, 0.5) == pytest.approx(1.0)
+    assert histogram_quantile(counts, edges, 0.5, 1.5, 1.0) == pytest.approx(1.5)
+
+def test_watcher_submits_one_retrain_per_version():
+    monitor = DriftMonitor(min_samples=100)
+    monitor.on_publish(published())
+    submitted = []
+    watcher = DriftWatcher(monitor, lambda: submitted.append('job') or f'job-{len(submitted)}')
+    replay(monitor, make_frame(500, seed=3))
+    assert watcher.check() is None
+    replay(monitor, make_frame(2000, seed=3), shift=20.0)
+    assert watcher.check() == 'job-1'
+    assert watcher.check() is None
+    assert submitted == ['job']
+    # A new version starts over and forgets the old one
+    monitor.on_publish(published('v2'))
+    replay(monitor, make_frame(2000, seed=3), version='v2', shift=20.0)
+    assert watcher.check() == 'job-2'
+    assert watcher.triggered == {'v2': 'job-2'}
+
+def test_registry_saves_the_reference_profile(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    published = registry.load_or_train(make_frame(300), {'n_estimators': 5, 'random_state': 42})
+    [key] = [name for name in os.listdir(tmp_path) if os.path.isdir(os.path.join(tmp_path, name))]
+    with open(os.path.join(tmp_path, key, 'profile.json')) as f:
+        assert json.load(f) == published.profile
+    assert published.profile['rows'] == 300
+    assert set(published.profile['columns']) == {'temperature', 'holiday', 'fuel_price', 'prediction'}
+    # holiday takes two values, so it is cut at one edge between them
+    assert published.profile['columns']['holiday']['edges'] == [0.0, 1.0]
+    assert registry.load_published(key).profile == published.profile
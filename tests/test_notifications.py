@@ -0,0 +1,63 @@
+import time
+from flask import Flask
+from flask_mail import Mail
+from notifications import NotificationQueue
+from smtp_sink import SMTPSink
+
+def make_mail(port):
+    app = Flask(__name__)
+    app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=port, MAIL_USE_TLS=False)
+    return app, Mail(app)
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return
+        time.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+def test_burst_becomes_one_digest_per_user():
+    with SMTPSink() as sink:
+        app, mail = make_mail(sink.port)
+        notifications = NotificationQueue(app, mail, 'noreply@example.com', digest_window=0.2).start()
+        for prediction in (1000.0, 1100.0, 1200.0):
+            notifications.notify('alice', prediction)
+        notifications.notify('bob', 900.0)
+        wait_until(lambda: len(sink.messages) == 2)
+        notifications.close()
+        recipients = sorted(message['to'][0] for message in sink.messages)
+        assert recipients == ['<alice@example.com>', '<bob@example.com>']
+        alice = next(message for message in sink.messages if 'alice' in message['to'][0])
+        assert '3 New Fuel Demand Predictions' in alice['data']
+        # Both digests went out over one connection
+        assert sink.connections == 1
+        assert notifications.stats()['predictions_sent'] == 4
+
+def test_retries_with_backoff():
+    with SMTPSink(fail_first=1) as sink:
+        app, mail = make_mail(sink.port)
+        notifications = NotificationQueue(app, mail, 'noreply@example.com', digest_window=0, backoff=0.05).start()
+        notifications.notify('alice', 1000.0)
+        wait_until(lambda: len(sink.messages) == 1)
+        notifications.close()
+        stats = notifications.stats()
+        assert stats['retries'] == 1
+        assert stats['failed'] == 0
+
+def test_full_queue_drops_instead_of_blocking():
+    app, mail = make_mail(1)
+    notifications = NotificationQueue(app, mail, 'noreply@example.com', max_queue=2)
+    assert notifications.notify('alice', 1.0)
+    assert notifications.notify('alice', 2.0)
+    assert not notifications.notify('alice', 3.0)
+    assert notifications.stats()['dropped'] == 1
+
+def test_close_flushes_pending_digests():
+    with SMTPSink() as sink:
+        app, mail = make_mail(sink.port)
+        notifications = NotificationQueue(app, mail, 'noreply@example.com', digest_window=3600).start()
+        notifications.notify('alice', 1000.0)
+        time.sleep(0.05)
+        notifications.close()
+        assert len(sink.messages) == 1
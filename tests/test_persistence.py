@@ -0,0 +1,110 @@
+import time
+import pytest
+from pymongo.errors import ServerSelectionTimeoutError
+import persistence
+from memory_mongo import Collection
+from persistence import WriteBehindWriter, file_lock
+
+class FlakyCollection(Collection):
+    # Fails every write while down; records the size of each batch
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+        self.down = False
+
+    def insert_many(self, documents, ordered=True):
+        if self.down:
+            raise ServerSelectionTimeoutError('localhost:27017: connection refused')
+        self.calls.append(len(documents))
+        return super().insert_many(documents, ordered)
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return
+        time.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+@pytest.fixture
+def collection():
+    return FlakyCollection()
+
+def test_flushes_on_batch_size(collection, tmp_path):
+    writer = WriteBehindWriter(collection, batch_size=10, flush_interval=60,
+                               spill_path=str(tmp_path / 'spill.ndjson')).start()
+    writer.write_many([{'n': i} for i in range(25)])
+    wait_until(lambda: len(collection.documents) == 20)
+    assert collection.calls == [10, 10]
+    writer.close()
+    assert len(collection.documents) == 25
+    assert writer.stats()['queue_depth'] == 0
+
+def test_flushes_on_interval(collection, tmp_path):
+    writer = WriteBehindWriter(collection, batch_size=100, flush_interval=0.05,
+                               spill_path=str(tmp_path / 'spill.ndjson')).start()
+    writer.write({'n': 1})
+    wait_until(lambda: len(collection.documents) == 1)
+    writer.close()
+
+def test_outage_spills_and_replays(collection, tmp_path):
+    spill_path = tmp_path / 'spill.ndjson'
+    writer = WriteBehindWriter(collection, batch_size=5, flush_interval=0.02,
+                               spill_path=str(spill_path), retry_interval=0.05).start()
+    collection.down = True
+    writer.write_many([{'n': i} for i in range(5)])
+    wait_until(lambda: writer.stats()['spilled'] == 5)
+    assert spill_path.exists()
+    collection.down = False
+    wait_until(lambda: len(collection.documents) == 5)
+    writer.close()
+    assert writer.stats()['replayed'] == 5
+    assert not spill_path.exists()
+
+def test_overflow_policies(collection, tmp_path):
+    spill_path = tmp_path / 'spill.ndjson'
+    dropping = WriteBehindWriter(collection, max_queue=3, overflow='drop', spill_path=str(spill_path))
+    dropping.write_many([{'n': i} for i in range(5)])
+    assert dropping.stats()['dropped'] == 2
+    assert dropping.stats()['queue_depth'] == 3
+    spilling = WriteBehindWriter(collection, max_queue=3, overflow='spill', spill_path=str(spill_path))
+    spilling.write_many([{'n': i} for i in range(5)])
+    assert spilling.stats()['spilled'] == 2
+    assert len(spill_path.read_text().splitlines()) == 2
+
+def test_close_spills_when_mongo_is_down(collection, tmp_path):
+    spill_path = tmp_path / 'spill.ndjson'
+    writer = WriteBehindWriter(collection, batch_size=100, flush_interval=60, spill_path=str(spill_path)).start()
+    collection.down = True
+    writer.write_many([{'n': i} for i in range(3)])
+    writer.close()
+    assert len(spill_path.read_text().splitlines()) == 3
+
+def test_replay_skips_corrupt_lines(collection, tmp_path):
+    spill_path = tmp_path / 'spill.ndjson'
+    spill_path.write_text('{"n": 1}\n{"n": 2, "tor\n{"n": 3}\n')
+    writer = WriteBehindWriter(collection, batch_size=5, flush_interval=0.02,
+                               spill_path=str(spill_path)).start()
+    wait_until(lambda: len(collection.documents) == 2)
+    writer.close()
+    assert sorted(document['n'] for document in collection.documents) == [1, 3]
+    assert writer.stats()['corrupt'] == 1
+    assert not spill_path.exists()
+    assert not (tmp_path / 'spill.ndjson.replaying').exists()
+
+@pytest.mark.parametrize('has_fcntl', [True, False])
+def test_replay_waits_for_another_process(collection, tmp_path, monkeypatch, has_fcntl):
+    if not has_fcntl:
+        # Windows: the lock falls back to one held within the process
+        monkeypatch.setattr(persistence, 'fcntl', None)
+    spill_path = tmp_path / 'spill.ndjson'
+    spill_path.write_text('{"n": 1}\n')
+    writer = WriteBehindWriter(collection, batch_size=5, spill_path=str(spill_path))
+    with file_lock(str(spill_path) + '.replaying.lock'):
+        # flock is per open file, so a second open stands in for another worker
+        writer._replay_spill()
+        assert spill_path.exists()
+        assert not collection.documents
+    writer._replay_spill()
+    assert len(collection.documents) == 1
+    assert not spill_path.exists()
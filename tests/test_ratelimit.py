@@ -0,0 +1,150 @@
+import threading
+import time
+from flask import Flask, request
+from limits import parse_many
+from ratelimit import RateLimiter, RedisQuotaStore
+from conftest import FakeClock
+
+class FakeRedis:
+    # Just the pipelined INCRBY/EXPIRE that RedisQuotaStore sends; counts round-trips
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+        self.round_trips = 0
+        self.down = False
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def incrby(self, name, amount):
+        self.commands.append(('incrby', name, amount))
+
+    def expire(self, name, seconds):
+        self.commands.append(('expire', name, seconds))
+
+    def execute(self):
+        if self.redis.down:
+            raise ConnectionError('Redis is down')
+        self.redis.round_trips += 1
+        results = []
+        for command, name, value in self.commands:
+            if command == 'incrby':
+                self.redis.data[name] = self.redis.data.get(name, 0) + value
+                results.append(self.redis.data[name])
+            else:
+                self.redis.expiry[name] = value
+                results.append(True)
+        return results
+
+class YieldingLock:
+    # Gives waiting threads the lock after every release, so tokens a thread has just
+    # acquired are often spent by others before it gets back in
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        self.lock.acquire()
+
+    def __exit__(self, *exc_info):
+        self.lock.release()
+        time.sleep(0.0002)
+
+def contended_limiter():
+    limiter = RateLimiter(RedisQuotaStore(FakeRedis()), lease_size=1, clock=FakeClock(1_000_000.0))
+    limiter._lock = YieldingLock()
+    return limiter
+
+def test_workers_sharing_redis_never_exceed_the_quota():
+    redis, clock = FakeRedis(), FakeClock(1_000_000.0)
+    workers = [RateLimiter(RedisQuotaStore(redis), clock=clock) for _ in range(3)]
+    items = parse_many('1000 per hour')
+    allowed = sum(workers[i % 3].hit('user:alice', items)[0] for i in range(1500))
+    # Up to a few leases can be stranded in other workers, never more than the quota
+    assert 950 <= allowed <= 1000
+    assert redis.round_trips < 150
+    assert all(seconds == 3601 for seconds in redis.expiry.values())
+
+def test_window_resets_and_reports_retry_after():
+    clock = FakeClock(7200.0)
+    limiter = RateLimiter(RedisQuotaStore(FakeRedis()), clock=clock)
+    items = parse_many('5 per minute;100 per hour')
+    assert [limiter.hit('user:bob', items)[0] for _ in range(6)] == [True] * 5 + [False]
+    clock.now += 15
+    allowed, retry_after = limiter.hit('user:bob', items)
+    assert not allowed and retry_after == 45
+    clock.now += 45
+    assert limiter.hit('user:bob', items)[0]
+    assert limiter.stats()['denied'] == 2
+
+def test_unreachable_store_fails_open():
+    redis = FakeRedis()
+    redis.down = True
+    limiter = RateLimiter(RedisQuotaStore(redis), clock=FakeClock(1_000_000.0))
+    assert limiter.hit('user:carol', parse_many('1 per hour')) == (True, 0.0)
+    assert limiter.stats()['store_errors'] == 1
+
+def test_quotas_follow_the_callers_role():
+    app = Flask(__name__)
+    limiter = RateLimiter(
+        quotas={'user': '2 per hour', 'admin': '4 per hour'},
+        key_func=lambda: (request.headers['X-User'], request.headers['X-Role']),
+        clock=FakeClock(7200.0)
+    ).init_app(app)
+
+    @app.route('/limited')
+    def limited():
+        return 'ok'
+
+    @app.route('/health')
+    @limiter.exempt
+    def health():
+        return 'ok'
+
+    client = app.test_client()
+    def statuses(user, role, path='/limited'):
+        return [client.get(path, headers={'X-User': user, 'X-Role': role}).status_code for _ in range(5)]
+
+    assert statuses('alice', 'user') == [200, 200, 429, 429, 429]
+    assert statuses('root', 'admin') == [200, 200, 200, 200, 429]
+    assert statuses('bob', 'batch-client') == [200, 200, 429, 429, 429]
+    assert statuses('alice', 'user', '/health') == [200] * 5
+    response = client.get('/limited', headers={'X-User': 'alice', 'X-Role': 'user'})
+    assert response.json['error'] == 'Rate limit exceeded'
+    assert response.headers['Retry-After'] == '3600'
+
+def test_contended_key_is_not_denied_while_quota_remains():
+    limiter = contended_limiter()
+    items = parse_many('100000 per hour')
+    results = []
+
+    def hammer():
+        results.extend(limiter.hit('user:dave', items)[0] for _ in range(100))
+
+    threads = [threading.Thread(target=hammer) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 1600
+    assert all(results)
+    assert limiter.stats()['denied'] == 0
+
+def test_exhausted_window_still_denies_under_contention():
+    limiter = contended_limiter()
+    items = parse_many('50 per hour')
+    results = []
+
+    def hammer():
+        results.extend(limiter.hit('user:erin', items)[0] for _ in range(20))
+
+    threads = [threading.Thread(target=hammer) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(results) == 50
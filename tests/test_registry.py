@@ -0,0 +1,68 @@
+import multiprocessing
+import numpy as np
+import pytest
+import registry as registry_module
+from model import FEATURES
+from registry import ModelRegistry
+from conftest import make_frame
+
+PARAMS = {'n_estimators': 10, 'random_state': 42}
+
+@pytest.fixture
+def training_calls(monkeypatch):
+    calls = []
+    train_model = registry_module.train_model
+    def counting_train_model(df, params):
+        calls.append(len(df))
+        return train_model(df, params)
+    monkeypatch.setattr(registry_module, 'train_model', counting_train_model)
+    return calls
+
+def test_warm_start_skips_training(tmp_path, training_calls):
+    df = make_frame()
+    version, model, engine, _, _ = ModelRegistry(str(tmp_path)).load_or_train(df, PARAMS)
+    assert version is not None
+    assert training_calls == [len(df)]
+    warm_version, warm_model, warm_engine, _, _ = ModelRegistry(str(tmp_path)).load_or_train(df, PARAMS)
+    assert warm_version == version
+    assert training_calls == [len(df)]
+    # The estimator is only read from disk once something uses it
+    assert warm_model._model is None
+    X = df[FEATURES].to_numpy()
+    assert np.array_equal(warm_engine.predict(X), warm_model.predict(df[FEATURES]))
+    assert warm_model.load() is warm_model.load()
+    assert warm_model.n_estimators == PARAMS['n_estimators']
+
+def train_in_worker(root, calls):
+    original = registry_module.train_model
+    def train_model(df, params):
+        calls.put(len(df))
+        return original(df, params)
+    registry_module.train_model = train_model
+    ModelRegistry(root).load_or_train(make_frame(), PARAMS)
+
+def test_workers_share_one_training(tmp_path):
+    # Worker processes retraining the same data at once: one trains, the others load
+    context = multiprocessing.get_context('fork')
+    calls = context.Queue()
+    workers = [context.Process(target=train_in_worker, args=(str(tmp_path), calls)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+    assert calls.get(timeout=5) == 200
+    assert calls.empty()
+
+def test_engine_arrays_are_memory_mapped(tmp_path):
+    _, _, engine, _, _ = ModelRegistry(str(tmp_path)).load_or_train(make_frame(), PARAMS)
+    assert isinstance(engine.threshold, np.memmap)
+    assert isinstance(engine.children, np.memmap)
+
+def test_retrains_when_data_or_params_change(tmp_path, training_calls):
+    registry = ModelRegistry(str(tmp_path))
+    version, _, _, _, _ = registry.load_or_train(make_frame(seed=0), PARAMS)
+    new_data_version, _, _, _, _ = registry.load_or_train(make_frame(seed=1), PARAMS)
+    new_params_version, _, _, _, _ = registry.load_or_train(make_frame(seed=0), {**PARAMS, 'n_estimators': 5})
+    assert len({version, new_data_version, new_params_version}) == 3
+    assert len(training_calls) == 3
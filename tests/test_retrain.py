@@ -0,0 +1,108 @@
+import threading
+import time
+import pytest
+from registry import ModelSlot, PublishedModel
+from retrain import JobStore, RetrainScheduler
+
+class FakeTrainer:
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self):
+        self.release.wait(5)
+        self.calls += 1
+        if self.fail:
+            return None
+        return PublishedModel(f'v{self.calls}', None, None)
+
+def wait_for(scheduler, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = scheduler.status(job_id)
+        if job['status'] in ('succeeded', 'failed'):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+@pytest.fixture
+def slot():
+    return ModelSlot(PublishedModel('v0', None, None))
+
+def test_burst_coalesces_into_one_retrain(slot):
+    trainer = FakeTrainer()
+    scheduler = RetrainScheduler(trainer, slot, debounce=0.1, min_interval=0).start()
+    try:
+        job_ids = {scheduler.submit() for _ in range(20)}
+        assert len(job_ids) == 1
+        job = wait_for(scheduler, job_ids.pop())
+        assert job['status'] == 'succeeded'
+        assert job['requests'] == 20
+        assert trainer.calls == 1
+        assert slot.current.version == 'v1'
+    finally:
+        scheduler.stop()
+
+def test_submit_during_run_schedules_another_job(slot):
+    trainer = FakeTrainer()
+    trainer.release.clear()
+    scheduler = RetrainScheduler(trainer, slot, debounce=0, min_interval=0).start()
+    try:
+        first = scheduler.submit()
+        while scheduler.status(first)['status'] != 'running':
+            time.sleep(0.01)
+        second = scheduler.submit()
+        assert second != first
+        trainer.release.set()
+        assert wait_for(scheduler, first)['model_version'] == 'v1'
+        assert wait_for(scheduler, second)['model_version'] == 'v2'
+    finally:
+        scheduler.stop()
+
+def test_min_interval_delays_next_run(slot):
+    trainer = FakeTrainer()
+    scheduler = RetrainScheduler(trainer, slot, debounce=0, min_interval=0.3).start()
+    try:
+        wait_for(scheduler, scheduler.submit())
+        started = time.monotonic()
+        wait_for(scheduler, scheduler.submit())
+        assert time.monotonic() - started >= 0.25
+    finally:
+        scheduler.stop()
+
+def test_failed_training_keeps_serving_model(slot):
+    scheduler = RetrainScheduler(FakeTrainer(fail=True), slot, debounce=0, min_interval=0).start()
+    try:
+        job = wait_for(scheduler, scheduler.submit())
+        assert job['status'] == 'failed'
+        assert slot.current.version == 'v0'
+    finally:
+        scheduler.stop()
+
+def test_publish_notifies_subscribers(slot):
+    seen = []
+    slot.subscribe(lambda published, previous: seen.append((published.version, previous.version)))
+    slot.publish(PublishedModel('v1', None, None))
+    assert seen == [('v1', 'v0')]
+
+def test_job_status_is_shared_through_the_store(slot, tmp_path):
+    # Two schedulers over one directory stand in for two worker processes
+    store = JobStore(str(tmp_path / 'jobs'), max_jobs=2)
+    scheduler = RetrainScheduler(FakeTrainer(), slot, debounce=0, min_interval=0, store=store).start()
+    other = RetrainScheduler(FakeTrainer(), ModelSlot(), store=JobStore(str(tmp_path / 'jobs')))
+    try:
+        job_id = scheduler.submit()
+        wait_for(scheduler, job_id)
+        job = other.status(job_id)
+        assert job['status'] == 'succeeded'
+        assert job['model_version'] == 'v1'
+        assert job['finished_at'] is not None
+        assert other.status('0' * 32) is None
+        assert other.status('../jobs') is None
+        for _ in range(3):
+            wait_for(scheduler, scheduler.submit())
+        assert len(list((tmp_path / 'jobs').glob('*.json'))) == 2
+    finally:
+        scheduler.stop()
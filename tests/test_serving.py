@@ -0,0 +1,113 @@
+import json
+import anyio
+from flask import Flask, jsonify, request
+from asgi import create_asgi_app
+from ratelimit import LocalQuotaStore, RateLimiter, RedisQuotaStore
+from registry import ModelRegistry, ModelSlot
+from retrain import RegistryWatcher
+from serve import warn_unshared_limits
+from conftest import make_frame
+
+def call(asgi_app, method, path, body=b'', headers=(), query=b''):
+    # One request through the ASGI app, body sent in two parts
+    messages = [
+        {'type': 'http.request', 'body': body[:3], 'more_body': True},
+        {'type': 'http.request', 'body': body[3:], 'more_body': False}
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http', 'http_version': '1.1', 'method': method, 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'root_path': '', 'query_string': query,
+        'headers': [(name.encode(), value.encode()) for name, value in headers],
+        'client': ('127.0.0.1', 5000), 'server': ('127.0.0.1', 8000)
+    }
+    anyio.run(asgi_app, scope, receive, send)
+    status = sent[0]['status']
+    response = b''.join(message.get('body', b'') for message in sent[1:])
+    return status, json.loads(response)
+
+def test_asgi_bridge_runs_the_flask_app():
+    flask_app = Flask(__name__)
+
+    @flask_app.route('/echo', methods=['POST'])
+    def echo():
+        return jsonify({'json': request.json, 'mode': request.args.get('mode')}), 201
+
+    ready = {'state': ({'status': 'unavailable'}, 503)}
+    asgi_app = create_asgi_app(flask_app.wsgi_app, lambda: ready['state'], threads=2)
+    body = json.dumps({'temperature': 21.5}).encode()
+    status, response = call(asgi_app, 'POST', '/echo', body, [('content-type', 'application/json')], b'mode=exact')
+    assert status == 201
+    assert response == {'json': {'temperature': 21.5}, 'mode': 'exact'}
+    assert call(asgi_app, 'GET', '/healthz') == (200, {'status': 'ok'})
+    assert call(asgi_app, 'GET', '/readyz') == (503, {'status': 'unavailable'})
+    ready['state'] = ({'status': 'ready'}, 200)
+    assert call(asgi_app, 'GET', '/readyz') == (200, {'status': 'ready'})
+
+def test_asgi_bridge_streams_the_request_body():
+    # Each NDJSON line reaches the view before the next body message is pulled
+    flask_app = Flask(__name__)
+    events = []
+
+    @flask_app.route('/lines', methods=['POST'])
+    def lines():
+        for line in request.stream:
+            events.append(('read', line))
+        return jsonify({'events': len(events)})
+
+    parts = [b'{"a": 1}\n', b'{"a": 2}\n', b'{"a": 3}\n']
+    messages = [{'type': 'http.request', 'body': part, 'more_body': index < len(parts) - 1}
+                for index, part in enumerate(parts)]
+    sent = []
+
+    async def receive():
+        message = messages.pop(0)
+        events.append(('received', message['body']))
+        return message
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http', 'http_version': '1.1', 'method': 'POST', 'scheme': 'http',
+        'path': '/lines', 'raw_path': b'/lines', 'root_path': '', 'query_string': b'',
+        'headers': [(b'content-type', b'application/x-ndjson'), (b'transfer-encoding', b'chunked')],
+        'client': ('127.0.0.1', 5000), 'server': ('127.0.0.1', 8000)
+    }
+    anyio.run(create_asgi_app(flask_app.wsgi_app, lambda: ({}, 200), threads=2), scope, receive, send)
+    assert sent[0]['status'] == 200
+    assert events == [event for part in parts for event in (('received', part), ('read', part))]
+
+def test_watcher_follows_models_published_by_other_processes(tmp_path):
+    trainer = ModelRegistry(str(tmp_path))
+    follower = ModelRegistry(str(tmp_path))
+    slot = ModelSlot()
+    watcher = RegistryWatcher(follower, slot, follower.load_published)
+    assert not watcher.check()
+    published = trainer.load_or_train(make_frame(), {'n_estimators': 5, 'random_state': 42})
+    assert watcher.check()
+    assert slot.current.version == published.version
+    assert not watcher.check()
+    retrained = trainer.load_or_train(make_frame(seed=1), {'n_estimators': 5, 'random_state': 42})
+    assert watcher.check()
+    assert slot.current.version == retrained.version
+
+def test_warns_when_workers_count_rate_limits_alone(caplog):
+    class Service:
+        limiter = RateLimiter(LocalQuotaStore())
+
+    warn_unshared_limits(Service, 1)
+    assert not caplog.records
+    warn_unshared_limits(Service, 4)
+    assert 'RATE_LIMIT_REDIS_URL' in caplog.records[0].getMessage()
+    Service.limiter = RateLimiter(RedisQuotaStore(None))
+    caplog.clear()
+    warn_unshared_limits(Service, 4)
+    assert not caplog.records
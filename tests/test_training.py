@@ -0,0 +1,76 @@
+import json
+import os
+import numpy as np
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.linear_model import Ridge
+from inference import EstimatorEngine, LinearEngine, compile_model
+from registry import ModelRegistry
+from training import choose, cross_validate, pool_context, select_and_train, training_arrays
+from conftest import make_frame
+
+def test_selection_reports_every_candidate():
+    model, report = select_and_train(make_frame(300, timestamps=True, noise=5.0), {'n_splits': 3}, processes=2)
+    assert set(report['candidates']) == {'linear', 'hist_gradient_boosting', 'random_forest'}
+    for result in report['candidates'].values():
+        assert result['status'] == 'ok'
+        assert result['folds'] == 3
+        assert result['fit_seconds'] > 0
+        assert result['predict_one_seconds'] > 0
+    # The data is linear, so the linear baseline wins on validation error
+    assert report['winner'] == 'linear'
+    assert isinstance(model, Ridge)
+
+def test_latency_limit_and_budget():
+    report = {
+        'fast': {'status': 'ok', 'mae': 10.0, 'predict_one_seconds': 0.0001},
+        'accurate': {'status': 'ok', 'mae': 5.0, 'predict_one_seconds': 0.01},
+        'slow': {'status': 'timed_out', 'folds': 1}
+    }
+    assert choose(report) == 'accurate'
+    assert choose(report, max_predict_seconds=0.001) == 'fast'
+    model, report = select_and_train(make_frame(300, timestamps=True, noise=5.0), {'budget_seconds': 0}, processes=1)
+    assert report['winner'] == 'random_forest'
+    assert all(result['status'] == 'timed_out' for result in report['candidates'].values())
+
+def test_engines_match_estimators():
+    df = make_frame(300, timestamps=True, noise=5.0)
+    X = df[['temperature', 'holiday', 'fuel_price']].to_numpy()
+    y = df['demand'].to_numpy()
+    for estimator, engine_class in ((Ridge(), LinearEngine), (HistGradientBoostingRegressor(max_iter=20), EstimatorEngine)):
+        estimator.fit(X, y)
+        engine = compile_model(estimator)
+        assert isinstance(engine, engine_class)
+        np.testing.assert_allclose(engine.predict(X[:50]), estimator.predict(X[:50]))
+        assert abs(engine.predict_one(*X[0]) - estimator.predict(X[:1])[0]) < 1e-6
+
+def test_report_saved_next_to_artifact(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    published = registry.load_or_train(make_frame(300, timestamps=True, noise=5.0), selection={'n_splits': 2, 'candidates': ['linear']})
+    [key] = [name for name in os.listdir(tmp_path) if os.path.isdir(os.path.join(tmp_path, name))]
+    with open(os.path.join(tmp_path, key, 'training_report.json')) as f:
+        report = json.load(f)
+    assert report['winner'] == 'linear'
+    assert isinstance(published.engine, LinearEngine)
+
+def test_training_in_a_forked_child_after_the_parent():
+    # serve.py trains in the master, then forks workers that may retrain later
+    X, y = training_arrays(make_frame(300, timestamps=True, noise=5.0))
+    assert cross_validate(X, y, ['linear'], 2, 60, processes=1)['linear']['status'] == 'ok'
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_end)
+        try:
+            status = cross_validate(X, y, ['linear'], 2, 60, processes=1)['linear']['status']
+            # The parent's forkserver is not the child's to use
+            status += ' ' + pool_context().get_start_method()
+        except Exception as error:
+            status = repr(error)
+        os.write(write_end, status.encode())
+        os._exit(0)
+    os.close(write_end)
+    with os.fdopen(read_end, 'rb') as f:
+        status = f.read().decode()
+    os.waitpid(pid, 0)
+    assert status == 'ok spawn'
+    assert pool_context().get_start_method() == 'forkserver'
@@ -0,0 +1,54 @@
+from cache import LocalCacheBackend
+from memory_mongo import Collection
+from users import UserDirectory
+
+class CountingCollection(Collection):
+    # Counts the find_one calls that role and login lookups make
+    def __init__(self, documents=()):
+        super().__init__()
+        self.lookups = 0
+        self.insert_many(list(documents))
+
+    def find_one(self, query=None, projection=None):
+        self.lookups += 1
+        return super().find_one(query, projection)
+
+def test_bootstrap_is_idempotent():
+    collection = CountingCollection()
+    users = UserDirectory(collection)
+    users.bootstrap('admin', 'secret')
+    users.bootstrap('admin', 'changed')
+    assert collection.unique
+    assert len(collection.documents) == 1
+    assert collection.documents[0]['password'] == 'secret'
+    assert not users.register('admin', 'other')
+
+def test_bootstrap_removes_duplicate_admins():
+    collection = CountingCollection([
+        {'username': 'admin', 'password': 'adminpassword', 'role': 'user'},
+        {'username': 'alice', 'password': 'a', 'role': 'user'},
+        {'username': 'admin', 'password': 'adminpassword', 'role': 'admin'}
+    ])
+    UserDirectory(collection).bootstrap('admin', 'adminpassword')
+    assert sorted((document['username'], document['role']) for document in collection.documents) == [
+        ('admin', 'admin'), ('alice', 'user')
+    ]
+
+def test_role_lookups_are_cached_until_delete(clock):
+    collection = CountingCollection()
+    users = UserDirectory(collection, LocalCacheBackend(ttl=60.0, clock=clock))
+    users.bootstrap('admin', 'secret')
+    assert users.role('admin') == 'admin'
+    assert users.role('admin') == 'admin'
+    assert collection.lookups == 1
+    assert users.role('bob') is None
+    assert users.register('bob', 'pw')
+    assert users.role('bob') == 'user'
+    assert users.delete('bob')
+    assert users.role('bob') is None
+    clock.now = 61.0
+    lookups = collection.lookups
+    users.role('admin')
+    assert collection.lookups == lookups + 1
+    assert users.authenticate('admin', 'wrong') is None
+    assert users.authenticate('admin', 'secret') == {'username': 'admin', 'role': 'admin'}
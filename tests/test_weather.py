@@ -0,0 +1,111 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+from weather import WeatherClient, WeatherUnavailable, UnknownCity
+
+class WeatherStub:
+    # Local stand-in for the OpenWeatherMap current-weather endpoint
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.status = 200
+        self.temperature = 21.5
+        self.calls = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._lock:
+                    stub.calls += 1
+                time.sleep(stub.delay)
+                city = parse_qs(urlparse(self.path).query)['q'][0]
+                status = 404 if city == 'Atlantis' else stub.status
+                body = json.dumps({
+                    'main': {'temp': stub.temperature, 'humidity': 40},
+                    'weather': [{'main': 'Clear'}]
+                }).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self._server.server_address[1]}/data/2.5/weather'
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+def test_readings_are_cached_per_city(clock):
+    with WeatherStub() as stub:
+        client = WeatherClient('key', url=stub.url, ttl=60, clock=clock)
+        assert client.get('Accra')['temperature'] == 21.5
+        assert client.get(' accra ')['temperature'] == 21.5
+        assert stub.calls == 1
+        clock.now = 61
+        stub.temperature = 25.0
+        assert client.get('Accra')['temperature'] == 25.0
+        assert stub.calls == 2
+        client.close()
+
+def test_concurrent_lookups_share_one_upstream_call():
+    with WeatherStub(delay=0.3) as stub:
+        client = WeatherClient('key', url=stub.url, pool_size=4)
+        with ThreadPoolExecutor(max_workers=500) as pool:
+            readings = list(pool.map(lambda _: client.get('Accra'), range(500)))
+        assert stub.calls == 1
+        assert all(reading['temperature'] == 21.5 for reading in readings)
+        assert client.stats()['upstream_calls'] == 1
+        client.close()
+
+def test_stale_reading_served_while_upstream_is_down(clock):
+    with WeatherStub() as stub:
+        client = WeatherClient('key', url=stub.url, ttl=60, stale_ttl=600, error_backoff=30, clock=clock)
+        client.get('Accra')
+        stub.status = 500
+        clock.now = 100
+        assert client.get('Accra')['temperature'] == 21.5
+        # Within the backoff the upstream is not called again
+        clock.now = 110
+        client.get('Accra')
+        assert stub.calls == 2
+        assert client.stats()['stale_served'] == 2
+        # Too old to serve
+        clock.now = 1000
+        with pytest.raises(WeatherUnavailable):
+            client.get('Accra')
+        client.close()
+
+def test_unknown_city_and_timeouts():
+    with WeatherStub(delay=0.5) as stub:
+        client = WeatherClient('key', url=stub.url, read_timeout=0.1)
+        with pytest.raises(WeatherUnavailable):
+            client.get('Accra')
+        client.close()
+    with WeatherStub() as stub:
+        client = WeatherClient('key', url=stub.url)
+        with pytest.raises(UnknownCity):
+            client.get('Atlantis')
+        client.close()
+
+def test_api_key_stays_out_of_errors_and_logs(caplog):
+    # Nothing listens on port 1, so requests raises with the full URL in its message
+    client = WeatherClient('SECRETKEY123', url='http://127.0.0.1:1/data/2.5/weather')
+    with pytest.raises(WeatherUnavailable) as error:
+        client.get('London')
+    assert str(error.value) == 'Weather service unavailable'
+    assert 'SECRETKEY123' not in caplog.text
+    assert 'ConnectionError' in caplog.text
+    client.close()
@@ -0,0 +1,180 @@
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import Ridge
+from sklearn.model_selection import TimeSeriesSplit
+from threadpoolctl import threadpool_limits
+from inference import compile_model
+from metrics import metrics
+from model import FEATURES, MODEL_PARAMS
+
+logger = logging.getLogger(__name__)
+
+# Tried in this order, cheapest first, so a tight budget still yields a model
+ESTIMATORS = {
+    'linear': (Ridge, {'alpha': 1.0}),
+    'hist_gradient_boosting': (HistGradientBoostingRegressor, {'max_iter': 200, 'random_state': 42}),
+    'random_forest': (RandomForestRegressor, MODEL_PARAMS)
+}
+DEFAULT_SELECTION = {
+    'candidates': list(ESTIMATORS),
+    'n_splits': 5,
+    'budget_seconds': 300.0,
+    'max_predict_seconds': None
+}
+FALLBACK = 'random_forest'
+
+# Rows timed per candidate for served single-row latency
+LATENCY_SAMPLES = 200
+
+def build_estimator(name, n_jobs=None):
+    estimator_class, params = ESTIMATORS[name]
+    params = dict(params)
+    if 'n_jobs' in estimator_class().get_params():
+        params['n_jobs'] = n_jobs
+    return estimator_class(**params)
+
+def training_arrays(df):
+    # Oldest first, so each fold validates on rows that come after its training rows;
+    # ingested rows have no timestamp and count as newest
+    if 'timestamp' in df:
+        df = df.sort_values('timestamp', kind='stable', na_position='last')
+    X = np.ascontiguousarray(df[FEATURES].to_numpy(dtype=np.float64))
+    y = np.ascontiguousarray(df['demand'].to_numpy(dtype=np.float64))
+    return X, y
+
+def evaluate_fold(name, data_dir, fold, train_index, test_index):
+    # Runs in a pool worker: one process per fold, one thread per process
+    X = np.load(os.path.join(data_dir, 'X.npy'), mmap_mode='r')
+    y = np.load(os.path.join(data_dir, 'y.npy'), mmap_mode='r')
+    with threadpool_limits(1):
+        estimator = build_estimator(name, n_jobs=1)
+        started = time.perf_counter()
+        estimator.fit(X[train_index], y[train_index])
+        fit_seconds = time.perf_counter() - started
+        X_test = np.ascontiguousarray(X[test_index])
+        started = time.perf_counter()
+        predictions = estimator.predict(X_test)
+        batch_seconds = time.perf_counter() - started
+        engine = compile_model(estimator)
+        samples = X_test[:LATENCY_SAMPLES]
+        started = time.perf_counter()
+        for row in samples:
+            engine.predict_one(row[0], row[1], row[2])
+        predict_one_seconds = (time.perf_counter() - started) / len(samples)
+    errors = predictions - y[test_index]
+    return {
+        'fold': fold,
+        'fit_seconds': fit_seconds,
+        'predict_seconds_per_row': batch_seconds / len(test_index),
+        'predict_one_seconds': predict_one_seconds,
+        'mae': float(np.abs(errors).mean()),
+        'rmse': float(np.sqrt((errors ** 2).mean()))
+    }
+
+def summarize(folds):
+    summary = {'status': 'ok', 'folds': len(folds)}
+    for field in ('fit_seconds', 'predict_seconds_per_row', 'predict_one_seconds', 'mae', 'rmse'):
+        summary[field] = float(np.mean([fold[field] for fold in folds]))
+    return summary
+
+# The process whose forkserver the pools use: the first one to ask for a context
+_forkserver_owner = None
+
+def pool_context():
+    # forkserver: forking the serving process itself would copy its threads' locks. The
+    # server imports this module (and sklearn) once, so workers start already warm. A
+    # process forked from the owner (a serving worker) inherits a forkserver it cannot
+    # talk to, so it uses spawn instead.
+    global _forkserver_owner
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    if _forkserver_owner is None:
+        _forkserver_owner = os.getpid()
+    if _forkserver_owner != os.getpid():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload([__name__])
+    return context
+
+def cross_validate(X, y, candidates, n_splits, budget_seconds, processes=None):
+    # Every (candidate, fold) pair is a task on a process pool. Whatever has not finished
+    # when the budget runs out is abandoned and the pool's workers are terminated.
+    splits = list(TimeSeriesSplit(n_splits=n_splits).split(X))
+    data_dir = tempfile.mkdtemp(prefix='training-')
+    pool = pool_context().Pool(processes or os.cpu_count())
+    deadline = time.monotonic() + budget_seconds
+    try:
+        np.save(os.path.join(data_dir, 'X.npy'), X)
+        np.save(os.path.join(data_dir, 'y.npy'), y)
+        tasks = {
+            name: [pool.apply_async(evaluate_fold, (name, data_dir, fold, train_index, test_index))
+                   for fold, (train_index, test_index) in enumerate(splits)]
+            for name in candidates
+        }
+        report = {}
+        for name, results in tasks.items():
+            folds = []
+            try:
+                for result in results:
+                    folds.append(result.get(timeout=max(0.0, deadline - time.monotonic())))
+                report[name] = summarize(folds)
+            except multiprocessing.TimeoutError:
+                report[name] = {'status': 'timed_out', 'folds': len(folds)}
+            except Exception as error:
+                logger.error(f"Error evaluating {name}: {str(error)}")
+                report[name] = {'status': 'failed', 'error': str(error)}
+        return report
+    finally:
+        pool.terminate()
+        pool.join()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+def choose(report, max_predict_seconds=None):
+    # Lowest validation MAE among candidates that finished and are fast enough to serve
+    eligible = {
+        name: result for name, result in report.items()
+        if result['status'] == 'ok'
+        and (max_predict_seconds is None or result['predict_one_seconds'] <= max_predict_seconds)
+    }
+    if not eligible:
+        return None
+    return min(eligible, key=lambda name: eligible[name]['mae'])
+
+def select_and_train(df, selection=None, processes=None, arrays=None):
+    # Cross-validates the candidates within the budget, then refits the winner on all
+    # rows using every core. Returns the fitted model and the per-candidate report.
+    # arrays: (X, y) already in training order, e.g. from TrainingDataStore.arrays()
+    selection = {**DEFAULT_SELECTION, **(selection or {})}
+    started = time.monotonic()
+    X, y = arrays if arrays is not None else training_arrays(df)
+    n_splits = min(selection['n_splits'], len(X) - 1)
+    if n_splits >= 2:
+        report = cross_validate(X, y, selection['candidates'], n_splits, selection['budget_seconds'], processes)
+    else:
+        report = {name: {'status': 'skipped', 'reason': 'too few rows'} for name in selection['candidates']}
+    winner = choose(report, selection['max_predict_seconds'])
+    if winner is None:
+        logger.warning(f"No candidate finished within the training budget, falling back to {FALLBACK}")
+        winner = FALLBACK
+    estimator = build_estimator(winner, n_jobs=-1)
+    fit_started = time.perf_counter()
+    estimator.fit(X, y)
+    fit_seconds = time.perf_counter() - fit_started
+    metrics.observe('model_training_seconds', fit_seconds, estimator=type(estimator).__name__)
+    logger.info(f"Selected {winner} out of {len(report)} candidates")
+    return estimator, {
+        'winner': winner,
+        'rows': len(X),
+        'n_splits': n_splits,
+        'budget_seconds': selection['budget_seconds'],
+        'max_predict_seconds': selection['max_predict_seconds'],
+        'selection_seconds': time.monotonic() - started - fit_seconds,
+        'final_fit_seconds': fit_seconds,
+        'candidates': report
+    }
@@ -0,0 +1,86 @@
+import logging
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+from cache import LocalCacheBackend
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROLE = 'user'
+
+class UserDirectory:
+    # Users by username, backed by a unique index: lookups use it and registration
+    # cannot race into duplicates. Roles travel in the JWT, so the per-process cache
+    # below only serves what is left (tokens issued before roles were a claim) and is
+    # dropped for a user when they register or are deleted.
+    def __init__(self, collection, cache=None):
+        self.collection = collection
+        self.cache = cache or LocalCacheBackend(maxsize=10000, ttl=60.0)
+        self.hits = 0
+        self.misses = 0
+
+    def bootstrap(self, admin_username, admin_password):
+        # Safe on every start: the index is a no-op once built, and the admin account is
+        # only written when it does not exist yet
+        try:
+            self.collection.create_index([('username', ASCENDING)], unique=True)
+        except DuplicateKeyError:
+            # Databases written before the index may hold repeated usernames (earlier
+            # versions inserted an admin on every start); keep the newest of each
+            self._remove_duplicates()
+            self.collection.create_index([('username', ASCENDING)], unique=True)
+        self.collection.update_one(
+            {'username': admin_username},
+            {'$setOnInsert': {'password': admin_password, 'role': 'admin'}},
+            upsert=True
+        )
+
+    def _remove_duplicates(self):
+        newest = {}
+        stale = []
+        for document in self.collection.find({}, {'username': 1}).sort('_id', ASCENDING):
+            username = document.get('username')
+            if username in newest:
+                stale.append(newest[username])
+            newest[username] = document['_id']
+        if stale:
+            self.collection.delete_many({'_id': {'$in': stale}})
+        logger.info(f"Removed {len(stale)} duplicate users before indexing usernames")
+
+    def register(self, username, password, role=DEFAULT_ROLE):
+        try:
+            self.collection.insert_one({'username': username, 'password': password, 'role': role})
+        except DuplicateKeyError:
+            return False
+        self.cache.invalidate(username)
+        return True
+
+    def authenticate(self, username, password):
+        user = self.collection.find_one({'username': username, 'password': password}, {'_id': 0, 'password': 0})
+        if user is not None:
+            self.cache.set((username,), user)
+        return user
+
+    def get(self, username):
+        user = self.cache.get((username,))
+        if user is not None:
+            self.hits += 1
+            return user or None
+        self.misses += 1
+        user = self.collection.find_one({'username': username}, {'_id': 0, 'password': 0})
+        # Unknown users are cached too, as an empty dict
+        self.cache.set((username,), user or {})
+        return user
+
+    def role(self, username):
+        user = self.get(username)
+        if user is None:
+            return None
+        return user.get('role', DEFAULT_ROLE)
+
+    def delete(self, username):
+        result = self.collection.delete_one({'username': username})
+        self.cache.invalidate(username)
+        return result.deleted_count > 0
+
+    def stats(self):
+        return dict(self.cache.stats(), hits=self.hits, misses=self.misses)
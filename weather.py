@@ -0,0 +1,152 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+import requests
+from requests.adapters import HTTPAdapter
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+OPENWEATHER_URL = 'http://api.openweathermap.org/data/2.5/weather'
+
+class WeatherUnavailable(Exception):
+    pass
+
+class UnknownCity(WeatherUnavailable):
+    pass
+
+def describe(error):
+    # requests puts the full URL, API key included, into its exception messages; only
+    # the exception type is safe to log
+    if isinstance(error, requests.RequestException):
+        return type(error).__name__
+    return str(error)
+
+def fetch_weather_data(session, url, api_key, city, timeout):
+    response = session.get(url, params={'q': city, 'appid': api_key, 'units': 'metric'}, timeout=timeout)
+    if response.status_code == 404:
+        raise UnknownCity(f"Unknown city: {city}")
+    if response.status_code == 200:
+        data = response.json()
+        return {
+            'temperature': data['main']['temp'],
+            'humidity': data['main']['humidity'],
+            'weather_condition': data['weather'][0]['main']
+        }
+    else:
+        raise Exception(f"Failed to fetch weather data: {response.status_code}")
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class WeatherClient:
+    # Current weather per city, over one pooled HTTP session with connect/read timeouts.
+    # Readings are cached for ttl seconds. Concurrent lookups of a city that is not
+    # cached share one upstream call: the first caller fetches and the rest wait for
+    # its result. When the upstream fails, a reading up to stale_ttl seconds old is
+    # served instead, and the upstream is left alone for error_backoff seconds.
+    def __init__(self, api_key, url=OPENWEATHER_URL, ttl=600.0, stale_ttl=3600.0, error_backoff=30.0,
+                 connect_timeout=2.0, read_timeout=3.0, pool_size=10, max_cities=10000,
+                 clock=time.monotonic):
+        self.api_key = api_key
+        self.url = url
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.error_backoff = error_backoff
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_cities = max_cities
+        self.clock = clock
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.counters = {
+            'hits': 0,
+            'misses': 0,
+            'upstream_calls': 0,
+            'upstream_errors': 0,
+            'coalesced': 0,
+            'stale_served': 0
+        }
+        # city -> (fetched_at, reading); failures: city -> (failed_at, error)
+        self._readings = OrderedDict()
+        self._failures = {}
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def get(self, city):
+        key = ' '.join(city.split()).lower()
+        now = self.clock()
+        with self._lock:
+            cached = self._readings.get(key)
+            if cached is not None and now - cached[0] < self.ttl:
+                self._readings.move_to_end(key)
+                self.counters['hits'] += 1
+                return cached[1]
+            self.counters['misses'] += 1
+            failure = self._failures.get(key)
+            if failure is not None and now - failure[0] < self.error_backoff:
+                return self._stale(key, now, failure[1])
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.counters['coalesced'] += 1
+        if leader:
+            self._fetch(key, city, flight)
+        elif not flight.done.wait(sum(self.timeout)):
+            raise WeatherUnavailable(f"Timed out waiting for weather for {city}")
+        if flight.error is None:
+            return flight.result
+        with self._lock:
+            return self._stale(key, self.clock(), flight.error)
+
+    def _fetch(self, key, city, flight):
+        try:
+            with metrics.span('weather.fetch'):
+                flight.result = fetch_weather_data(self.session, self.url, self.api_key, city, self.timeout)
+        except Exception as error:
+            flight.error = error
+            logger.error(f"Error fetching weather for {city}: {describe(error)}")
+        with self._lock:
+            self.counters['upstream_calls'] += 1
+            if flight.error is None:
+                self._readings[key] = (self.clock(), flight.result)
+                self._readings.move_to_end(key)
+                while len(self._readings) > self.max_cities:
+                    self._readings.popitem(last=False)
+                self._failures.pop(key, None)
+            else:
+                self.counters['upstream_errors'] += 1
+                self._failures[key] = (self.clock(), flight.error)
+                if len(self._failures) > self.max_cities:
+                    cutoff = self.clock() - self.error_backoff
+                    self._failures = {city: failure for city, failure in self._failures.items() if failure[0] >= cutoff}
+            del self._flights[key]
+        flight.done.set()
+
+    def _stale(self, key, now, error):
+        # Called with the lock held
+        cached = self._readings.get(key)
+        if cached is not None and now - cached[0] < self.stale_ttl:
+            self.counters['stale_served'] += 1
+            return cached[1]
+        if isinstance(error, UnknownCity):
+            raise error
+        # The upstream error stays out of the message, which /predict returns to clients
+        raise WeatherUnavailable("Weather service unavailable")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['cities_cached'] = len(self._readings)
+            stats['in_flight'] = len(self._flights)
+        return stats
+
+    def close(self):
+        self.session.close()